@@ -0,0 +1,57 @@
+"""
+Analysis tiers for /check-text and /check-image.
+
+'deep' (the default) is the full analysis the API has always returned.
+'quick' is for clients that only need the verdict and confidence: a one-line
+prompt asking only for the percentage summary, a small output-token cap, a
+downscaled image, and a short queue timeout and overall deadline. The
+deadline (QUICK_DEADLINE) covers the whole analysis, from the wait for a model
+slot and upstream quota to the last model of the route.
+
+Quick verdicts are cached under their own key and never served to deep
+requests, while quick requests are happily served from a cached deep verdict.
+Model-call latency is recorded per tier and reported in /stats.
+"""
+import os
+
+from structured_output import ModeMetrics
+
+TIERS = ('quick', 'deep')
+DEFAULT_TIER = 'deep'
+
+QUICK_MAX_OUTPUT_TOKENS = int(os.getenv('QUICK_MAX_OUTPUT_TOKENS', 64))
+QUICK_DEADLINE = float(os.getenv('QUICK_DEADLINE', 5))
+QUICK_QUEUE_TIMEOUT = float(os.getenv('QUICK_QUEUE_TIMEOUT', 2))
+QUICK_IMAGE_MAX_SIDE = int(os.getenv('QUICK_IMAGE_MAX_SIDE', 512))
+
+
+def parse_tier(value):
+    """Validate a requested tier; None or '' means the default.
+
+    Raises:
+        ValueError: For an unknown tier.
+    """
+    if not value:
+        return DEFAULT_TIER
+    tier = str(value).strip().lower()
+    if tier not in TIERS:
+        raise ValueError(f"Invalid tier (expected one of: {', '.join(TIERS)})")
+    return tier
+
+
+def tier_key(cache_key, tier):
+    """Cache key of a `tier` verdict for content `cache_key`."""
+    return cache_key if tier == 'deep' else f'{cache_key}:{tier}'
+
+
+def lookup_keys(cache_key, tier):
+    """Cache keys that can answer a `tier` request, best first."""
+    return (cache_key,) if tier == 'deep' else (cache_key, tier_key(cache_key, tier))
+
+
+def quick_generation_config():
+    """generate_content config for a quick analysis."""
+    return {'max_output_tokens': QUICK_MAX_OUTPUT_TOKENS}
+
+
+tier_metrics = ModeMetrics()
@@ -1,19 +1,48 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from project_1 import analyze_text_for_misinformation, analyze_image_for_misinformation
+from project_1 import analyze_text_for_misinformation, analyze_image_for_misinformation, is_analysis_error, stream_text_analysis
+from verdict_cache import VerdictCache, text_cache_key
+from image_index import ImageVerdictIndex, dhash
+from text_index import NearMatchIndex, minhash
+from concurrency import ServerBusy, model_slots
+from singleflight import SingleFlight
+from gemini_client import DEFAULT_MODEL, client as gemini
+from quota import batch_priority, governor as quota_governor, run_as_batch
+from jobs import JobFailed, JobQueue
+from model_routing import route_name, router
+from verdict_store import SEARCH_API_KEY, SEARCH_MAX_PER_PAGE, VerdictStore, is_sha256
+import metrics
+from metrics import observe_stage, payload_bytes, span
+from image_preprocess import ImageRejected, prepare_image
+from image_frames import (ANIMATION_MAX_FRAMES, FRAME_MAX_SIDE, MULTI_IMAGE_MAX_FILES, MULTI_IMAGE_MAX_FRAMES,
+                          describe_frames, frame_notes, prepare_frames)
+from verdict_parser import extract_percentages, parse_analysis_to_json
+from structured_output import generation_config, mode_metrics, parse_structured_to_json, response_schema, use_structured
+from prescreen import Prescreen
+from text_input import (InputTooLarge, TEXT_MAX_BODY_BYTES, TEXT_MAX_CHARS, TEXT_MAX_INPUT_CHARS, check_text_field,
+                        read_json, sanitize_text)
+from long_document import LONG_DOC_MAX_WORKERS, Chunk, merge_verdicts, parse_mode, split_chunks
+from analysis_tiers import (QUICK_DEADLINE, QUICK_IMAGE_MAX_SIDE, QUICK_QUEUE_TIMEOUT, lookup_keys, parse_tier,
+                            quick_generation_config, tier_key, tier_metrics)
+import contextvars
+import hmac
 import json
-import re
 import os
+import textwrap
+import time
+import hashlib
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import bleach
 
 app = Flask(__name__)
 
 # Security Configuration
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-change-in-production')
+app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true').lower() != 'false'
 
 # CORS Configuration - More permissive for development
 if os.getenv('FLASK_ENV') == 'development':
@@ -23,124 +52,529 @@ else:
     CORS(app, origins=allowed_origins)
 
 # Rate Limiting
+# Client limits are per worker unless RATE_LIMIT_STORAGE_URL points at a shared
+# store (e.g. redis://localhost:6379)
 limiter = Limiter(
     key_func=get_remote_address,
     app=app,
-    default_limits=["100 per hour", "20 per minute"]
+    default_limits=["100 per hour", "20 per minute"],
+    storage_uri=os.getenv('RATE_LIMIT_STORAGE_URL', 'memory://')
 )
 
+@app.before_request
+def start_request_metrics():
+    """Label this request's stage timings with its endpoint"""
+    g.request_start = time.perf_counter()
+    metrics.set_endpoint(request.endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    """Request duration, body size and cache result for /metrics"""
+    endpoint = request.endpoint or 'unknown'
+    if 'request_start' in g:
+        metrics.request_seconds.observe(
+            time.perf_counter() - g.request_start, endpoint=endpoint, status=str(response.status_code)
+        )
+    if request.content_length:
+        metrics.request_bytes.observe(request.content_length, endpoint=endpoint)
+    if 'X-Cache' in response.headers:
+        metrics.cache_results.inc(endpoint=endpoint, result=response.headers['X-Cache'])
+    return response
+
 # Allowed file extensions for image uploads
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+# Verdict cache shared by all Gunicorn workers (SQLite under TRUTHLENS_DATA_DIR)
+verdict_cache = VerdictCache()
+
+# Perceptual-hash index of analyzed images, for near-duplicate re-uploads
+image_index = ImageVerdictIndex()
+
+# MinHash-LSH index of analyzed texts, for reworded repeats of known claims
+text_index = NearMatchIndex()
+text_index.load()
+
+# Every Gemini verdict, kept with its text or image hash and searchable via /search
+verdict_store = VerdictStore()
+
+# Local pattern table and online linear model that answer obvious texts without Gemini
+prescreen = Prescreen()
+
+# Identical in-flight submissions share one Gemini call, within and across workers
+text_flight = SingleFlight('text', verdict_cache.peek)
+image_flight = SingleFlight('image', verdict_cache.peek)
+
+# Batch checking: items per request and size of the per-worker analysis pool
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 20))
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch')
+
+# Long-document mode: the chunks of a document are analyzed concurrently on this pool
+document_executor = ThreadPoolExecutor(max_workers=LONG_DOC_MAX_WORKERS, thread_name_prefix='document')
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def sanitize_text(text):
-    """Sanitize input text to prevent XSS and other attacks"""
-    if not text:
-        return ""
-    # Remove HTML tags and limit length
-    cleaned = bleach.clean(text, tags=[], strip=True)
-    return cleaned[:2000]  # Limit to 2000 characters
+def server_busy():
+    """503 response for requests rejected by the model-call limit or upstream quota"""
+    response = jsonify({'error': 'Server busy. Please try again later.'})
+    response.headers['Retry-After'] = '5'
+    return response, 503
 
-def parse_analysis_to_json(analysis_text):
-    """Convert the analysis text to the expected JSON format for the frontend."""
-    try:
-        analysis_lower = analysis_text.lower()
-        
-        # Try to extract percentages from the first line (new format)
-        percentage_match = re.search(r'(\d+)%\s+likely\s+to\s+be\s+(accurate|genuine).*?(\d+)%\s+likely.*?(misinformation|manipulated).*?(\d+)%\s+likely.*?(misleading)', analysis_lower)
+def input_too_large(e):
+    """413 response for a body or text field over the text input limits (text_input.py)"""
+    return jsonify({'error': str(e)}), 413
+
+class AnalysisFailed(Exception):
+    """The upstream call failed; carries the (uncached) fallback result."""
+    def __init__(self, result):
+        super().__init__(result.get('explanation', 'Analysis failed'))
+        self.result = result
+
+def file_sha256(stream):
+    """Hash an uploaded file in chunks and rewind it."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def analyze_with_mode(kind, key, call, tier='deep', allow_structured=True):
+    """Run one model analysis in the output mode (A/B arm) chosen for `key`,
+    along the model route of `kind` and `tier` (see model_routing.py).
+    
+    Args:
+        kind (str): 'text' or 'image'.
+        key (str): Content key that decides the arm.
+        call: call(structured, model_name) returns the raw model response text.
+        tier (str): Analysis tier; quick analyses are always prose, and
+            QUICK_DEADLINE covers all of one: the model slot and quota
+            queues, the first model call and any escalation.
+        allow_structured (bool): False for prompts with no structured variant.
+    
+    Returns:
+        tuple: (analysis, result) - the raw response and the parsed verdict
+        of the model whose answer was kept.
+    
+    Raises:
+        ValueError: If a structured response does not match its schema.
+    """
+    structured = allow_structured and tier == 'deep' and use_structured(key)
+    mode = 'structured' if structured else 'prose'
+    
+    def attempt(model_name):
+        start = time.monotonic()
+        analysis = call(structured, model_name)
+        latency = time.monotonic() - start
+        observe_stage('gemini', latency)
         
-        if percentage_match:
-            genuine_pct = int(percentage_match.group(1))
-            false_pct = int(percentage_match.group(3))
-            misleading_pct = int(percentage_match.group(5))
-            
-            # Use the genuine percentage as confidence, determine truthfulness
-            if genuine_pct >= 60:
-                is_true = True
-                confidence = min(95, genuine_pct + 10)  # Add some confidence boost
-            elif false_pct >= 50:
-                is_true = False
-                confidence = min(95, false_pct + 15)  # Higher confidence for clear falsehoods
-            else:
-                is_true = False  # Lean towards caution when uncertain
-                confidence = max(30, 100 - misleading_pct - false_pct)
-        else:
-            # Fallback to keyword analysis if percentage extraction fails
-            strong_negative = [
-                'fake', 'false', 'misleading', 'scam', 'manipulated', 'fabricated', 
-                'hoax', 'conspiracy', 'debunked', 'untrue', 'deceptive', 'fraudulent',
-                'suspicious', 'red flags', 'warning signs', 'concerning', 'doubt',
-                'misinformation', 'disinformation', 'propaganda'
-            ]
-            
-            positive_indicators = [
-                'credible', 'accurate', 'verified', 'legitimate', 'authentic', 
-                'reliable', 'factual', 'genuine', 'trustworthy', 'evidence-based',
-                'well-sourced', 'documented', 'confirmed', 'looks real', 'appears genuine',
-                'likely genuine', 'probably accurate'
-            ]
-            
-            # Count indicators with more nuanced scoring
-            strong_neg_count = sum(1 for indicator in strong_negative if indicator in analysis_lower)
-            positive_count = sum(1 for indicator in positive_indicators if indicator in analysis_lower)
-            
-            # More dynamic confidence calculation
-            if strong_neg_count >= 3:
-                is_true = False
-                confidence = min(95, 75 + (strong_neg_count * 5))
-            elif positive_count >= 2 and strong_neg_count == 0:
-                is_true = True
-                confidence = min(90, 70 + (positive_count * 6))
-            elif strong_neg_count > positive_count:
-                is_true = False
-                confidence = min(85, 60 + (strong_neg_count * 8))
-            elif positive_count > strong_neg_count:
-                is_true = True
-                confidence = min(80, 55 + (positive_count * 7))
+        parse_start = time.perf_counter()
+        ok = not is_analysis_error(analysis)
+        try:
+            if structured and ok:
+                result = parse_structured_to_json(analysis, kind)
             else:
-                is_true = False  # Default to caution
-                confidence = 45 + (len(analysis_text) // 100)  # Vary based on analysis length
+                result = parse_analysis_to_json(analysis)
+        except ValueError:
+            ok = False
+            raise
+        finally:
+            parse_time = time.perf_counter() - parse_start
+            observe_stage('parse', parse_time)
+            if tier == 'deep':
+                mode_metrics.record(mode, latency, len(analysis), parse_time, ok)
+            tier_metrics.record(tier, latency, len(analysis), parse_time, ok)
+        return analysis, result
+    
+    def assess(outcome, threshold):
+        analysis, result = outcome
+        if is_analysis_error(analysis):
+            return 'error'
+        # Prose without a summary line was only guessed from keywords
+        if not structured and extract_percentages(analysis.lower()) is None:
+            return 'unparsed'
+        if result['confidence'] < threshold:
+            return 'low_confidence'
+        return None
+    
+    # One model slot covers an escalation too: the calls run one after the other
+    wait_start = time.monotonic()
+    quick = tier == 'quick'
+    with model_slots.slot(min(QUICK_QUEUE_TIMEOUT, QUICK_DEADLINE) if quick else None):
+        waited = time.monotonic() - wait_start
+        observe_stage('model_slot_wait', waited)
+        return router.run(route_name(kind, tier), attempt, assess, QUICK_DEADLINE - waited if quick else None)
+
+def reuse_text_verdict(text, cache_key, tier='deep'):
+    """Find a verdict for sanitized text that needs no model call.
+
+    Args:
+        text (str): Sanitized text.
+        cache_key (str): text_cache_key(text).
+        tier (str): 'deep' or 'quick'; quick requests may be served a deep verdict.
+
+    Returns:
+        tuple: (result, status, signature) - the verdict and 'HIT', 'NEAR' or
+        'PRESCREEN' as for analyze_text_cached, or None and 'MISS'; the
+        MinHash signature is passed on to text_index.add().
+    """
+    # Serve repeated claims from the shared cache without calling Gemini
+    with span('cache_lookup'):
+        result = verdict_cache.get_any(lookup_keys(cache_key, tier))
+    if result is not None:
+        return result, 'HIT', None
+    
+    # Reworded copies of a known claim reuse its verdict, marked as a near-match
+    with span('near_match'):
+        signature = minhash(text)
+        match = text_index.lookup(text, signature)
+    if match is not None:
+        result, similarity = match
+        result.update({'nearMatch': True, 'similarity': round(similarity, 3)})
+        return result, 'NEAR', signature
+    
+    # Known scam templates and texts the local model is sure about skip Gemini
+    with span('prescreen'):
+        result = prescreen.check(text)
+    if result is not None:
+        return result, 'PRESCREEN', signature
+    return None, 'MISS', signature
+
+def analyze_text_cached(text, tier='deep'):
+    """Analyze sanitized text, serving repeats from the shared caches.
+
+    Args:
+        text (str): Sanitized text to analyze.
+        tier (str): 'deep' or 'quick'; quick requests may be served a deep verdict.
+
+    Returns:
+        tuple: (result, status) where status is 'HIT' (exact repeat), 'NEAR'
+        (reworded repeat), 'PRESCREEN' (answered by the local pre-screen),
+        'MISS' (analyzed by Gemini), 'COALESCED' (shared the Gemini call of an
+        identical in-flight request) or 'ERROR' (the upstream call failed; the
+        result is not cached).
+    """
+    cache_key = text_cache_key(text)
+    result, status, signature = reuse_text_verdict(text, cache_key, tier)
+    if result is not None:
+        return result, status
+    
+    def analyze():
+        app.logger.info(f"Analyzing text: {text[:50]}...")
         
-        # Generate sources based on content
-        sources = []
-        if any(word in analysis_lower for word in ['verify', 'check', 'source', 'research', 'fact-check']):
-            sources = [
-                {
-                    "title": "Snopes Fact-Checking",
-                    "url": "https://www.snopes.com",
-                    "domain": "snopes.com"
-                },
-                {
-                    "title": "FactCheck.org",
-                    "url": "https://www.factcheck.org",
-                    "domain": "factcheck.org"
-                }
-            ]
-            
-        if 'reverse image search' in analysis_lower or 'image' in analysis_lower:
-            sources.append({
-                "title": "Google Reverse Image Search",
-                "url": "https://images.google.com",
-                "domain": "images.google.com"
-            })
+        # Get analysis from your friend's function and convert to expected JSON format
+        try:
+            analysis, result = analyze_with_mode(
+                'text', cache_key,
+                lambda structured, model_name: analyze_text_for_misinformation(text, structured, tier, model_name),
+                tier
+            )
+        except ValueError as e:
+            app.logger.warning(f"Unreadable structured text analysis: {str(e)}")
+            raise AnalysisFailed(parse_analysis_to_json(
+                "An error occurred during text analysis: the response could not be read."
+            ))
+        if is_analysis_error(analysis):
+            raise AnalysisFailed(result)
         
-        return {
-            "isTrue": is_true,
-            "confidence": confidence,
-            "explanation": analysis_text,
-            "sources": sources
-        }
+        verdict_cache.set(tier_key(cache_key, tier), result)
+        verdict_store.record('text', cache_key, result, text=text, tier=tier)
+        if tier == 'deep':
+            text_index.add(text, result, signature)
+        prescreen.learn(text, result)
+        return result
+    
+    try:
+        result, shared = text_flight.do(tier_key(cache_key, tier), analyze)
+    except AnalysisFailed as e:
+        return e.result, 'ERROR'
+    return result, 'COALESCED' if shared else 'MISS'
+
+def analyze_document(text, tier='deep'):
+    """Check a long text chunk by chunk, concurrently, and merge the verdicts.
+
+    Args:
+        text (str): Sanitized document text.
+        tier (str): Tier each chunk is analyzed at.
+
+    Returns:
+        tuple: (result, status, chunk_count) where status is 'HIT' if every
+        chunk was answered without Gemini, 'ERROR' if no chunk could be
+        analyzed, and 'MISS' otherwise.
+
+    Raises:
+        ServerBusy: If any chunk was rejected by the model-call limit or quota.
+    """
+    with span('split'):
+        chunks, truncated = split_chunks(text)
+    if not chunks:
+        # Nothing but fragments: check the text as it is
+        chunks = [Chunk(0, len(text), text)]
+    # Each chunk runs in a copy of this request's context, so its stages are labeled with the endpoint
+    futures = [
+        document_executor.submit(contextvars.copy_context().run, analyze_text_cached, chunk.text, tier)
+        for chunk in chunks
+    ]
+    outcomes = [future.result() for future in futures]
+    
+    with span('merge'):
+        result = merge_verdicts(chunks, outcomes, truncated)
+    if result is None:
+        return outcomes[0][0], 'ERROR', len(chunks)
+    statuses = {status for _, status in outcomes}
+    return result, 'HIT' if statuses <= {'HIT', 'NEAR', 'PRESCREEN'} else 'MISS', len(chunks)
+
+# Image prompts, dedented once at import
+IMAGE_QUICK_PROMPT = textwrap.dedent("""
+    You are TruthLens, an AI that analyzes images for authenticity. Reply with a single line and nothing else, in exactly this form, with percentages that add up to 100:
+
+    This image is **X% likely to be genuine**, **Y% likely to be manipulated**, and **Z% likely to be used in a misleading context**.
+    """)
+
+IMAGE_STRUCTURED_PROMPT = textwrap.dedent("""
+    You are TruthLens, an AI that analyzes images for authenticity. Fill in every field of the response:
+
+    - genuinePercent, falsePercent, misleadingPercent: the probabilities, adding up to 100, that the image is genuine, manipulated, or used in a misleading context.
+    - fakeImage: the probability of this image being AI-generated or completely fabricated, and your reasoning.
+    - credibilityAssessment: an overall assessment of the image's authenticity and reliability.
+    - identifiedIssues: specific visual problems (quality issues, lighting or shadow inconsistencies, unnatural transitions, suspicious overlays).
+    - contextualAnalysis: what the image shows and how it could be presented misleadingly, including any watermarks or identifying marks.
+    - verificationSteps: specific actionable steps (reverse image search, source verification, cross-referencing).
+
+    Keep the whole analysis between 200 and 250 words.
+    """)
+
+IMAGE_PROMPT = textwrap.dedent("""
+    You are TruthLens, an AI that analyzes images for authenticity. Provide a detailed analysis using this EXACT format:
+
+    This image is **X% likely to be genuine**, **Y% likely to be manipulated**, and **Z% likely to be used in a misleading context**.
+
+    1. **Fake Image**: Assess the probability of this image being AI-generated or completely fabricated. Explain your reasoning.
+
+    2. **Credibility Assessment**: Provide an overall assessment of the image's authenticity and reliability.
+
+    3. **Identified Issues**: List specific visual problems you noticed:
+       - Image quality issues (pixelation, blurriness, compression artifacts)
+       - Lighting inconsistencies or shadows that don't match
+       - Unnatural transitions between elements
+       - Text or graphic overlays that seem suspicious
+
+    4. **Contextual Analysis**: Analyze what the image shows and potential context issues:
+       - What scenes or elements are depicted
+       - How they might be connected or disconnected
+       - Potential for misleading presentation
+       - Any watermarks, stamps, or identifying marks
+
+    5. **Verification Steps**: Provide specific actionable steps:
+       - Reverse image search recommendations
+       - Source verification methods
+       - Cross-referencing suggestions
+       - Technical analysis recommendations
+
+    Make sure the percentages in the first line add up to 100%. Use **bold text** for emphasis.
+    """)
+
+def analyze_uploaded_image(image, structured=False, tier='deep', model_name=DEFAULT_MODEL):
+    """Ask Gemini to analyze an uploaded image.
+    
+    Args:
+        image: The prepared image blob ({'mime_type', 'data'}) or a PIL image.
+        structured (bool): Ask for JSON matching response_schema('image') instead of prose.
+        tier (str): 'quick' asks for the summary line only, under a small
+            output cap (the caller sets its deadline).
+        model_name (str): Gemini model to ask (chosen by model_routing).
+    """
+    if isinstance(image, dict):
+        payload_bytes.observe(len(image['data']), kind='image')
+    
+    if tier == 'quick':
+        response = gemini.generate(
+            [IMAGE_QUICK_PROMPT, image], model_name, generation_config=quick_generation_config()
+        )
+        return response.text
+    
+    if structured:
+        response = gemini.generate(
+            [IMAGE_STRUCTURED_PROMPT, image], model_name,
+            generation_config=generation_config(response_schema('image'))
+        )
+        return response.text
+    
+    # Use Gemini to analyze the image directly (the caller holds a model slot)
+    response = gemini.generate([IMAGE_PROMPT, image], model_name)
+    return response.text
+
+MULTI_IMAGE_PROMPT = textwrap.dedent("""
+    You are TruthLens, an AI that analyzes images for authenticity. You are given {count} images that were submitted together, in this order:
+
+    {images}
+
+    Frames of one animation are consecutive moments of the same upload. Judge the images as one piece of content. Provide your analysis using this EXACT format:
+
+    These images are **X% likely to be genuine**, **Y% likely to be manipulated**, and **Z% likely to be used in a misleading context**.
+
+    Then one line for each image, in order:
+
+    **Image N**: A% likely to be genuine. One or two sentences on what it shows and any sign of manipulation or misleading use.
+
+    Then:
+
+    1. **Credibility Assessment**: An overall assessment of the images taken together, including whether they are consistent with each other.
+
+    2. **Identified Issues**: Specific visual problems, naming the images they appear in.
+
+    3. **Verification Steps**: Specific actionable steps, such as reverse image searches of the key images.
+
+    Make sure the percentages in the first line add up to 100%. Use **bold text** for emphasis.
+    """)
+
+def analyze_uploaded_frames(frames, model_name=DEFAULT_MODEL):
+    """Ask Gemini to analyze several images (uploads or keyframes) together
+    in one call.
+    
+    Args:
+        frames (list): The Frames to send, in order.
+        model_name (str): Gemini model to ask (chosen by model_routing).
+    """
+    blobs = [frame.blob for frame in frames]
+    payload_bytes.observe(sum(len(blob['data']) for blob in blobs), kind='image')
+    prompt = MULTI_IMAGE_PROMPT.format(count=len(frames), images=describe_frames(frames))
+    response = gemini.generate([prompt, *blobs], model_name)
+    return response.text
+
+def analyze_frames(key, frames, image_hash=None):
+    """Analyze several frames as one piece of content, in one model call.
+    
+    Args:
+        key (str): Cache key of the content.
+        frames (list): The Frames to send, in order.
+        image_hash (str): SHA-256 of the file, when the frames come from one upload.
+    
+    Returns:
+        tuple: (result, status) as for analyze_text_cached; the result has a
+        'frames' entry with the note on each frame.
+    """
+    def analyze():
+        analysis, result = analyze_with_mode(
+            'image', key, lambda structured, model_name: analyze_uploaded_frames(frames, model_name),
+            allow_structured=False
+        )
+        result['frames'] = frame_notes(analysis, frames)
+        verdict_cache.set(key, result)
+        verdict_store.record('image', key, result, image_hash=image_hash)
+        return result
+    
+    try:
+        # Identical sets in flight share one Gemini call
+        result, shared = image_flight.do(key, analyze)
+    except ServerBusy:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error analyzing images: {str(e)}")
+        return parse_analysis_to_json("Unable to analyze the images. Please try again."), 'ERROR'
+    return result, 'COALESCED' if shared else 'MISS'
+
+def image_etag(digest, tier, result):
+    """ETag of the verdict served for an image file.
+
+    The file's SHA-256 and the tier (if not deep), plus a short hash of the
+    verdict itself, so the tag changes when a re-analysis or a deep verdict
+    replaces the one a client holds.
+    """
+    verdict = hashlib.sha256(json.dumps(result, sort_keys=True).encode()).hexdigest()[:16]
+    return f'{tier_key(digest, tier)}:{verdict}'
+
+def analyze_image_cached(stream, tier='deep'):
+    """Analyze an uploaded image file, serving repeats from the shared caches.
+
+    Args:
+        stream: The uploaded file, positioned at its start.
+        tier (str): 'deep' or 'quick'; quick requests may be served a deep verdict.
+
+    Returns:
+        tuple: (result, status, distance, digest) where status is 'HIT',
+        'MISS', 'COALESCED' or 'ERROR' as for analyze_text_cached, distance is
+        the dHash distance of a near-duplicate hit (None otherwise) and digest
+        is the SHA-256 of the file.
+
+    Raises:
+        ImageRejected: If the file is not an image that may be decoded.
+    """
+    # Exact re-uploads are answered from the shared cache before decoding
+    with span('hash'):
+        digest = file_sha256(stream)
+    image_key = f'image:{digest}'
+    with span('cache_lookup'):
+        result = verdict_cache.get_any(lookup_keys(image_key, tier))
+    if result is not None:
+        return result, 'HIT', None, digest
+    
+    # Decode once, straight to the resolution the model needs; a deep
+    # analysis of an animation looks at its keyframes, all in one call
+    if tier == 'quick':
+        prepared = prepare_image(stream, QUICK_IMAGE_MAX_SIDE)
+    else:
+        frames = prepare_frames(stream)
+        if len(frames) > 1:
+            result, status = analyze_frames(image_key, frames, digest)
+            return result, status, None, digest
+        prepared = frames[0]
+    
+    try:
+        # Re-uploads of an already analyzed image reuse the stored verdict
+        with span('image_index'):
+            image_hash = dhash(prepared.image)
+            match = image_index.lookup(image_hash)
+        if match is not None:
+            # Keyed on this file too, so its pre-check knows the verdict
+            verdict_cache.set(image_key, match[0])
+            return match[0], 'HIT', match[1], digest
+        
+        def analyze():
+            _, result = analyze_with_mode(
+                'image', image_key,
+                lambda structured, model_name: analyze_uploaded_image(prepared.blob, structured, tier, model_name),
+                tier
+            )
+            if tier == 'deep':
+                image_index.add(image_hash, result)
+            verdict_cache.set(tier_key(image_key, tier), result)
+            verdict_store.record('image', image_key, result, image_hash=digest, tier=tier)
+            return result
         
+        # Identical uploads in flight share one Gemini call
+        result, shared = image_flight.do(tier_key(image_key, tier), analyze)
+        return result, 'COALESCED' if shared else 'MISS', None, digest
+        
+    except ServerBusy:
+        raise
     except Exception as e:
-        return {
-            "isTrue": False,
-            "confidence": 50,
-            "explanation": f"Analysis completed: {analysis_text}",
-            "sources": []
-        }
+        app.logger.error(f"Error analyzing image: {str(e)}")
+        return parse_analysis_to_json("Unable to analyze the image. Please try again."), 'ERROR', None, digest
+
+def run_text_job(payload, params):
+    """Job handler: analyze a submitted text as /check-text would."""
+    # Jobs are not interactive; they yield upstream quota like batch items
+    with batch_priority():
+        result, cache_status = analyze_text_cached(payload.decode('utf-8'), params.get('tier', 'deep'))
+    if cache_status == 'ERROR':
+        raise JobFailed('An error occurred while analyzing the text. Please try again.')
+    return result, cache_status
+
+def run_image_job(payload, params):
+    """Job handler: analyze an uploaded image as /check-image would."""
+    try:
+        with batch_priority():
+            result, cache_status, _, _ = analyze_image_cached(BytesIO(payload), params.get('tier', 'deep'))
+    except ImageRejected as e:
+        raise JobFailed(str(e))
+    if cache_status == 'ERROR':
+        raise JobFailed('An error occurred while analyzing the image. Please try again.')
+    return result, cache_status
+
+# Asynchronous analyses (POST /jobs), stored in SQLite so they outlive their worker
+jobs = JobQueue({'text': run_text_job, 'image': run_image_job})
 
 @app.route('/check-text', methods=['POST'])
 @limiter.limit("10 per minute")
@@ -150,29 +584,52 @@ def check_text():
         if not request.is_json:
             return jsonify({'error': 'Content-Type must be application/json'}), 400
             
-        data = request.get_json()
-        if not data:
+        # Bounded read: oversized bodies are refused before they are parsed
+        try:
+            with span('read'):
+                data = read_json(request)
+        except InputTooLarge as e:
+            return input_too_large(e)
+        except ValueError:
+            return jsonify({'error': 'Invalid JSON data'}), 400
+        if not isinstance(data, dict) or not data:
             return jsonify({'error': 'Invalid JSON data'}), 400
             
         text = data.get('text')
-        if not text:
+        if not isinstance(text, str) or not text:
             return jsonify({'error': 'No text provided'}), 400
+        try:
+            check_text_field(text)
+        except InputTooLarge as e:
+            return input_too_large(e)
         
-        # Sanitize and validate input
-        text = sanitize_text(text)
+        try:
+            tier = parse_tier(data.get('tier'))
+            mode = parse_mode(data.get('mode'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Sanitize and validate input; documents keep their whole text
+        with span('sanitize'):
+            text = sanitize_text(text, TEXT_MAX_INPUT_CHARS if mode == 'document' else TEXT_MAX_CHARS)
         if len(text) < 10:
             return jsonify({'error': 'Text too short (minimum 10 characters)'}), 400
         
-        app.logger.info(f"Analyzing text: {text[:50]}...")
-        
-        # Get analysis from your friend's function
-        analysis = analyze_text_for_misinformation(text)
-        
-        # Convert to expected JSON format
-        result = parse_analysis_to_json(analysis)
+        if mode == 'document':
+            result, cache_status, chunk_count = analyze_document(text, tier)
+        else:
+            result, cache_status = analyze_text_cached(text, tier)
         
-        return jsonify(result)
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        response.headers['X-Analysis-Tier'] = tier
+        if mode == 'document':
+            response.headers['X-Document-Chunks'] = str(chunk_count)
+        return response
         
+    except ServerBusy as e:
+        app.logger.warning(f"check_text rejected: {str(e)}")
+        return server_busy()
     except Exception as e:
         app.logger.error(f"Error in check_text: {str(e)}")
         return jsonify({
@@ -182,15 +639,172 @@ def check_text():
             'sources': []
         }), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/check-text/stream', methods=['POST'])
+@limiter.limit("10 per minute")
+def check_text_stream():
+    """Stream a text analysis as Server-Sent Events.
+    
+    Emits a `verdict` event as soon as the percentage summary line has been
+    generated, `chunk` events with the explanation as it arrives, and a final
+    `result` event with the same JSON that /check-text returns. A verdict
+    reused from the caches or the pre-screen (X-Cache as for /check-text)
+    is sent as the `result` event alone.
+    """
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+    
+    try:
+        data = read_json(request)
+    except InputTooLarge as e:
+        return input_too_large(e)
+    except ValueError:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+    text = data.get('text') if isinstance(data, dict) else None
+    if not isinstance(text, str) or not text:
+        return jsonify({'error': 'No text provided'}), 400
+    try:
+        check_text_field(text)
+    except InputTooLarge as e:
+        return input_too_large(e)
+    
+    text = sanitize_text(text)
+    if len(text) < 10:
+        return jsonify({'error': 'Text too short (minimum 10 characters)'}), 400
+    
+    # The same shortcuts as /check-text, before a model slot or stream is opened
+    cache_key = text_cache_key(text)
+    reused, cache_status, signature = reuse_text_verdict(text, cache_key)
+    
+    def generate():
+        if reused is not None:
+            yield sse_event('result', reused)
+            return
+        
+        analysis = ''
+        verdict_sent = False
+        try:
+            with model_slots.slot():
+                for piece in stream_text_analysis(text, router.final_model(route_name('text'))):
+                    analysis += piece
+                    if not verdict_sent and extract_percentages(analysis.lower()):
+                        early = parse_analysis_to_json(analysis)
+                        yield sse_event('verdict', {'isTrue': early['isTrue'], 'confidence': early['confidence']})
+                        verdict_sent = True
+                    yield sse_event('chunk', {'text': piece})
+        except ServerBusy as e:
+            app.logger.warning(f"check_text_stream rejected: {str(e)}")
+            yield sse_event('error', {'error': 'Server busy. Please try again later.'})
+            return
+        except Exception as e:
+            app.logger.error(f"Error in check_text_stream: {str(e)}")
+            yield sse_event('error', {'error': 'An error occurred while analyzing the text. Please try again.'})
+            return
+        
+        if not analysis:
+            yield sse_event('error', {'error': 'An error occurred while analyzing the text. Please try again.'})
+            return
+        
+        result = parse_analysis_to_json(analysis)
+        verdict_cache.set(cache_key, result)
+        verdict_store.record('text', cache_key, result, text=text)
+        text_index.add(text, result, signature)
+        prescreen.learn(text, result)
+        yield sse_event('result', result)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'X-Cache': cache_status
+    })
+
+@app.route('/check-text/batch', methods=['POST'])
+@limiter.limit("5 per minute")
+def check_text_batch():
+    """Check up to BATCH_MAX_ITEMS texts in one request.
+
+    Duplicate texts are analyzed once, and distinct texts are analyzed
+    concurrently on a bounded thread pool. Results come back in request order;
+    an item that fails validation or analysis gets an {'error': ...} entry.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'Content-Type must be application/json'}), 400
+        
+        try:
+            data = read_json(request, TEXT_MAX_BODY_BYTES * BATCH_MAX_ITEMS)
+        except InputTooLarge as e:
+            return input_too_large(e)
+        except ValueError:
+            return jsonify({'error': 'Invalid JSON data'}), 400
+        texts = data.get('texts') if isinstance(data, dict) else None
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'No texts provided'}), 400
+        if len(texts) > BATCH_MAX_ITEMS:
+            return jsonify({'error': f'Too many texts (maximum {BATCH_MAX_ITEMS} per batch)'}), 400
+        
+        # Validate every item and submit each distinct text once
+        futures = {}
+        items = []
+        for text in texts:
+            if not isinstance(text, str) or not text:
+                items.append({'error': 'No text provided'})
+                continue
+            try:
+                check_text_field(text)
+            except InputTooLarge as e:
+                items.append({'error': str(e)})
+                continue
+            text = sanitize_text(text)
+            if len(text) < 10:
+                items.append({'error': 'Text too short (minimum 10 characters)'})
+                continue
+            key = text_cache_key(text)
+            if key not in futures:
+                # Batch items yield upstream quota to interactive requests
+                futures[key] = batch_executor.submit(run_as_batch, analyze_text_cached, text)
+            items.append(key)
+        
+        results = []
+        for item in items:
+            if isinstance(item, dict):
+                results.append(item)
+                continue
+            try:
+                result, cache_status = futures[item].result()
+            except ServerBusy:
+                results.append({'error': 'Server busy. Please try again later.'})
+                continue
+            except Exception as e:
+                app.logger.error(f"Error in check_text_batch item: {str(e)}")
+                cache_status = 'ERROR'
+            if cache_status == 'ERROR':
+                results.append({'error': 'An error occurred while analyzing the text. Please try again.'})
+            else:
+                results.append(result)
+        
+        return jsonify({'results': results})
+        
+    except Exception as e:
+        app.logger.error(f"Error in check_text_batch: {str(e)}")
+        return jsonify({'error': 'An error occurred while analyzing the batch. Please try again.'}), 500
+
 @app.route('/check-image', methods=['POST'])
 @limiter.limit("5 per minute")  # Lower limit for image processing
 def check_image():
     try:
+        # The first access to request.files parses the multipart body
+        with span('multipart'):
+            files = request.files
+        
         # Validate file upload
-        if 'image' not in request.files:
+        if 'image' not in files:
             return jsonify({'error': 'No image provided'}), 400
         
-        file = request.files['image']
+        file = files['image']
         if file.filename == '':
             return jsonify({'error': 'No image selected'}), 400
         
@@ -201,93 +815,274 @@ def check_image():
         # Secure filename
         filename = secure_filename(file.filename)
         
-        # Save the uploaded image temporarily and analyze it directly
-        from PIL import Image
-        import google.generativeai as genai
-        import textwrap
+        try:
+            tier = parse_tier(request.form.get('tier') or request.args.get('tier'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         try:
-            # Open and validate the image
-            image = Image.open(file.stream)
-            
-            # Security: Verify it's actually an image and not malicious file
-            image.verify()
-            file.stream.seek(0)  # Reset stream after verify
-            image = Image.open(file.stream)
-            
-            # Convert to RGB and limit size for security
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Limit image size to prevent memory exhaustion
-            max_size = (2048, 2048)
-            if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-                image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Use Gemini to analyze the image directly
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            
-            prompt = textwrap.dedent("""
-            You are TruthLens, an AI that analyzes images for authenticity. Provide a detailed analysis using this EXACT format:
-
-            This image is **X% likely to be genuine**, **Y% likely to be manipulated**, and **Z% likely to be used in a misleading context**.
-
-            1. **Fake Image**: Assess the probability of this image being AI-generated or completely fabricated. Explain your reasoning.
-
-            2. **Credibility Assessment**: Provide an overall assessment of the image's authenticity and reliability.
-
-            3. **Identified Issues**: List specific visual problems you noticed:
-               - Image quality issues (pixelation, blurriness, compression artifacts)
-               - Lighting inconsistencies or shadows that don't match
-               - Unnatural transitions between elements
-               - Text or graphic overlays that seem suspicious
-
-            4. **Contextual Analysis**: Analyze what the image shows and potential context issues:
-               - What scenes or elements are depicted
-               - How they might be connected or disconnected
-               - Potential for misleading presentation
-               - Any watermarks, stamps, or identifying marks
+            result, cache_status, distance, digest = analyze_image_cached(file.stream, tier)
+        except ImageRejected as e:
+            app.logger.warning(f"Rejected image upload: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+        
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        if distance is not None:
+            response.headers['X-Image-Distance'] = str(distance)
+        response.headers['X-Analysis-Tier'] = tier
+        if cache_status != 'ERROR':
+            # Errors are not cached, so there is nothing to pre-check
+            response.set_etag(image_etag(digest, tier, result))
+        return response
+        
+    except ServerBusy as e:
+        app.logger.warning(f"check_image rejected: {str(e)}")
+        return server_busy()
+    except Exception as e:
+        app.logger.error(f"Error in check_image: {str(e)}")
+        return jsonify({
+            'isTrue': False,
+            'confidence': 0,
+            'explanation': 'An error occurred while analyzing the image. Please try again.',
+            'sources': []
+        }), 500
 
-            5. **Verification Steps**: Provide specific actionable steps:
-               - Reverse image search recommendations
-               - Source verification methods
-               - Cross-referencing suggestions
-               - Technical analysis recommendations
+@app.route('/check-image/<digest>', methods=['GET'])
+@limiter.limit("60 per minute")
+def check_image_known(digest):
+    """Pre-check for /check-image, by the SHA-256 of the file's bytes.
+    
+    Returns the verdict when that exact file was already analyzed (a 304
+    when If-None-Match has its ETag), or 404 when the client should upload
+    it. HEAD returns the same status and headers without the body.
+    """
+    digest = digest.lower()
+    if not is_sha256(digest):
+        return jsonify({'error': 'Expected the SHA-256 hex digest of the image file'}), 400
+    try:
+        tier = parse_tier(request.args.get('tier'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with span('cache_lookup'):
+        result = verdict_cache.get_any(lookup_keys(f'image:{digest}', tier))
+    if result is None:
+        response = jsonify({'error': 'Image not analyzed yet. Upload it to /check-image.'})
+        response.status_code = 404
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    
+    response = jsonify(result)
+    response.headers['X-Cache'] = 'HIT'
+    response.headers['X-Analysis-Tier'] = tier
+    response.set_etag(image_etag(digest, tier, result))
+    # A later re-analysis may change the verdict (and so the ETag): clients revalidate
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
-            Make sure the percentages in the first line add up to 100%. Use **bold text** for emphasis.
-            """)
-            
-            response = model.generate_content([prompt, image])
-            analysis = response.text
-            
-        except Exception as e:
-            app.logger.error(f"Error analyzing image: {str(e)}")
-            analysis = "Unable to analyze the image. Please ensure it's a valid image file."
+@app.route('/check-images', methods=['POST'])
+@limiter.limit("5 per minute")
+def check_images():
+    """Check several images (e.g. screenshots of one thread) as one piece of
+    content, in one model call.
+    
+    Animated uploads contribute their keyframes. Returns one verdict for the
+    set, with a note on each image under 'frames'.
+    """
+    try:
+        with span('multipart'):
+            uploads = [file for file in request.files.getlist('images') if file.filename]
+        if not uploads:
+            return jsonify({'error': 'No images provided'}), 400
+        if len(uploads) > MULTI_IMAGE_MAX_FILES:
+            return jsonify({'error': f'Too many images (maximum {MULTI_IMAGE_MAX_FILES})'}), 400
+        if not all(allowed_file(file.filename) for file in uploads):
+            return jsonify({'error': 'Invalid file type. Only PNG, JPG, JPEG, GIF, and WebP are allowed.'}), 400
+        filenames = [secure_filename(file.filename) for file in uploads]
         
-        # Convert to expected JSON format
-        result = parse_analysis_to_json(analysis)
+        # The same files in the same order are answered from the cache before decoding
+        with span('hash'):
+            digests = [file_sha256(file.stream) for file in uploads]
+        key = 'images:' + hashlib.sha256(':'.join(digests).encode()).hexdigest()
+        with span('cache_lookup'):
+            result = verdict_cache.get(key)
+        cache_status = 'HIT'
         
-        return jsonify(result)
+        if result is None:
+            # Share the frame budget of one call between the uploads
+            per_upload = max(1, min(ANIMATION_MAX_FRAMES, MULTI_IMAGE_MAX_FRAMES // len(uploads)))
+            frames = []
+            for upload, (file, filename) in enumerate(zip(uploads, filenames), 1):
+                try:
+                    frames += prepare_frames(file.stream, upload, per_upload, FRAME_MAX_SIDE)
+                except ImageRejected as e:
+                    app.logger.warning(f"Rejected image upload: {str(e)}")
+                    return jsonify({'error': f'{filename}: {str(e)}'}), 400
+            result, cache_status = analyze_frames(key, frames)
         
+        if 'frames' in result:
+            result = {**result, 'frames': [
+                {**item, 'filename': filenames[item['upload'] - 1]} for item in result['frames']
+            ]}
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        response.headers['X-Frames'] = str(len(result.get('frames', [])))
+        return response
+    
+    except ServerBusy as e:
+        app.logger.warning(f"check_images rejected: {str(e)}")
+        return server_busy()
     except Exception as e:
-        app.logger.error(f"Error in check_image: {str(e)}")
+        app.logger.error(f"Error in check_images: {str(e)}")
         return jsonify({
             'isTrue': False,
             'confidence': 0,
-            'explanation': 'An error occurred while analyzing the image. Please try again.',
+            'explanation': 'An error occurred while analyzing the images. Please try again.',
             'sources': []
         }), 500
 
+@app.route('/jobs', methods=['POST'])
+@limiter.limit("10 per minute")
+def create_job():
+    """Queue a text or image analysis and return its job id at once.
+
+    Accepts the body of /check-text (JSON with 'text' and an optional 'tier')
+    or of /check-image (an 'image' upload with an optional 'tier' field).
+    Poll GET /jobs/<id> for the result.
+    """
+    try:
+        if request.is_json:
+            try:
+                data = read_json(request)
+            except InputTooLarge as e:
+                return input_too_large(e)
+            except ValueError:
+                return jsonify({'error': 'Invalid JSON data'}), 400
+            text = data.get('text') if isinstance(data, dict) else None
+            if not isinstance(text, str) or not text:
+                return jsonify({'error': 'No text provided'}), 400
+            try:
+                check_text_field(text)
+            except InputTooLarge as e:
+                return input_too_large(e)
+            try:
+                tier = parse_tier(data.get('tier'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            text = sanitize_text(text)
+            if len(text) < 10:
+                return jsonify({'error': 'Text too short (minimum 10 characters)'}), 400
+            job_id = jobs.submit('text', text.encode('utf-8'), {'tier': tier})
+        elif 'image' in request.files:
+            file = request.files['image']
+            if file.filename == '':
+                return jsonify({'error': 'No image selected'}), 400
+            if not allowed_file(file.filename):
+                return jsonify({'error': 'Invalid file type. Only PNG, JPG, JPEG, GIF, and WebP are allowed.'}), 400
+            try:
+                tier = parse_tier(request.form.get('tier') or request.args.get('tier'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            job_id = jobs.submit('image', file.read(), {'tier': tier})
+        else:
+            return jsonify({'error': 'Provide JSON with a text or an image upload'}), 400
+    except Exception as e:
+        app.logger.error(f"Error in create_job: {str(e)}")
+        return jsonify({'error': 'The job could not be queued. Please try again.'}), 500
+    
+    response = jsonify({'id': job_id, 'status': 'queued', 'statusUrl': f'/jobs/{job_id}'})
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@limiter.limit("120 per minute")
+def get_job(job_id):
+    """Status of a job, with its result once done"""
+    try:
+        job = jobs.get(job_id)
+    except Exception as e:
+        app.logger.error(f"Error in get_job: {str(e)}")
+        return jsonify({'error': 'Internal server error. Please try again later.'}), 500
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    response = jsonify(job)
+    if job['status'] in ('queued', 'running'):
+        response.headers['Retry-After'] = '2'
+    return response
+
+@app.route('/search', methods=['GET'])
+@limiter.limit("60 per minute")
+def search():
+    """Ranked, paginated lookup of earlier verdicts for moderators.
+
+    Query parameters: q (words to match in the analyzed text or explanation;
+    a trailing * matches a prefix) or image (SHA-256 of an image file), and
+    optionally kind ('text' or 'image'), page and per_page. Requires the
+    X-API-Key header to match SEARCH_API_KEY.
+    """
+    if not SEARCH_API_KEY:
+        return jsonify({'error': 'Search is not enabled on this server'}), 403
+    if not hmac.compare_digest(request.headers.get('X-API-Key', '').encode(), SEARCH_API_KEY.encode()):
+        return jsonify({'error': 'Invalid or missing API key'}), 401
+    
+    query = request.args.get('q', '')
+    image = request.args.get('image', '').strip().lower()
+    kind = request.args.get('kind') or None
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+    if page < 1 or not 1 <= per_page <= SEARCH_MAX_PER_PAGE:
+        return jsonify({'error': f'page must be at least 1 and per_page between 1 and {SEARCH_MAX_PER_PAGE}'}), 400
+    if kind not in (None, 'text', 'image'):
+        return jsonify({'error': 'Invalid kind (expected one of: text, image)'}), 400
+    if image and not is_sha256(image):
+        return jsonify({'error': 'image must be a SHA-256 hex digest'}), 400
+    
+    try:
+        with span('search'):
+            if image:
+                results, has_more = verdict_store.lookup_image(image, per_page), False
+            else:
+                results, has_more = verdict_store.search(query, kind, per_page, (page - 1) * per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error in search: {str(e)}")
+        return jsonify({'error': 'Internal server error. Please try again later.'}), 500
+    
+    return jsonify({
+        'query': image or query,
+        'page': page,
+        'perPage': per_page,
+        'hasMore': has_more,
+        'results': results
+    })
+
 @app.route('/analyze-text', methods=['POST'])
 def analyze_text():
     """Legacy endpoint for compatibility"""
-    data = request.json
-    text = data.get('text')
+    try:
+        data = read_json(request)
+    except InputTooLarge as e:
+        return input_too_large(e)
+    except ValueError:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+    text = data.get('text') if isinstance(data, dict) else None
     
-    if not text:
+    if not isinstance(text, str) or not text:
         return jsonify({'error': 'No text provided'}), 400
+    try:
+        check_text_field(text)
+    except InputTooLarge as e:
+        return input_too_large(e)
     
-    analysis = analyze_text_for_misinformation(text)
+    try:
+        analysis = analyze_text_for_misinformation(text, model_name=router.final_model(route_name('text')))
+    except ServerBusy:
+        return server_busy()
     return jsonify({'analysis': analysis})
 
 @app.route('/analyze-image', methods=['POST'])
@@ -299,7 +1094,7 @@ def analyze_image():
     if not image_url:
         return jsonify({'error': 'No image URL provided'}), 400
     
-    analysis = analyze_image_for_misinformation(image_url)
+    analysis = analyze_image_for_misinformation(image_url, router.final_model(route_name('image')))
     return jsonify({'analysis': analysis})
 
 @app.route('/health', methods=['GET'])
@@ -307,14 +1102,43 @@ def analyze_image():
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'TruthLens API is running'})
 
+@app.route('/stats', methods=['GET'])
+@limiter.limit("30 per minute")
+def stats():
+    """Cache and index counters (shared by all workers), plus this worker's
+    model slots and Gemini call metrics"""
+    return jsonify({
+        'verdictCache': verdict_cache.stats(),
+        'imageIndex': image_index.stats(),
+        'textIndex': text_index.stats(),
+        'prescreen': prescreen.stats(),
+        'singleFlight': {
+            'text': text_flight.stats(),
+            'image': image_flight.stats()
+        },
+        'modelSlots': model_slots.stats(),
+        'gemini': gemini.stats(),
+        'quota': quota_governor.stats(),
+        'jobs': jobs.stats(),
+        'verdictStore': verdict_store.stats(),
+        'outputModes': mode_metrics.stats(),
+        'tiers': tier_metrics.stats(),
+        'routing': router.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def prometheus_metrics():
+    """Stage timings, upstream latency, cache results and payload sizes,
+    summed over all workers, in Prometheus text format"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/test-gemini', methods=['GET'])
 @limiter.limit("5 per minute")
 def test_gemini():
     """Test endpoint to verify Gemini API is working - Remove in production"""
     try:
-        import google.generativeai as genai
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content("Say 'Hello from Gemini!' if you can read this.")
+        response = gemini.generate("Say 'Hello from Gemini!' if you can read this.")
         return jsonify({
             'status': 'success',
             'message': 'Gemini API is working',
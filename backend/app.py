@@ -1,24 +1,57 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import google.generativeai as genai
 import textwrap
 from PIL import Image
 import requests
 from io import BytesIO
 import os
 import re
+import sys
 import base64
 
+# Share the resilient Gemini client with the main API in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gemini_client import DEFAULT_MODEL, client as gemini
+from model_routing import route_name, router
+from structured_output import generation_config, load_object, use_structured
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Configure the Gemini API
-genai.configure()
+# Schema for the structured-output arm (share set by STRUCTURED_OUTPUT_SHARE)
+RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'isTrue': {'type': 'boolean'},
+        'confidence': {'type': 'integer'},
+        'explanation': {'type': 'string'},
+        'sources': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'title': {'type': 'string'},
+                    'url': {'type': 'string'},
+                    'domain': {'type': 'string'}
+                },
+                'required': ['title', 'url', 'domain']
+            }
+        }
+    },
+    'required': ['isTrue', 'confidence', 'explanation', 'sources']
+}
+
+# Start of the fallback explanation parse_gemini_response returns for unreadable output
+FORMAT_ERROR = "Analysis completed but response formatting error occurred."
 
-def analyze_text_for_misinformation(text: str):
+def generate(contents, structured, model_name=DEFAULT_MODEL):
+    """Call Gemini, constraining the output to RESPONSE_SCHEMA if structured."""
+    if structured:
+        return gemini.generate(contents, model_name, generation_config=generation_config(RESPONSE_SCHEMA))
+    return gemini.generate(contents, model_name)
+
+def analyze_text_for_misinformation(text: str, structured: bool = False, model_name: str = DEFAULT_MODEL):
     """Analyzes a given text for misinformation and provides a detailed breakdown."""
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    
     prompt = textwrap.dedent(f"""
     You are an AI-powered fact-checking tool. Analyze the following text and provide a JSON-structured response with these exact fields:
 
@@ -47,15 +80,13 @@ def analyze_text_for_misinformation(text: str):
     """)
     
     try:
-        response = model.generate_content(prompt)
+        response = generate(prompt, structured, model_name)
         return response.text
     except Exception as e:
         return f"Error: {e}"
 
-def analyze_image_for_misinformation(image):
+def analyze_image_for_misinformation(image, structured: bool = False, model_name: str = DEFAULT_MODEL):
     """Analyzes an uploaded image for signs of manipulation or false context."""
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    
     prompt = textwrap.dedent("""
     You are an AI that helps identify manipulated or misleading images. Analyze the provided image and respond with a JSON-structured response with these exact fields:
 
@@ -82,27 +113,31 @@ def analyze_image_for_misinformation(image):
     """)
     
     try:
-        response = model.generate_content([prompt, image])
+        response = generate([prompt, image], structured, model_name)
         return response.text
     except Exception as e:
         return f"Error: {e}"
 
-def parse_gemini_response(response_text):
+def parse_gemini_response(response_text, structured=False):
     """Parse Gemini response and extract JSON, handling potential formatting issues."""
     try:
         # Try to find JSON in the response
         import json
         
-        # Remove any markdown formatting
-        cleaned_text = response_text.strip()
-        if cleaned_text.startswith('```json'):
-            cleaned_text = cleaned_text[7:]
-        if cleaned_text.endswith('```'):
-            cleaned_text = cleaned_text[:-3]
-        cleaned_text = cleaned_text.strip()
-        
-        # Try to parse as JSON
-        result = json.loads(cleaned_text)
+        if structured:
+            # Schema-constrained output is bare JSON, with no markdown to strip
+            result = load_object(response_text)
+        else:
+            # Remove any markdown formatting
+            cleaned_text = response_text.strip()
+            if cleaned_text.startswith('```json'):
+                cleaned_text = cleaned_text[7:]
+            if cleaned_text.endswith('```'):
+                cleaned_text = cleaned_text[:-3]
+            cleaned_text = cleaned_text.strip()
+            
+            # Try to parse as JSON
+            result = json.loads(cleaned_text)
         
         # Validate required fields
         if not all(key in result for key in ['isTrue', 'confidence', 'explanation']):
@@ -119,10 +154,38 @@ def parse_gemini_response(response_text):
         return {
             "isTrue": False,
             "confidence": 50,
-            "explanation": f"Analysis completed but response formatting error occurred. Raw response: {response_text[:500]}...",
+            "explanation": f"{FORMAT_ERROR} Raw response: {response_text[:500]}...",
             "sources": []
         }
 
+def analyze_routed(kind, analyze, structured):
+    """Analyze with the lite model first, escalating along the model route
+    when the verdict is unreadable or not confident enough.
+    
+    Args:
+        kind (str): 'text' or 'image'.
+        analyze: analyze(model_name) returns the raw model response.
+        structured (bool): Whether the response is schema-constrained JSON.
+    
+    Returns:
+        dict: The parsed verdict that was kept.
+    """
+    def call(model_name):
+        raw_response = analyze(model_name)
+        return raw_response, parse_gemini_response(raw_response, structured)
+    
+    def assess(outcome, threshold):
+        raw_response, result = outcome
+        if raw_response.startswith("Error: "):
+            return 'error'
+        if result['explanation'].startswith(FORMAT_ERROR) or not isinstance(result['confidence'], (int, float)):
+            return 'unparsed'
+        if result['confidence'] < threshold:
+            return 'low_confidence'
+        return None
+    
+    return router.run(route_name(kind), call, assess)[1]
+
 @app.route('/check-text', methods=['POST'])
 def check_text():
     try:
@@ -135,8 +198,10 @@ def check_text():
             return jsonify({'error': 'Empty text provided'}), 400
         
         # Analyze the text
-        raw_response = analyze_text_for_misinformation(text)
-        result = parse_gemini_response(raw_response)
+        structured = use_structured(text)
+        result = analyze_routed(
+            'text', lambda model_name: analyze_text_for_misinformation(text, structured, model_name), structured
+        )
         
         return jsonify(result)
         
@@ -168,8 +233,10 @@ def check_image():
             return jsonify({'error': f'Invalid image format: {str(e)}'}), 400
         
         # Analyze the image
-        raw_response = analyze_image_for_misinformation(image)
-        result = parse_gemini_response(raw_response)
+        structured = use_structured()
+        result = analyze_routed(
+            'image', lambda model_name: analyze_image_for_misinformation(image, structured, model_name), structured
+        )
         
         return jsonify(result)
         
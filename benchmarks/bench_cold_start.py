@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start cost and check it stays within budget.
+
+Each probe runs in a fresh interpreter with an empty data directory:
+
+* cold: times `import app` (median of --runs) and a first GET /health, and
+  checks that neither imported the Gemini SDK; then times warmup.preload(),
+  the work a preloading Gunicorn master does once before forking.
+* warm: with the fake Gemini stand-in installed, imports app, runs
+  warmup.preload() and sends a first /check-text and /check-image, and
+  checks that those requests imported no module the warm-up had not.
+
+Exits non-zero if the median import exceeds --budget seconds or either check
+fails, so it doubles as a regression check for new module-level imports.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs 5] [--budget 1.5]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SDK = 'google.generativeai'
+# Seconds a median `import app` may take (also checked by tests/test_cold_start.py)
+BUDGET = 1.5
+
+COLD_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+client = app.app.test_client()
+start = time.perf_counter()
+status = client.get('/health').status_code
+health = time.perf_counter() - start
+sdk = {SDK!r} in sys.modules
+import warmup
+print(json.dumps({{'import': imported, 'health': health, 'status': status, 'sdk': sdk,
+                  'preload': warmup.preload()}}))
+"""
+
+WARM_PROBE = """
+import io, json, sys, time
+sys.path.insert(0, 'benchmarks')
+import fake_gemini
+fake_gemini.install()
+import app, warmup
+from PIL import Image
+warmup.preload()
+client = app.app.test_client()
+buffer = io.BytesIO()
+Image.new('RGB', (64, 48), (200, 40, 40)).save(buffer, format='WEBP')
+before = set(sys.modules)
+timings = {}
+start = time.perf_counter()
+text = client.post('/check-text', json={'text': 'Breaking: a cold start probe claims something.'})
+timings['text'] = time.perf_counter() - start
+start = time.perf_counter()
+image = client.post('/check-image', data={'image': (io.BytesIO(buffer.getvalue()), 'probe.webp')})
+timings['image'] = time.perf_counter() - start
+print(json.dumps({'timings': timings, 'status': [text.status_code, image.status_code],
+                  'imported': sorted(set(sys.modules) - before)}))
+"""
+
+
+def probe(code):
+    data_dir = tempfile.mkdtemp(prefix='truthlens-cold-')
+    env = dict(os.environ, TRUTHLENS_DATA_DIR=data_dir, RATELIMIT_ENABLED='false',
+               FAKE_GEMINI_LATENCY='0')
+    try:
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        sys.exit(f"Probe failed:\n{e.stderr}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=BUDGET, help='maximum median `import app` time (s)')
+    args = parser.parse_args()
+
+    failures = []
+    cold = [probe(COLD_PROBE) for _ in range(args.runs)]
+    import_median = statistics.median(run['import'] for run in cold)
+    print(f"import app:        median {import_median * 1000:7.0f}ms  "
+          f"(min {min(run['import'] for run in cold) * 1000:.0f}ms, budget {args.budget * 1000:.0f}ms)")
+    print(f"first /health:     median {statistics.median(run['health'] for run in cold) * 1000:7.1f}ms")
+    print(f"warmup.preload():  median {statistics.median(run['preload'] for run in cold) * 1000:7.0f}ms  "
+          f"(paid once by a preloading master, else by each worker's first requests)")
+    if import_median > args.budget:
+        failures.append(f"import app took {import_median:.2f}s, over the {args.budget:.2f}s budget")
+    if any(run['sdk'] for run in cold):
+        failures.append(f"import app or /health imported {SDK}")
+    if any(run['status'] != 200 for run in cold):
+        failures.append("/health did not return 200")
+
+    warm = probe(WARM_PROBE)
+    print(f"first /check-text after warm-up:  {warm['timings']['text'] * 1000:7.1f}ms")
+    print(f"first /check-image after warm-up: {warm['timings']['image'] * 1000:7.1f}ms")
+    if warm['status'] != [200, 200]:
+        failures.append(f"first requests after warm-up returned {warm['status']}")
+    if warm['imported']:
+        failures.append(f"first requests after warm-up imported {', '.join(warm['imported'])}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
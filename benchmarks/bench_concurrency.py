@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent /check-text requests against a simulated slow model.
+
+Starts Gunicorn with gunicorn.conf.py for each worker configuration, serving
+the app against benchmarks/fake_gemini.py (every model call sleeps for
+--latency seconds), fires --requests unique texts at --concurrency, and
+reports throughput and latency.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--latency 1.0] [--concurrency 32]
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = [
+    ('sync', 1),
+    ('gthread', 8),
+    ('gthread', 32),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url + '/health', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become healthy")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(worker_class, threads, args):
+    port = free_port()
+    data_dir = tempfile.mkdtemp(prefix='truthlens-bench-')
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_THREADS=str(threads),
+        MODEL_MAX_CONCURRENCY=str(threads),
+        MODEL_QUEUE_TIMEOUT='60',
+        FAKE_GEMINI_LATENCY=str(args.latency),
+        RATELIMIT_ENABLED='false',
+        TRUTHLENS_DATA_DIR=data_dir,
+    )
+    server = subprocess.Popen(
+        ['gunicorn', '--config', 'gunicorn.conf.py', '--pythonpath', 'benchmarks',
+         '--timeout', '120', 'fake_app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_healthy(url)
+
+        def one(i):
+            start = time.perf_counter()
+            response = requests.post(
+                url + '/check-text',
+                json={'text': f'Benchmark claim number {i} about the moon landing {time.time()}'},
+                timeout=120
+            )
+            return response.status_code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    ok = [latency for status, latency in results if status == 200]
+    label = f"{args.workers} x {worker_class}" + (f" ({threads} threads)" if worker_class != 'sync' else '')
+    print(f"{label:<28} {len(ok):>4}/{len(results)} ok  "
+          f"{len(ok) / elapsed:7.2f} req/s  "
+          f"p50 {percentile(ok, 50):6.2f}s  p95 {percentile(ok, 95):6.2f}s  "
+          f"avg concurrent {len(ok) / elapsed * args.latency:5.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=1.0, help='simulated model latency (s)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=64)
+    args = parser.parse_args()
+
+    if shutil.which('gunicorn') is None:
+        sys.exit("gunicorn is not installed")
+    print(f"Simulated model latency {args.latency}s, {args.requests} requests at concurrency {args.concurrency}")
+    for worker_class, threads in CONFIGS:
+        run(worker_class, threads, args)
+
+
+if __name__ == '__main__':
+    main()
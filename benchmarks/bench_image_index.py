@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark near-duplicate lookups in the perceptual-hash index.
+
+Fills a HammingIndex with random 64-bit hashes and measures lookup latency for
+near-duplicate queries (a stored hash with a few bits flipped) and for misses.
+It also reports the Python memory the index holds (tracemalloc), which every
+worker pays, and the cost of evicting the oldest half of it.
+
+Usage:
+    python benchmarks/bench_image_index.py [--size 1000000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_index import HammingIndex
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, samples):
+    micros = [s * 1e6 for s in samples]
+    print(f"{label:<20} mean {statistics.mean(micros):8.1f}us  "
+          f"p50 {percentile(micros, 50):8.1f}us  "
+          f"p95 {percentile(micros, 95):8.1f}us  "
+          f"p99 {percentile(micros, 99):8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--distance', type=int, default=6)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    index = HammingIndex()
+
+    values = [rng.getrandbits(64) for _ in range(args.size)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i, value in enumerate(values):
+        index.add(value, i)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"Built index of {len(index):,} hashes in {elapsed:.1f}s, "
+          f"{memory / 2 ** 20:.0f}MB ({memory / args.size:.0f} B per entry)")
+
+    near, miss, found = [], [], 0
+    for _ in range(args.queries):
+        target = index.hashes[index.start + rng.randrange(len(index))]
+        for bit in rng.sample(range(64), rng.randint(0, args.distance)):
+            target ^= 1 << bit
+        start = time.perf_counter()
+        found += index.search(target, args.distance) is not None
+        near.append(time.perf_counter() - start)
+
+        query = rng.getrandbits(64)
+        start = time.perf_counter()
+        index.search(query, args.distance)
+        miss.append(time.perf_counter() - start)
+
+    print(f"Max Hamming distance {args.distance}, {args.queries} queries each")
+    report("near-duplicate", near)
+    report("miss", miss)
+    print(f"Recall on near-duplicates: {found / args.queries:.3f}")
+
+    start = time.perf_counter()
+    index.evict_before(args.size // 2)
+    print(f"Evicted the oldest {args.size - len(index):,} in {time.perf_counter() - start:.1f}s, "
+          f"{len(index):,} left")
+
+
+if __name__ == '__main__':
+    main()
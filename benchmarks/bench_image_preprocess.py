@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark image preprocessing latency and peak memory across sizes and formats.
+
+Compares the previous /check-image pipeline (verify, re-open, convert the full
+image to RGB, LANCZOS thumbnail to 2048px, then the lossless WebP encode the
+Gemini SDK applies to PIL images) with image_preprocess.prepare_image, which
+includes its own JPEG encode. Each measurement runs in a fresh subprocess and
+reads the peak RSS high-water mark (VmHWM, Linux only) from /proc.
+
+Usage:
+    python benchmarks/bench_image_preprocess.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = [(1280, 960), (4032, 3024), (6000, 4000)]
+FORMATS = ['JPEG', 'PNG', 'WEBP']
+
+MEASURE = r'''
+import io, json, sys, time
+sys.path.insert(0, {root!r})
+from PIL import Image
+Image.MAX_IMAGE_PIXELS = None
+
+def peak_rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+
+def legacy(path):
+    with open(path, 'rb') as stream:
+        image = Image.open(stream)
+        image.verify()
+        stream.seek(0)
+        image = Image.open(stream)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size[0] > 2048 or image.size[1] > 2048:
+            image.thumbnail((2048, 2048), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format='webp', lossless=True)
+        return len(buffer.getvalue())
+
+def prepared(path):
+    with open(path, 'rb') as stream:
+        return len(prepare_image(stream).blob['data'])
+
+from image_preprocess import prepare_image  # exclude import cost from the measurement
+fn = {{'legacy': legacy, 'prepare_image': prepared}}[sys.argv[2]]
+baseline = peak_rss_mb()
+start = time.perf_counter()
+payload = fn(sys.argv[1])
+elapsed = time.perf_counter() - start
+peak = peak_rss_mb()
+print(json.dumps({{'ms': elapsed * 1000, 'peak_mb': peak, 'delta_mb': peak - baseline, 'payload_kb': payload / 1024}}))
+'''
+
+
+def make_image(path, size, fmt):
+    from PIL import Image
+
+    noise = Image.effect_noise(size, 40).convert('L')
+    gradient = Image.linear_gradient('L').resize(size)
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    options = {'quality': 90} if fmt in ('JPEG', 'WEBP') else {}
+    image.save(path, fmt, **options)
+
+
+def measure(path, pipeline):
+    script = MEASURE.format(root=ROOT)
+    output = subprocess.run(
+        [sys.executable, '-c', script, path, pipeline],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    print(f"{'image':<22}{'file':>8}  {'pipeline':<15}{'latency':>10}{'peak RSS':>11}{'RSS growth':>12}{'upload':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in SIZES:
+            for fmt in FORMATS:
+                path = os.path.join(tmp, f'{width}x{height}.{fmt.lower()}')
+                make_image(path, (width, height), fmt)
+                file_mb = os.path.getsize(path) / (1024 * 1024)
+                for pipeline in ('legacy', 'prepare_image'):
+                    result = measure(path, pipeline)
+                    print(f"{f'{width}x{height} {fmt}':<22}{file_mb:>6.1f}MB  {pipeline:<15}"
+                          f"{result['ms']:>8.0f}ms{result['peak_mb']:>9.0f}MB{result['delta_mb']:>10.0f}MB"
+                          f"{result['payload_kb']:>8.0f}KB")
+
+
+if __name__ == '__main__':
+    main()
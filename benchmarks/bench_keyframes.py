@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark keyframe sampling and one multi-image call against N single calls.
+
+Part 1 builds animated GIFs of a few sizes and lengths. Each one is a
+handful of distinct scenes with a small moving detail on every frame. For
+each GIF it reports how many frames fit the decode budget, how long
+sample_keyframes takes, and which frames it picked. The picks should be one
+per scene among the frames scanned, up to ANIMATION_MAX_FRAMES.
+
+Part 2 runs the app in-process against the fake Gemini with a fixed
+--latency. It checks --images distinct screenshots first with one
+/check-image request each, then with one /check-images request, and reports
+wall time, model calls and bytes sent to the model.
+
+Usage:
+    python benchmarks/bench_keyframes.py [--latency 0.5] [--images 6]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLORS = ('red', 'green', 'blue', 'black', 'orange', 'purple', 'teal', 'gray')
+
+
+def animated_gif(size, frames, scenes):
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    images = []
+    for i in range(frames):
+        scene = i * scenes // frames
+        image = Image.new('RGB', size, 'white')
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([width * scene // (scenes + 1), height // 8,
+                        width * (scene + 1) // (scenes + 1), height // 2], fill=COLORS[scene % len(COLORS)])
+        # A detail that changes on every frame but is not a new scene
+        draw.ellipse([i % 50, height - 30, i % 50 + 12, height - 18], fill='black')
+        images.append(image)
+    buffer = io.BytesIO()
+    images[0].save(buffer, 'GIF', save_all=True, append_images=images[1:], duration=80, loop=0)
+    return buffer.getvalue()
+
+
+def screenshot(number, size=(1080, 1920)):
+    from PIL import Image, ImageDraw
+
+    # Distinct layouts, so the near-duplicate image index does not match them
+    rng = random.Random(number)
+    image = Image.new('RGB', size, COLORS[number % len(COLORS)])
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.rectangle([x, y, x + rng.randrange(100, 500), y + rng.randrange(100, 500)],
+                       fill=rng.choice(COLORS))
+    for line in range(40):
+        draw.text((40, 60 + line * 45), f"Message {number}.{line}: the minister said prices will fall", fill='white')
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.5, help='simulated model latency (s)')
+    parser.add_argument('--images', type=int, default=6, help='screenshots per set in part 2')
+    args = parser.parse_args()
+
+    os.environ.update(
+        TRUTHLENS_DATA_DIR=tempfile.mkdtemp(prefix='truthlens-keyframes-'),
+        RATELIMIT_ENABLED='false',
+        ROUTING_ENABLED='false',
+        FAKE_GEMINI_LATENCY=str(args.latency)
+    )
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    import fake_gemini
+
+    fake_gemini.install()
+    from PIL import Image
+    from image_frames import ANIMATION_MAX_PIXELS, ANIMATION_MAX_SCAN_FRAMES, sample_keyframes
+
+    print(f"{'gif':<22} {'bytes':>9} {'scanned':>8} {'sample':>9}  keyframes")
+    for size, frames, scenes in (((320, 240), 40, 4), ((480, 480), 120, 6), ((800, 600), 300, 10),
+                                 ((1280, 720), 60, 3)):
+        data = animated_gif(size, frames, scenes)
+        start = time.perf_counter()
+        picked = sample_keyframes(Image.open(io.BytesIO(data)))
+        elapsed = time.perf_counter() - start
+        scanned = min(frames, ANIMATION_MAX_SCAN_FRAMES, ANIMATION_MAX_PIXELS // (size[0] * size[1]))
+        label = f"{size[0]}x{size[1]} {frames}f {scenes} scenes"
+        print(f"{label:<22} {len(data):>9} {scanned:>8} {elapsed * 1000:>7.0f}ms  "
+              f"{[index for index, _, _ in picked]}")
+
+    import app
+    from gemini_client import client as gemini
+
+    client = app.app.test_client()
+    sent = []
+    original = app.payload_bytes.observe
+    app.payload_bytes.observe = lambda value, **labels: (labels.get('kind') == 'image' and sent.append(value),
+                                                         original(value, **labels))
+    shots = [screenshot(number) for number in range(args.images)]
+    print(f"\n{args.images} screenshots of {len(shots[0]) // 1024}KB each, model latency {args.latency}s")
+    print(f"{'mode':<22} {'wall':>8} {'calls':>6} {'to model':>10}")
+
+    calls = gemini.counts['calls']
+    start = time.perf_counter()
+    for number, data in enumerate(shots):
+        response = client.post('/check-image', data={'image': (io.BytesIO(data), f'shot{number}.png')})
+        assert response.status_code == 200, response.get_json()
+    print(f"{'one request each':<22} {time.perf_counter() - start:>7.2f}s {gemini.counts['calls'] - calls:>6} "
+          f"{sum(sent) // 1024:>8}KB")
+
+    sent.clear()
+    shots = [screenshot(number + 100) for number in range(args.images)]
+    calls = gemini.counts['calls']
+    start = time.perf_counter()
+    response = client.post('/check-images', content_type='multipart/form-data', data={
+        'images': [(io.BytesIO(data), f'shot{number}.png') for number, data in enumerate(shots)]
+    })
+    assert response.status_code == 200, response.get_json()
+    print(f"{'one /check-images':<22} {time.perf_counter() - start:>7.2f}s {gemini.counts['calls'] - calls:>6} "
+          f"{sum(sent) // 1024:>8}KB  ({response.headers['X-Frames']} notes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Load-test /check-text and /check-image against the fake Gemini stand-in.
+
+For each worker configuration, starts Gunicorn with gunicorn.conf.py serving
+app:app through benchmarks/fake_app.py, so no real quota is spent. The fake
+model's latency follows --latency-dist around --latency, and --error-rate of
+its calls fail with a 429 or 503. Each endpoint is then driven with unique
+texts or images (so every request reaches the model) at each concurrency
+level in turn. Reported per level: throughput, p50/p95/p99 latency, failed
+responses (non-200 or X-Cache: ERROR) and the workers' resident memory
+(summed and largest, read from /proc, so Linux only).
+
+Usage:
+    python benchmarks/bench_load.py [--configs sync:1,gthread:8,gthread:32]
+        [--concurrency 1,4,16,64] [--requests 64] [--endpoints text,image]
+        [--latency 1.0] [--latency-dist lognormal] [--error-rate 0.02]
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+from bench_concurrency import ROOT, free_port, percentile, wait_until_healthy
+
+
+def child_pids(pid):
+    """PIDs of the direct children of `pid` (the Gunicorn workers)."""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; the ppid follows its closing paren
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def random_text(rng):
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(18)]
+    return 'Breaking: ' + ' '.join(words) + '.'
+
+
+def random_image(rng, size=(320, 240)):
+    """A PNG of random noise, so no two uploads share a hash or dHash."""
+    image = Image.frombytes('RGB', size, rng.randbytes(size[0] * size[1] * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def make_request(url, endpoint, payload):
+    start = time.perf_counter()
+    try:
+        if endpoint == 'text':
+            response = requests.post(url + '/check-text', json={'text': payload}, timeout=120)
+        else:
+            response = requests.post(url + '/check-image', files={'image': ('bench.png', payload, 'image/png')},
+                                     timeout=120)
+        ok = response.status_code == 200 and response.headers.get('X-Cache') != 'ERROR'
+    except requests.RequestException:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_level(url, endpoint, concurrency, payloads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda payload: make_request(url, endpoint, payload), payloads))
+    return results, time.perf_counter() - start
+
+
+def run_config(worker_class, threads, args, rng):
+    port = free_port()
+    data_dir = tempfile.mkdtemp(prefix='truthlens-load-')
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_THREADS=str(threads),
+        MODEL_MAX_CONCURRENCY=str(threads),
+        MODEL_QUEUE_TIMEOUT='60',
+        FAKE_GEMINI_LATENCY=str(args.latency),
+        FAKE_GEMINI_LATENCY_DIST=args.latency_dist,
+        FAKE_GEMINI_LATENCY_SIGMA=str(args.latency_sigma),
+        FAKE_GEMINI_ERROR_RATE=str(args.error_rate),
+        RATELIMIT_ENABLED='false',
+        PRESCREEN_ENABLED='false',
+        TRUTHLENS_DATA_DIR=data_dir,
+    )
+    server = subprocess.Popen(
+        ['gunicorn', '--config', 'gunicorn.conf.py', '--pythonpath', 'benchmarks',
+         '--timeout', '120', 'fake_app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    label = f"{args.workers} x {worker_class}" + (f"({threads})" if worker_class != 'sync' else '')
+    try:
+        wait_until_healthy(url)
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                make = random_text if endpoint == 'text' else random_image
+                payloads = [make(rng) for _ in range(args.requests)]
+                results, elapsed = run_level(url, endpoint, concurrency, payloads)
+                latencies = [latency for _, latency in results]
+                failed = sum(1 for ok, _ in results if not ok)
+                workers = [rss_mb(pid) for pid in child_pids(server.pid)]
+                print(f"{label:<18} {endpoint:<6} {concurrency:>5} {len(results) / elapsed:>8.2f} "
+                      f"{percentile(latencies, 50):>7.2f}s {percentile(latencies, 95):>7.2f}s "
+                      f"{percentile(latencies, 99):>7.2f}s {failed:>6} "
+                      f"{sum(workers):>8.0f}MB {max(workers, default=0):>7.0f}MB", flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--configs', default='sync:1,gthread:8,gthread:32',
+                        help='comma-separated worker_class:threads pairs')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int_list, default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=64, help='requests per concurrency level')
+    parser.add_argument('--endpoints', type=lambda v: v.split(','), default=['text', 'image'])
+    parser.add_argument('--latency', type=float, default=1.0, help='median simulated model latency (s)')
+    parser.add_argument('--latency-dist', choices=('fixed', 'lognormal', 'uniform'), default='lognormal')
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of model calls that fail')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if shutil.which('gunicorn') is None:
+        sys.exit("gunicorn is not installed")
+    rng = random.Random(args.seed)
+    print(f"Fake model latency {args.latency_dist} around {args.latency}s, error rate {args.error_rate}, "
+          f"{args.requests} requests per level")
+    print(f"{'config':<18} {'kind':<6} {'conc':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'failed':>6} {'RSS sum':>10} {'max':>9}")
+    for config in args.configs.split(','):
+        worker_class, threads = config.split(':')
+        run_config(worker_class, int(threads), args, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark long-document mode against checking the same chunks one by one.
+
+Runs the app in-process against the fake Gemini stand-in with a fixed
+--latency per model call. For each document size it builds a fresh document
+of random sentences (so nothing is served from the cache), times one
+{"mode": "document"} request to /check-text, and then times the same chunks
+analyzed sequentially with a fresh document of the same shape. With enough
+model slots the document request should take about one model latency
+however many chunks it has; the sequential run takes one per chunk.
+
+Usage:
+    python benchmarks/bench_long_document.py [--latency 0.5] [--sizes 2000,6000,12000,20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ('the', 'minister', 'said', 'new', 'study', 'shows', 'vaccine', 'report', 'claims', 'growth',
+         'officials', 'confirmed', 'data', 'from', 'last', 'year', 'experts', 'warn', 'that', 'prices')
+
+
+def random_document(rng, size):
+    sentences = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 28))).capitalize()
+        sentence += rng.choice('.!?') + ('\n\n' if rng.random() < 0.1 else ' ')
+        sentences.append(sentence)
+        length += len(sentence)
+    return ''.join(sentences)[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.5, help='simulated model latency (s)')
+    parser.add_argument('--sizes', default='2000,6000,12000,20000', help='document sizes in characters')
+    parser.add_argument('--slots', type=int, default=16, help='model slots and document pool size per worker')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.update(
+        TRUTHLENS_DATA_DIR=tempfile.mkdtemp(prefix='truthlens-longdoc-'),
+        RATELIMIT_ENABLED='false',
+        PRESCREEN_ENABLED='false',
+        FAKE_GEMINI_LATENCY=str(args.latency),
+        MODEL_MAX_CONCURRENCY=str(args.slots),
+        LONG_DOC_MAX_WORKERS=str(args.slots),
+        TEXT_MAX_INPUT_CHARS=str(max(int(size) for size in args.sizes.split(',')))
+    )
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    import fake_gemini
+
+    fake_gemini.install()
+    import app
+    from long_document import split_chunks
+
+    client = app.app.test_client()
+    rng = random.Random(args.seed)
+    print(f"Fake model latency {args.latency}s, {args.slots} model slots per worker")
+    print(f"{'chars':>7} {'chunks':>7} {'document':>10} {'sequential':>11} {'speedup':>8}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        text = random_document(rng, size)
+        start = time.perf_counter()
+        response = client.post('/check-text', json={'text': text, 'mode': 'document'})
+        document = time.perf_counter() - start
+        if response.status_code != 200:
+            sys.exit(f"Document request failed: {response.status_code} {response.get_json()}")
+        chunks = int(response.headers['X-Document-Chunks'])
+
+        chunk_texts = [chunk.text for chunk in split_chunks(random_document(rng, size))[0]]
+        start = time.perf_counter()
+        for chunk in chunk_texts:
+            app.analyze_text_cached(chunk)
+        sequential = time.perf_counter() - start
+        print(f"{size:>7} {chunks:>7} {document:>9.2f}s {sequential:>10.2f}s {sequential / document:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark adaptive model routing against sending everything to the strong model.
+
+Runs text analyses in-process against the fake Gemini stand-in. In the fake,
+models with 'lite' in their name are FAKE_GEMINI_LITE_SPEEDUP times faster
+and answer a share of prompts with an unsure or unparseable verdict. Each
+configuration analyzes the same fresh texts (the caches are bypassed) with
+--concurrency threads. The strong-only baseline comes first, then lite>strong
+at each --thresholds value. For each it reports latency percentiles, the
+share of analyses escalated, and strong-model calls per analysis. It also
+reports how many verdicts differ from the strong model's and, of those, how
+many changed from accurate to not or back.
+
+Usage:
+    python benchmarks/bench_model_routing.py [--texts 200] [--latency 0.2] [--thresholds 0,60,70]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--texts', type=int, default=200, help='analyses per configuration')
+    parser.add_argument('--latency', type=float, default=0.2, help='strong model latency (s)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--thresholds', default='0,60,70', help='confidence thresholds to try')
+    args = parser.parse_args()
+
+    os.environ.update(
+        TRUTHLENS_DATA_DIR=tempfile.mkdtemp(prefix='truthlens-routing-'),
+        RATELIMIT_ENABLED='false',
+        PRESCREEN_ENABLED='false',
+        VERDICT_STORE_ENABLED='false',
+        FAKE_GEMINI_LATENCY=str(args.latency),
+        FAKE_GEMINI_LATENCY_DIST='lognormal',
+        MODEL_MAX_CONCURRENCY=str(args.concurrency)
+    )
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    import fake_gemini
+
+    fake_gemini.install()
+    import app
+    from model_routing import ESCALATE, MODEL_LITE, MODEL_STRONG, ModelRouter, parse_routes
+
+    texts = [f"Claim number {i}: the council approved {i % 97} new schools and cut taxes by {i % 13}%."
+             for i in range(args.texts)]
+    configs = [('strong only', {})]
+    configs += [(f'lite>strong @{threshold}', parse_routes(f'text:deep=lite>strong@{threshold}'))
+                for threshold in map(int, args.thresholds.split(','))]
+
+    print(f"Lite {MODEL_LITE}, strong {MODEL_STRONG}; strong latency {args.latency}s (lognormal), "
+          f"{args.texts} texts, {args.concurrency} concurrent")
+    print(f"{'routing':<18} {'p50':>8} {'p95':>8} {'p99':>8} {'escalated':>10} {'strong/req':>11} "
+          f"{'changed':>8} {'flipped':>8}")
+    baseline = None
+    for name, routes in configs:
+        app.router = ModelRouter(routes=routes, enabled=bool(routes))
+
+        def analyze(text):
+            call = lambda structured, model_name: app.analyze_text_for_misinformation(
+                text, structured, 'deep', model_name
+            )
+            start = time.perf_counter()
+            _, result = app.analyze_with_mode('text', text, call)
+            return time.perf_counter() - start, result
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(analyze, texts))
+        latencies = sorted(seconds for seconds, _ in outcomes)
+        verdicts = [(result['isTrue'], result['confidence']) for _, result in outcomes]
+        decisions = app.router.stats()['routes'].get('text:deep', {}).get('decisions', {})
+        strong_calls = sum(count for key, count in decisions.items() if key.startswith(MODEL_STRONG + ':'))
+        escalated = sum(decisions.get(f'{MODEL_LITE}:{reason}', 0) for reason in ESCALATE)
+        if baseline is None:
+            baseline = verdicts
+        changed = sum(verdict != base for verdict, base in zip(verdicts, baseline))
+        flipped = sum(verdict[0] != base[0] for verdict, base in zip(verdicts, baseline))
+        print(f"{name:<18} {percentile(latencies, 50):>6.0f}ms {percentile(latencies, 95):>6.0f}ms "
+              f"{percentile(latencies, 99):>6.0f}ms {escalated / len(texts):>9.0%} "
+              f"{strong_calls / len(texts):>11.2f} {changed:>8} {flipped:>8}")
+
+
+if __name__ == '__main__':
+    main()
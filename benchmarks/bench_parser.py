@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark the verdict parser against the previous regex-and-scan parser.
+
+Checks first that verdict_parser.parse_analysis_to_json returns exactly what
+the previous implementation returned, over the sample corpus in
+benchmarks/corpus/gemini_outputs.json (responses in the text and image prompt
+formats, keyword-only prose, an error string and long responses) and over
+randomly assembled texts built from the summary-line tokens. It then times
+both parsers per corpus entry, and on pathological single-line inputs where
+the old pattern backtracks (those are skipped for the old parser past
+--legacy-limit characters).
+
+Exits non-zero if any output differs, so it doubles as a regression check.
+
+Usage:
+    python benchmarks/bench_parser.py [--repeat 2000] [--fuzz 20000]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from verdict_parser import parse_analysis_to_json
+
+CORPUS = os.path.join(ROOT, 'benchmarks', 'corpus', 'gemini_outputs.json')
+
+
+def legacy_parse_analysis_to_json(analysis_text):
+    """The parser as it was before verdict_parser.py, kept for comparison."""
+    try:
+        analysis_lower = analysis_text.lower()
+        percentage_match = re.search(r'(\d+)%\s+likely\s+to\s+be\s+(accurate|genuine).*?(\d+)%\s+likely.*?(misinformation|manipulated).*?(\d+)%\s+likely.*?(misleading)', analysis_lower)
+        if percentage_match:
+            genuine_pct = int(percentage_match.group(1))
+            false_pct = int(percentage_match.group(3))
+            misleading_pct = int(percentage_match.group(5))
+            if genuine_pct >= 60:
+                is_true = True
+                confidence = min(95, genuine_pct + 10)
+            elif false_pct >= 50:
+                is_true = False
+                confidence = min(95, false_pct + 15)
+            else:
+                is_true = False
+                confidence = max(30, 100 - misleading_pct - false_pct)
+        else:
+            strong_negative = [
+                'fake', 'false', 'misleading', 'scam', 'manipulated', 'fabricated',
+                'hoax', 'conspiracy', 'debunked', 'untrue', 'deceptive', 'fraudulent',
+                'suspicious', 'red flags', 'warning signs', 'concerning', 'doubt',
+                'misinformation', 'disinformation', 'propaganda'
+            ]
+            positive_indicators = [
+                'credible', 'accurate', 'verified', 'legitimate', 'authentic',
+                'reliable', 'factual', 'genuine', 'trustworthy', 'evidence-based',
+                'well-sourced', 'documented', 'confirmed', 'looks real', 'appears genuine',
+                'likely genuine', 'probably accurate'
+            ]
+            strong_neg_count = sum(1 for indicator in strong_negative if indicator in analysis_lower)
+            positive_count = sum(1 for indicator in positive_indicators if indicator in analysis_lower)
+            if strong_neg_count >= 3:
+                is_true = False
+                confidence = min(95, 75 + (strong_neg_count * 5))
+            elif positive_count >= 2 and strong_neg_count == 0:
+                is_true = True
+                confidence = min(90, 70 + (positive_count * 6))
+            elif strong_neg_count > positive_count:
+                is_true = False
+                confidence = min(85, 60 + (strong_neg_count * 8))
+            elif positive_count > strong_neg_count:
+                is_true = True
+                confidence = min(80, 55 + (positive_count * 7))
+            else:
+                is_true = False
+                confidence = 45 + (len(analysis_text) // 100)
+        sources = []
+        if any(word in analysis_lower for word in ['verify', 'check', 'source', 'research', 'fact-check']):
+            sources = [
+                {"title": "Snopes Fact-Checking", "url": "https://www.snopes.com", "domain": "snopes.com"},
+                {"title": "FactCheck.org", "url": "https://www.factcheck.org", "domain": "factcheck.org"}
+            ]
+        if 'reverse image search' in analysis_lower or 'image' in analysis_lower:
+            sources.append({
+                "title": "Google Reverse Image Search",
+                "url": "https://images.google.com",
+                "domain": "images.google.com"
+            })
+        return {"isTrue": is_true, "confidence": confidence, "explanation": analysis_text, "sources": sources}
+    except Exception:
+        return {"isTrue": False, "confidence": 50,
+                "explanation": f"Analysis completed: {analysis_text}", "sources": []}
+
+
+FUZZ_PIECES = [
+    '12% likely to be accurate', '7%  likely to be\ngenuine', '85%\nlikely', '3% likely',
+    '40% likely to contain', 'misinformation', 'manipulated', 'misleading', '1',
+    '%', ' ', ' ', '\n', ', ', 'and ', 'image', 'fake', 'credible', 'verify', 'x',
+    '٣% likely to be accurate', 'LIKELY', 'fact-check', 'appears genuine'
+]
+
+
+def fuzz_text(rng):
+    return ''.join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, 24)))
+
+
+def pathological(n):
+    return "10% likely to be accurate and 20% likely to contain misinformation, 30% likely. " * n
+
+
+def best_of(fn, text, repeat):
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(text)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--fuzz', type=int, default=20000)
+    parser.add_argument('--legacy-limit', type=int, default=800,
+                        help='longest pathological input to time the old parser on')
+    args = parser.parse_args()
+
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+
+    rng = random.Random(0)
+    mismatches = 0
+    for text in corpus + [fuzz_text(rng) for _ in range(args.fuzz)]:
+        if parse_analysis_to_json(text) != legacy_parse_analysis_to_json(text):
+            mismatches += 1
+            print(f"MISMATCH: {text!r}")
+    print(f"equivalence: {len(corpus)} corpus + {args.fuzz} random texts, {mismatches} mismatches\n")
+
+    print(f"{'input':<28} {'chars':>6} {'legacy':>11} {'compiled':>11} {'speedup':>8}")
+    total_legacy = total_new = 0.0
+    for i, text in enumerate(corpus):
+        legacy = best_of(legacy_parse_analysis_to_json, text, args.repeat)
+        new = best_of(parse_analysis_to_json, text, args.repeat)
+        total_legacy += legacy
+        total_new += new
+        print(f"{'corpus #' + str(i):<28} {len(text):>6} {legacy * 1e6:>9.1f}us "
+              f"{new * 1e6:>9.1f}us {legacy / new:>7.2f}x")
+    print(f"{'corpus total':<28} {'':>6} {total_legacy * 1e6:>9.1f}us "
+          f"{total_new * 1e6:>9.1f}us {total_legacy / total_new:>7.2f}x")
+
+    for n in (2, 5, 10, 100, 1000):
+        text = pathological(n)
+        new = best_of(parse_analysis_to_json, text, 20)
+        if len(text) <= args.legacy_limit:
+            legacy = best_of(legacy_parse_analysis_to_json, text, 1)
+            if parse_analysis_to_json(text) != legacy_parse_analysis_to_json(text):
+                mismatches += 1
+                print(f"MISMATCH on pathological input of {len(text)} chars")
+            legacy_cell, ratio = f"{legacy * 1e6:>9.1f}us", f"{legacy / new:>7.0f}x"
+        else:
+            legacy_cell, ratio = f"{'skipped':>11}", f"{'':>8}"
+        print(f"{'pathological line':<28} {len(text):>6} {legacy_cell} {new * 1e6:>9.1f}us {ratio}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark the content-hash pre-check against re-uploading a known image.
+
+Runs the app in-process against the fake Gemini. It uploads --images photos
+of about --size pixels to /check-image once, then checks each of them again
+three ways: by re-uploading it, with GET /check-image/<sha256>, and with GET
+plus the ETag from the first upload (If-None-Match, answered with a 304).
+For each way it reports the bytes sent and received per check and the time
+per check. Client-side hashing is timed separately, since the client does
+that work instead of the upload.
+
+Usage:
+    python benchmarks/bench_precheck.py [--images 20] [--size 3000x4000]
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def photo(number, size):
+    from PIL import Image
+
+    # Noise compresses like a photo and keeps the near-duplicate index out of the way
+    rng = random.Random(number)
+    image = Image.frombytes('RGB', (size[0] // 8, size[1] // 8), rng.randbytes(size[0] * size[1] * 3 // 64))
+    buffer = io.BytesIO()
+    image.resize(size).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--size', default='3000x4000', help='photo size, WIDTHxHEIGHT')
+    args = parser.parse_args()
+
+    os.environ.update(
+        TRUTHLENS_DATA_DIR=tempfile.mkdtemp(prefix='truthlens-precheck-'),
+        RATELIMIT_ENABLED='false',
+        FAKE_GEMINI_LATENCY='0'
+    )
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    import fake_gemini
+
+    fake_gemini.install()
+    import app
+
+    client = app.app.test_client()
+    size = tuple(map(int, args.size.split('x')))
+    photos = [photo(number, size) for number in range(args.images)]
+    etags = []
+    for number, data in enumerate(photos):
+        response = client.post('/check-image', data={'image': (io.BytesIO(data), f'photo{number}.jpg')})
+        assert response.status_code == 200, response.get_json()
+        etags.append(response.headers['ETag'])
+
+    start = time.perf_counter()
+    digests = [hashlib.sha256(data).hexdigest() for data in photos]
+    hashing = (time.perf_counter() - start) / len(photos)
+    average = sum(map(len, photos)) // len(photos)
+    print(f"{args.images} photos of {args.size}, {average // 1024}KB each; "
+          f"client SHA-256 {hashing * 1000:.1f}ms each")
+    print(f"{'check':<18} {'sent':>10} {'received':>10} {'time':>9}  status")
+
+    def measure(label, check):
+        sent = received = 0
+        statuses = set()
+        start = time.perf_counter()
+        for number in range(len(photos)):
+            request_bytes, response = check(number)
+            sent += request_bytes
+            received += len(response.data)
+            statuses.add(response.status_code)
+        elapsed = (time.perf_counter() - start) / len(photos)
+        print(f"{label:<18} {sent // len(photos):>9}B {received // len(photos):>9}B "
+              f"{elapsed * 1000:>7.1f}ms  {sorted(statuses)}")
+
+    def upload(number):
+        response = client.post('/check-image', data={'image': (io.BytesIO(photos[number]), f'photo{number}.jpg')})
+        return len(photos[number]), response
+
+    def precheck(number):
+        path = f'/check-image/{digests[number]}'
+        return len(path), client.get(path)
+
+    def revalidate(number):
+        path = f'/check-image/{digests[number]}'
+        return len(path) + len(etags[number]), client.get(path, headers={'If-None-Match': etags[number]})
+
+    measure('re-upload', upload)
+    measure('pre-check', precheck)
+    measure('pre-check + ETag', revalidate)
+
+
+if __name__ == '__main__':
+    main()
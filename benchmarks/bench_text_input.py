@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark bounded text input handling against whole-body sanitizing.
+
+Checks first that text_input.sanitize_text returns what the previous
+`bleach.clean(text, tags=[], strip=True)[:2000]` returned, over random texts
+mixing plain words, tags, comments, entities and control characters, long
+enough that markup straddles the cut. A third of them use limits of 50 or
+200 characters with sparse markup, so the sanitizing window often ends inside
+an open tag, comment, CDATA section or raw-text element. It then times both
+request pipelines (parse the body, validate, sanitize) and their peak memory
+on adversarial bodies: large amounts of plain text, of tag soup, of bare
+ampersands, of nested arrays, and texts just under the field limit. The previous pipeline parsed
+up to MAX_CONTENT_LENGTH (16MB) and cleaned the whole text; the bounded one
+refuses what is over its limits before parsing.
+
+Exits non-zero if any sanitized output differs, so it doubles as a
+regression check.
+
+Usage:
+    python benchmarks/bench_text_input.py [--fuzz 3000] [--size-mb 0.5]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bleach
+
+from text_input import (TEXT_MAX_BODY_BYTES, TEXT_MAX_INPUT_CHARS, InputTooLarge, check_text_field, read_json,
+                        sanitize_text)
+
+PIECES = [
+    'claim', 'the', 'vaccine', 'report', 'breaking', 'news', ' ', ' ', '\n', '\t', '.', ',',
+    '<b>', '</b>', '<i>', '</i>', '<a href="http://example.com">', '</a>', '<script>', '</script>',
+    '<img src=x onerror=alert(1)>', '<br/>', '<!-- hidden -->', '<p class="x">', '</p>', '<div>', '</div>',
+    '&', '&amp;', '&lt;', '&nbsp;', '&#39;', '<', '>', '\r\n', '\r', '\x00', '\x07', '\x0c', 'é', '漢字', '😀',
+    # Constructs that can stay open past the sanitizing window
+    '<textarea>', '</textarea>', '<title>', '</title>', '<xmp>', '<noframes>', '<plaintext>', '<![CDATA[', ']]>',
+    '<!--', '-->', '<td>', '<option>', '<a title="x>y">',
+]
+
+
+def legacy_sanitize(text):
+    """sanitize_text as it was before text_input.py, kept for comparison."""
+    if not text:
+        return ""
+    return bleach.clean(text, tags=[], strip=True)[:2000]
+
+
+def legacy_pipeline(body):
+    data = json.loads(body)
+    return legacy_sanitize(data.get('text') if isinstance(data, dict) else None)
+
+
+def bounded_pipeline(body):
+    request = types.SimpleNamespace(content_length=len(body), stream=io.BytesIO(body))
+    try:
+        data = read_json(request)
+        text = data.get('text') if isinstance(data, dict) else None
+        if not isinstance(text, str):
+            return None
+        check_text_field(text)
+    except InputTooLarge:
+        return 413
+    except ValueError:
+        return 400
+    return sanitize_text(text)
+
+
+def random_text(rng, length, markup=1.0):
+    """Random pieces; with `markup` < 1 only that share may be markup, the rest plain words."""
+    parts = []
+    size = 0
+    while size < length:
+        piece = rng.choice(PIECES) if rng.random() < markup else rng.choice(PIECES[:6]) + ' '
+        parts.append(piece)
+        size += len(piece)
+    return ''.join(parts)
+
+
+def check_equivalence(rng, count):
+    mismatches = 0
+    for i in range(count):
+        # Mostly around the 2000-character cut, some far past it
+        text = random_text(rng, rng.choice([50, 1900, 2100, 2500, 4000, 12000]))
+        if i % 3 == 0:
+            # Plain prefix, so the fast path is taken
+            text = ' '.join(rng.choice(PIECES[:6]) for _ in range(rng.randint(10, 600))) + text
+        elif i % 3 == 1:
+            # Sparse markup and a short limit, so the window is cleaned on its
+            # own and often ends inside a tag, comment or raw-text element
+            text = random_text(rng, rng.choice([500, 2000, 6000]), markup=0.25)
+            max_chars = rng.choice([50, 200])
+            if sanitize_text(text, max_chars) != bleach.clean(text, tags=[], strip=True)[:max_chars]:
+                mismatches += 1
+                if mismatches <= 3:
+                    print(f"MISMATCH at {max_chars} chars for input {text[:120]!r}...")
+            continue
+        if sanitize_text(text) != legacy_sanitize(text):
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"MISMATCH for input {text[:120]!r}...")
+    return mismatches
+
+
+def measure(pipeline, body, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipeline(body)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    pipeline(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def adversarial_bodies(size):
+    plain = 'word ' * (size // 5)
+    return [
+        ('plain text', json.dumps({'text': plain}).encode()),
+        ('tag soup', json.dumps({'text': '<b>' * (size // 3)}).encode()),
+        ('ampersands', json.dumps({'text': '&' * size}).encode()),
+        ('nested arrays', b'{"text": "claim", "pad": ' + b'[' * 500 + b'0,' * (size // 2) + b'0' + b']' * 500 + b'}'),
+        ('text at field limit', json.dumps({'text': plain[:TEXT_MAX_INPUT_CHARS]}).encode()),
+        ('tags at field limit', json.dumps({'text': ('<i>' * 10 + 'x') * (TEXT_MAX_INPUT_CHARS // 31)}).encode()),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fuzz', type=int, default=3000, help='random texts compared with the previous sanitizer')
+    parser.add_argument('--size-mb', type=float, default=0.5, help='size of the large adversarial bodies')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence(random.Random(args.seed), args.fuzz)
+    print(f"Sanitizer equivalence: {args.fuzz - mismatches}/{args.fuzz} random texts identical")
+
+    print(f"Body limit {TEXT_MAX_BODY_BYTES} bytes, field limit {TEXT_MAX_INPUT_CHARS} characters")
+    print(f"{'body':<22} {'size':>9} {'old time':>10} {'old peak':>10} {'new time':>10} {'new peak':>10}  result")
+    for name, body in adversarial_bodies(int(args.size_mb * 1024 * 1024)):
+        old_time, old_peak = measure(legacy_pipeline, body, args.repeat)
+        new_time, new_peak = measure(bounded_pipeline, body, args.repeat)
+        result = bounded_pipeline(body)
+        outcome = result if isinstance(result, int) else f'kept {len(result)} chars'
+        print(f"{name:<22} {len(body) / 1024:>7.0f}KB {old_time * 1000:>8.1f}ms {old_peak / 2 ** 20:>8.1f}MB "
+              f"{new_time * 1000:>8.1f}ms {new_peak / 2 ** 20:>8.1f}MB  {outcome}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
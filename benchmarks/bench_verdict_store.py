@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark the verdict store's search latency at millions of rows.
+
+Fills a fresh store (in a temporary TRUTHLENS_DATA_DIR unless --data-dir is
+given and already filled) with --rows synthetic analyses. Texts are drawn
+from a Zipf-distributed vocabulary and explanations from a few templates, so
+some words are rare and some occur in every row, and about one row in ten is
+an image. It reports the insert rate and database size. It then times
+queries by how common their words are, two-word and prefix queries, a deep
+page, a kind filter and an image hash lookup, and the ranking of a common
+word over every match instead of the capped candidate set. It also times
+record(), the only part of the store on the request path.
+
+Usage:
+    python benchmarks/bench_verdict_store.py [--rows 1000000] [--queries 50] [--data-dir DIR]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VOCABULARY_SIZE = 20000
+EXPLANATIONS = (
+    "This text is **{}% likely to be accurate**, **{}% likely to contain misinformation**, and "
+    "**{}% likely to be misleading**. The claim lacks sources and uses emotionally charged language.",
+    "This text is **{}% likely to be accurate**, **{}% likely to contain misinformation**, and "
+    "**{}% likely to be misleading**. Official statistics support the main figures quoted.",
+    "This image is **{}% likely to be genuine**, **{}% likely to be manipulated**, and "
+    "**{}% likely to be used in a misleading context**. Inconsistent shadows near the edges.",
+)
+
+
+def make_word(i):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    word = ''
+    i += 26 * 26
+    while i:
+        i, r = divmod(i, 26)
+        word += letters[r]
+    return word
+
+
+def synthetic_rows(rng, count, vocabulary, cum_weights, start_id):
+    rows = []
+    now = time.time()
+    for i in range(count):
+        genuine = rng.randint(5, 90)
+        false = rng.randint(0, 95 - genuine)
+        if rng.random() < 0.1:
+            digest = hashlib.sha256(f'image-{start_id + i}'.encode()).hexdigest()
+            explanation = EXPLANATIONS[2].format(genuine, false, 100 - genuine - false)
+            row = ('image', f'image:{digest}', None, digest)
+        else:
+            text = ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(15, 60)))
+            explanation = EXPLANATIONS[rng.randint(0, 1)].format(genuine, false, 100 - genuine - false)
+            row = ('text', f'text:{start_id + i}', text, None)
+        verdict = {'isTrue': genuine >= 60, 'confidence': genuine, 'explanation': explanation, 'sources': []}
+        rows.append(row + (int(verdict['isTrue']), genuine, explanation, json.dumps(verdict), 'deep', now))
+    return rows
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+    return f"{pick(50):>8.2f}ms {pick(95):>8.2f}ms {pick(99):>8.2f}ms"
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=50, help='queries timed per kind')
+    parser.add_argument('--batch', type=int, default=5000, help='rows per insert transaction')
+    parser.add_argument('--data-dir', help='reuse (or fill) this data directory')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='truthlens-store-')
+    os.environ['TRUTHLENS_DATA_DIR'] = data_dir
+    from storage import db_path
+    from verdict_store import VerdictStore
+
+    rng = random.Random(args.seed)
+    vocabulary = [make_word(i) for i in range(VOCABULARY_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    cum_weights = [sum(weights[:1])]
+    for weight in weights[1:]:
+        cum_weights.append(cum_weights[-1] + weight)
+    store = VerdictStore(enabled=True, max_age=0, max_rows=0)
+
+    try:
+        existing = store._conn().execute('SELECT COALESCE(MAX(id), 0) FROM analyses').fetchone()[0]
+        if existing < args.rows:
+            start = time.perf_counter()
+            for first in range(existing, args.rows, args.batch):
+                store.write(synthetic_rows(rng, min(args.batch, args.rows - first), vocabulary, cum_weights, first))
+            elapsed = time.perf_counter() - start
+            print(f"Inserted {args.rows - existing} rows in {elapsed:.1f}s "
+                  f"({(args.rows - existing) / elapsed:,.0f} rows/s)")
+        size = sum(os.path.getsize(db_path(name)) for name in ('verdict_store.db', 'verdict_store.db-wal')
+                   if os.path.exists(db_path(name)))
+        print(f"{args.rows:,} rows, {size / 2 ** 20:,.0f}MB on disk")
+
+        # Words by how many rows contain them (rank in the Zipf vocabulary)
+        rare = [vocabulary[rng.randint(15000, VOCABULARY_SIZE - 1)] for _ in range(args.queries)]
+        medium = [vocabulary[rng.randint(500, 2000)] for _ in range(args.queries)]
+        common = [vocabulary[rng.randint(0, 10)] for _ in range(args.queries)]
+        images = [hashlib.sha256(f'image-{rng.randrange(args.rows)}'.encode()).hexdigest()
+                  for _ in range(args.queries)]
+        cases = [
+            ('rare word', store.search, [(word,) for word in rare]),
+            ('medium word', store.search, [(word,) for word in medium]),
+            ('common word', store.search, [(word,) for word in common]),
+            ('word in every row', store.search, [('likely',)] * args.queries),
+            ('two words', store.search, [(f'{a} {b}',) for a, b in zip(medium, rare)]),
+            ('prefix', store.search, [(word[:3] + '*',) for word in medium]),
+            ('common, page 50', store.search, [(word, None, 20, 980) for word in common]),
+            ('common, kind=image', store.search, [('shadows', 'image')] * args.queries),
+            ('image hash', store.lookup_image, [(digest,) for digest in images]),
+            ('common, uncapped', store.search,
+             [(word, None, 20, 0, 0) for word in common[:max(3, args.queries // 10)]]),
+        ]
+        print(f"{'query':<22} {'p50':>10} {'p95':>10} {'p99':>10}")
+        for name, fn, query_args in cases:
+            print(f"{name:<22} {percentiles(timed(fn, query_args))}")
+
+        verdict = {'isTrue': False, 'confidence': 80, 'explanation': EXPLANATIONS[0].format(10, 80, 10),
+                   'sources': []}
+        samples = timed(lambda: store.record('text', 'text:bench', verdict, text='a benchmark claim'),
+                        [()] * 1000)
+        print(f"{'record() (request path)':<22} {percentiles(samples)}")
+        store.flush()
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
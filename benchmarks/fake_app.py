@@ -0,0 +1,15 @@
+"""
+WSGI entry point serving app:app against the fake Gemini stand-in.
+
+    gunicorn --config gunicorn.conf.py --pythonpath benchmarks fake_app:app
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_gemini
+
+fake_gemini.install()
+
+from app import app  # noqa: E402
@@ -0,0 +1,218 @@
+"""
+Local stand-in for google.generativeai, for benchmarks only.
+
+install() registers a fake module under the real import name so app.py and
+project_1.py run unchanged. Every generate_content call sleeps for a
+simulated latency and returns an analysis in the format the prompt asked for:
+the text or image prose layout (with a line per image when several are
+sent), the one-line quick summary when the output is capped, or JSON when a
+response schema is requested. The percentages are derived from a hash of the
+prompt, so the same content always gets the same verdict. With stream=True
+the latency is spread over the words of the analysis.
+
+Environment:
+    FAKE_GEMINI_LATENCY         median latency in seconds (default 1.0)
+    FAKE_GEMINI_LATENCY_DIST    'fixed' (default), 'lognormal' or 'uniform'
+    FAKE_GEMINI_LATENCY_SIGMA   spread of the lognormal distribution (default 0.5)
+    FAKE_GEMINI_ERROR_RATE      share of calls that fail (default 0)
+    FAKE_GEMINI_THROTTLE_SHARE  share of those failures that are 429s rather
+                                than 503s (default 0.5)
+    FAKE_GEMINI_LITE_SPEEDUP    latency divisor for models with 'lite' in
+                                their name (default 2)
+    FAKE_GEMINI_LITE_UNSURE     share of prompts a lite model answers with an
+                                unsure 50/30/20 summary (default 0.2)
+    FAKE_GEMINI_LITE_UNPARSED   share of prompts a lite model answers without
+                                the summary line (default 0.05)
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+import types
+
+CANNED_ANALYSIS = (
+    "This text is **20% likely to be accurate**, **70% likely to contain misinformation**, "
+    "and **10% likely to be misleading**.\n\n"
+    "1. **Credibility Assessment**: The claim lacks sources and uses emotionally charged language.\n"
+    "2. **Identified Tactics**: Urgency, appeal to fear, no verifiable source.\n"
+    "3. **Educational Explanation**: These are common red flags for misinformation.\n"
+    "4. **Actionable Advice**: Check the claim with a fact-check site and look for the original source."
+)
+
+IMAGE_SUMMARY = ("This image is **{}% likely to be genuine**, **{}% likely to be manipulated**, "
+                 "and **{}% likely to be used in a misleading context**.")
+TEXT_SUMMARY = ("This text is **{}% likely to be accurate**, **{}% likely to contain misinformation**, "
+                "and **{}% likely to be misleading**.")
+
+IMAGE_SECTIONS = (
+    "1. **Fake Image**: No obvious generation artifacts, but the compression history is unclear.\n\n"
+    "2. **Credibility Assessment**: The image may be genuine but lacks provenance.\n\n"
+    "3. **Identified Issues**:\n   - Inconsistent shadows near the edges\n   - Heavy recompression\n\n"
+    "4. **Contextual Analysis**: The scene could be presented out of its original context.\n\n"
+    "5. **Verification Steps**:\n   - Run a reverse image search\n   - Check the original source"
+)
+
+PERCENT_FIELDS = ('genuinePercent', 'falsePercent', 'misleadingPercent')
+
+# The same analyses as JSON, returned when a response schema is requested
+TEXT_STRUCTURED = {
+    "credibilityAssessment": "The claim lacks sources and uses emotionally charged language.",
+    "identifiedTactics": ["Urgency", "Appeal to fear", "No verifiable source"],
+    "educationalExplanation": "These are common red flags for misinformation.",
+    "actionableAdvice": ["Check the claim with a fact-check site", "Look for the original source"]
+}
+
+IMAGE_STRUCTURED = {
+    "fakeImage": "No obvious generation artifacts, but the compression history is unclear.",
+    "credibilityAssessment": "The image may be genuine but lacks provenance.",
+    "identifiedIssues": ["Inconsistent shadows near the edges", "Heavy recompression"],
+    "contextualAnalysis": "The scene could be presented out of its original context.",
+    "verificationSteps": ["Run a reverse image search", "Check the original source"]
+}
+
+
+class FakeApiError(Exception):
+    code = 500
+
+
+class ServiceUnavailable(FakeApiError):
+    code = 503
+
+
+class ResourceExhausted(FakeApiError):
+    code = 429
+
+
+class FakeResponse:
+    def __init__(self, text, prompt_tokens=0):
+        self.text = text
+        output_tokens = len(text) // 4 + 1
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+
+
+def sample_latency():
+    """One latency draw from the configured distribution."""
+    median = float(os.getenv('FAKE_GEMINI_LATENCY', 1.0))
+    dist = os.getenv('FAKE_GEMINI_LATENCY_DIST', 'fixed')
+    if dist == 'lognormal':
+        return random.lognormvariate(math.log(median), float(os.getenv('FAKE_GEMINI_LATENCY_SIGMA', 0.5)))
+    if dist == 'uniform':
+        return random.uniform(median * 0.5, median * 1.5)
+    return median
+
+
+def maybe_fail(latency):
+    """Raise a simulated upstream failure for FAKE_GEMINI_ERROR_RATE of calls."""
+    if random.random() >= float(os.getenv('FAKE_GEMINI_ERROR_RATE', 0)):
+        return
+    # Failures come back sooner than answers
+    time.sleep(latency * random.random() * 0.5)
+    if random.random() < float(os.getenv('FAKE_GEMINI_THROTTLE_SHARE', 0.5)):
+        raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+    raise ServiceUnavailable("503 The model is overloaded. Please try again later.")
+
+
+def percentages(contents):
+    """Summary percentages (adding up to 100) derived from the prompt."""
+    digest = hashlib.sha256()
+    for part in contents:
+        if isinstance(part, str):
+            digest.update(part.encode('utf-8'))
+        elif isinstance(part, dict):
+            digest.update(part.get('data', b''))
+    seed = int(digest.hexdigest()[:8], 16)
+    genuine = seed % 91 + 5
+    false = (seed // 91) % (96 - genuine)
+    return genuine, false, 100 - genuine - false
+
+
+def lite_behaviour(contents):
+    """'unsure', 'unparsed' or None for a lite model, decided by the prompt."""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    digest = hashlib.sha256(b'lite')
+    for part in parts:
+        if isinstance(part, str):
+            digest.update(part.encode('utf-8'))
+        elif isinstance(part, dict):
+            digest.update(part.get('data', b''))
+    draw = int(digest.hexdigest()[:8], 16) / 0x100000000
+    unsure = float(os.getenv('FAKE_GEMINI_LITE_UNSURE', 0.2))
+    if draw < unsure:
+        return 'unsure'
+    if draw < unsure + float(os.getenv('FAKE_GEMINI_LITE_UNPARSED', 0.05)):
+        return 'unparsed'
+    return None
+
+
+def respond(contents, config, behaviour=None):
+    """Analysis text in the format the prompt and config ask for."""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    is_image = any(not isinstance(part, str) for part in parts)
+    pcts = (50, 30, 20) if behaviour == 'unsure' else percentages(parts)
+    if config.get('response_mime_type') == 'application/json':
+        fields = IMAGE_STRUCTURED if is_image else TEXT_STRUCTURED
+        if behaviour == 'unparsed':
+            return json.dumps(fields)
+        return json.dumps({**dict(zip(PERCENT_FIELDS, pcts)), **fields})
+    summary = (IMAGE_SUMMARY if is_image else TEXT_SUMMARY).format(*pcts)
+    if behaviour == 'unparsed':
+        summary = "The content cannot be rated with certainty."
+    if (config.get('max_output_tokens') or 1024) <= 128:
+        return summary
+    images = [part for part in parts if not isinstance(part, str)]
+    if len(images) > 1:
+        notes = ''.join(f"**Image {number}**: {percentages([image])[0]}% likely to be genuine. "
+                        f"A screenshot with no visible editing artifacts.\n"
+                        for number, image in enumerate(images, 1))
+        return summary + "\n\n" + notes + "\n" + IMAGE_SECTIONS
+    if is_image:
+        return summary + "\n\n" + IMAGE_SECTIONS
+    return summary + CANNED_ANALYSIS[CANNED_ANALYSIS.index("\n\n"):]
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        latency = sample_latency()
+        behaviour = None
+        if 'lite' in self.model_name:
+            latency /= float(os.getenv('FAKE_GEMINI_LITE_SPEEDUP', 2))
+            behaviour = lite_behaviour(contents)
+        maybe_fail(latency)
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        prompt_tokens = sum(len(part) // 4 + 1 if isinstance(part, str) else 258 for part in parts)
+        text = respond(contents, kwargs.get('generation_config') or {}, behaviour)
+        if stream:
+            return self._stream(text, latency)
+        time.sleep(latency)
+        return FakeResponse(text, prompt_tokens)
+
+    def _stream(self, text, latency):
+        words = text.split(' ')
+        for i in range(0, len(words), 4):
+            time.sleep(latency * 4 / len(words))
+            yield FakeResponse(' '.join(words[i:i + 4]) + ' ')
+
+
+def install():
+    """Register the stand-in as google.generativeai in sys.modules."""
+    module = types.ModuleType('google.generativeai')
+    module.configure = lambda **kwargs: None
+    module.GenerativeModel = FakeGenerativeModel
+
+    google = sys.modules.get('google')
+    if google is None:
+        google = sys.modules['google'] = types.ModuleType('google')
+        google.__path__ = []
+    google.generativeai = module
+    sys.modules['google.generativeai'] = module
+    return module
@@ -0,0 +1,62 @@
+"""
+Per-worker limit on concurrent Gemini calls.
+
+With threaded Gunicorn workers (see gunicorn.conf.py) a single process can
+serve many requests at once, each blocked only on its own Gemini round trip.
+ConcurrencyLimiter caps how many of those upstream calls one worker makes at
+the same time; callers that cannot get a slot within the queue timeout get
+ServerBusy, which the routes turn into a 503 instead of piling up threads.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+
+class ServerBusy(Exception):
+    """Raised when no model-call slot frees up within the queue timeout."""
+
+
+class ConcurrencyLimiter:
+    """Bounded semaphore with a queue timeout and in-flight/rejection counts."""
+
+    def __init__(self, limit=None, timeout=None):
+        self.limit = limit if limit is not None else \
+            int(os.getenv('MODEL_MAX_CONCURRENCY', os.getenv('GUNICORN_THREADS', 8)))
+        self.timeout = timeout if timeout is not None else \
+            float(os.getenv('MODEL_QUEUE_TIMEOUT', 10))
+        self._semaphore = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold one model-call slot for the duration of the block.
+
+        Args:
+            timeout (float): Queue timeout for this call instead of the default.
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        if not self._semaphore.acquire(timeout=timeout):
+            with self._lock:
+                self.rejected += 1
+            raise ServerBusy(f"All {self.limit} model slots busy for {timeout}s")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        """Return this worker's limit, in-flight and rejected call counts."""
+        return {
+            'limit': self.limit,
+            'inFlight': self.in_flight,
+            'rejected': self.rejected
+        }
+
+
+model_slots = ConcurrencyLimiter()
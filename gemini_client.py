@@ -0,0 +1,411 @@
+"""
+Shared, resilient Gemini client used by project_1.py, app.py and backend/app.py.
+
+Every model call goes through GeminiClient, which adds what the bare SDK calls
+lacked:
+
+* one GenerativeModel per model name, reused across requests (the SDK keeps
+  the underlying connection open);
+* a per-attempt timeout and an overall deadline that stays under the Gunicorn
+  worker timeout;
+* retries of transient failures (429/5xx/timeouts) with full-jitter backoff;
+* a circuit breaker per model that fails fast after repeated transient
+  failures of that model;
+* optional hedging: if an attempt is still running after the recent p95
+  latency (or GEMINI_HEDGE_AFTER), a second identical request is started and
+  whichever finishes first wins;
+* admission through the upstream quota governor shared by all workers
+  (see quota.py), so calls queue briefly for RPM/TPM budget instead of
+  drawing 429s;
+* latency and outcome metrics for every call.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import quota
+from metrics import upstream_seconds, upstream_tokens
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gemini-2.0-flash'
+
+# HTTP status codes (as exposed on google.api_core exceptions) worth retrying
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+_deadline = ContextVar('gemini_deadline', default=None)
+
+
+@contextmanager
+def call_deadline(end):
+    """Finish the model calls made inside the block by time.monotonic() `end`,
+    whatever deadline each of them asks for."""
+    outer = _deadline.get()
+    token = _deadline.set(end if outer is None else min(end, outer))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def is_throttled(error):
+    """True for an upstream 429 (quota exhausted)."""
+    code = getattr(error, 'code', None)
+    code = getattr(code, 'value', code)
+    return code == 429 or type(error).__name__ in {'ResourceExhausted', 'TooManyRequests'}
+
+
+def usage_tokens(response):
+    """Total tokens a response reports it used, or None."""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'total_token_count', None) or None
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the overall call deadline passes before a response."""
+
+
+def is_transient(error):
+    """True for failures that a retry (or another replica) may not repeat."""
+    if isinstance(error, (TimeoutError, ConnectionError, DeadlineExceeded)):
+        return True
+    code = getattr(error, 'code', None)
+    code = getattr(code, 'value', code)  # grpc StatusCode or int
+    return code in RETRYABLE_CODES or type(error).__name__ in {
+        'DeadlineExceeded', 'ServiceUnavailable', 'InternalServerError',
+        'ResourceExhausted', 'TooManyRequests', 'GatewayTimeout', 'RetryError'
+    }
+
+
+class LatencyWindow:
+    """Rolling window of recent latencies (seconds) with percentile queries."""
+
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self):
+        """p50/p95/p99 in milliseconds over the window."""
+        return {
+            f'p{pct}Ms': round(value * 1000, 1) if value is not None else None
+            for pct, value in ((p, self.percentile(p)) for p in (50, 95, 99))
+        }
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive transient failures; after `cooldown`
+    seconds one trial call is let through (half-open) to probe recovery."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.time()
+
+    def release(self):
+        """End an admitted call that never reached upstream (e.g. no quota), so
+        a half-open breaker lets the next call probe instead."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class GeminiClient:
+    """Pooled Gemini access with deadlines, retries, circuit breaking and hedging."""
+
+    def __init__(self):
+        self.timeout = float(os.getenv('GEMINI_TIMEOUT', 20))
+        self.deadline = float(os.getenv('GEMINI_DEADLINE', 25))
+        self.max_retries = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+        self.backoff = float(os.getenv('GEMINI_RETRY_BACKOFF', 0.5))
+        self.hedge = os.getenv('GEMINI_HEDGE', 'false').lower() == 'true'
+        self.hedge_after = float(os.getenv('GEMINI_HEDGE_AFTER', 0)) or None
+        self.breaker_threshold = int(os.getenv('GEMINI_BREAKER_THRESHOLD', 5))
+        self.breaker_cooldown = float(os.getenv('GEMINI_BREAKER_COOLDOWN', 30))
+        self._breakers = {}
+        self.latency = LatencyWindow()
+        self.counts = {'calls': 0, 'errors': 0, 'retries': 0, 'hedges': 0, 'rejected': 0}
+        self._models = {}
+        self._configured = False
+        self._lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='gemini-hedge')
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def model(self, model_name=DEFAULT_MODEL):
+        """Return the shared GenerativeModel for `model_name`."""
+        model = self._models.get(model_name)
+        if model is None:
+            import google.generativeai as genai
+
+            with self._lock:
+                if not self._configured:
+                    genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+                    self._configured = True
+                model = self._models.setdefault(model_name, genai.GenerativeModel(model_name))
+        return model
+
+    def breaker(self, model_name=DEFAULT_MODEL):
+        """Return the CircuitBreaker of `model_name`; one model failing does
+        not stop calls to the others."""
+        with self._lock:
+            breaker = self._breakers.get(model_name)
+            if breaker is None:
+                breaker = self._breakers[model_name] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return breaker
+
+    def _hedge_delay(self):
+        if not self.hedge:
+            return None
+        if self.hedge_after:
+            return self.hedge_after
+        if len(self.latency) >= 20:
+            return self.latency.percentile(95)
+        return None
+
+    def _attempt(self, model, contents, timeout, kwargs, admit_hedge):
+        """One attempt, hedged if slow; `timeout` bounds the whole attempt,
+        hedge included, and is already capped by the overall deadline."""
+        end = time.monotonic() + timeout
+        call = lambda request_timeout: model.generate_content(
+            contents, request_options={'timeout': request_timeout}, **kwargs
+        )
+        delay = self._hedge_delay()
+        if delay is None or delay >= timeout:
+            return call(timeout)
+
+        primary = self._hedge_pool.submit(call, timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if not admit_hedge():
+            # No quota to spare for a second request; keep waiting on the first
+            done, _ = wait([primary], timeout=max(0, end - time.monotonic()))
+            if done:
+                return primary.result()
+            raise DeadlineExceeded(f"No response within {timeout:.1f}s")
+
+        # The hedge only gets what is left of the attempt's time
+        left = end - time.monotonic()
+        if left <= 0:
+            raise DeadlineExceeded(f"No response within {timeout:.1f}s")
+        self._count('hedges')
+        pending = {primary, self._hedge_pool.submit(call, left)}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error or DeadlineExceeded(f"No response within {timeout:.1f}s")
+
+    def generate(self, contents, model_name=DEFAULT_MODEL, deadline=None, **kwargs):
+        """Call generate_content with retries, deadline and circuit breaker.
+
+        Args:
+            contents: Prompt string or list of prompt parts (text, images).
+            model_name (str): Gemini model to call.
+            deadline (float): Overall time budget in seconds for all attempts,
+                cut short by an enclosing call_deadline().
+            **kwargs: Passed through to generate_content (e.g. generation_config).
+
+        Returns:
+            The SDK response object.
+
+        Raises:
+            quota.QuotaExhausted: If the shared upstream quota does not free up
+                within the queue timeout or the deadline.
+        """
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        if _deadline.get() is not None:
+            end = min(end, _deadline.get())
+            if end <= start:
+                raise DeadlineExceeded("Deadline passed before the call started")
+
+        breaker = self.breaker(model_name)
+        if not breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError(f"Gemini circuit breaker for {model_name} is open; failing fast")
+        try:
+            model = self.model(model_name)
+            kind = quota.call_kind(contents)
+            tokens = quota.estimate_tokens(contents, kwargs.get('generation_config'), quota.governor.output_tokens)
+            quota.governor.acquire(tokens, kind, timeout=end - start)
+        except BaseException:
+            # Nothing was sent upstream, so nothing was learned about its health
+            breaker.release()
+            raise
+        admit_hedge = lambda: quota.governor.try_acquire(tokens, kind)
+        attempt = 0
+        while True:
+            remaining = end - time.monotonic()
+            if attempt and remaining > 0:
+                # Retries are admitted again; the breaker has recorded the failure
+                quota.governor.acquire(tokens, kind, timeout=remaining)
+                remaining = end - time.monotonic()
+            self._count('calls')
+            attempt_start = time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"Deadline of {end - start:.1f}s exceeded")
+                response = self._attempt(model, contents, min(self.timeout, remaining), kwargs, admit_hedge)
+            except Exception as e:
+                self._count('errors')
+                elapsed = time.monotonic() - attempt_start
+                upstream_seconds.observe(
+                    elapsed, model=model_name, outcome='throttled' if is_throttled(e) else 'error'
+                )
+                logger.warning(f"Gemini call failed model={model_name} attempt={attempt + 1} "
+                               f"latency_ms={elapsed * 1000:.0f} error={type(e).__name__}: {e}")
+                if is_throttled(e):
+                    quota.governor.throttled()
+                if not is_transient(e):
+                    # Upstream answered (e.g. rejected the input); it is not unhealthy
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt >= self.max_retries or breaker.state == 'open':
+                    raise
+                sleep = random.uniform(0, self.backoff * (2 ** attempt))
+                if time.monotonic() + sleep >= end:
+                    raise
+                self._count('retries')
+                time.sleep(sleep)
+                attempt += 1
+                continue
+
+            breaker.record_success()
+            upstream_seconds.observe(time.monotonic() - attempt_start, model=model_name, outcome='ok')
+            used = usage_tokens(response)
+            if used:
+                upstream_tokens.inc(used, model=model_name)
+            quota.governor.settle(tokens, used)
+            elapsed = time.monotonic() - start
+            self.latency.add(elapsed)
+            logger.info(f"Gemini call ok model={model_name} attempts={attempt + 1} "
+                        f"latency_ms={elapsed * 1000:.0f}")
+            return response
+
+    def stream(self, contents, model_name=DEFAULT_MODEL, **kwargs):
+        """Stream generate_content chunks through the circuit breaker.
+
+        Streams are not retried or hedged, since chunks may already have been
+        forwarded to the client; the per-attempt timeout still applies. They
+        are admitted by the quota governor like any other call.
+        """
+        breaker = self.breaker(model_name)
+        if not breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError(f"Gemini circuit breaker for {model_name} is open; failing fast")
+
+        try:
+            model = self.model(model_name)
+            quota.governor.acquire(
+                quota.estimate_tokens(contents, kwargs.get('generation_config'), quota.governor.output_tokens),
+                quota.call_kind(contents)
+            )
+        except BaseException:
+            breaker.release()
+            raise
+        self._count('calls')
+        start = time.monotonic()
+        try:
+            for chunk in model.generate_content(
+                contents, stream=True, request_options={'timeout': self.timeout}, **kwargs
+            ):
+                yield chunk
+        except GeneratorExit:
+            # The client went away mid-stream; upstream was still responding
+            breaker.record_success()
+            raise
+        except Exception as e:
+            self._count('errors')
+            upstream_seconds.observe(
+                time.monotonic() - start, model=model_name, outcome='throttled' if is_throttled(e) else 'error'
+            )
+            if is_throttled(e):
+                quota.governor.throttled()
+            if is_transient(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        self.latency.add(time.monotonic() - start)
+        upstream_seconds.observe(time.monotonic() - start, model=model_name, outcome='ok')
+
+    def stats(self):
+        """Call counts, breaker state per model and latency percentiles for this worker."""
+        with self._lock:
+            counts = dict(self.counts)
+            breakers = dict(self._breakers)
+        return {
+            **counts,
+            'breakers': {name: breaker.state for name, breaker in sorted(breakers.items())},
+            'latency': self.latency.summary()
+        }
+
+
+client = GeminiClient()
@@ -8,12 +8,22 @@ bind = f"0.0.0.0:{os.getenv('PORT', '8001')}"
 backlog = 2048
 
 # Worker processes
-workers = 2
-worker_class = "sync"
+# "gthread" serves `threads` requests per worker, so a worker blocked on one
+# Gemini round trip keeps serving others. Set GUNICORN_WORKER_CLASS=sync for
+# the old one-request-per-worker behaviour. Model calls per worker are capped
+# separately by MODEL_MAX_CONCURRENCY (see concurrency.py).
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
 
+# Load the app, the Gemini SDK and the image plugins once in the master (see
+# warmup.py) so workers fork warm and share that memory copy-on-write.
+# GUNICORN_PRELOAD=false imports the app in each worker instead.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
 # Restart workers after this many requests, to help prevent memory leaks
 max_requests = 1000
 max_requests_jitter = 100
@@ -34,4 +44,20 @@ limit_request_field_size = 8190
 
 # SSL (uncomment for HTTPS)
 # keyfile = "/path/to/keyfile"
-# certfile = "/path/to/certfile"
\ No newline at end of file
+# certfile = "/path/to/certfile"
+
+
+def on_starting(server):
+    """Warm up the master before the first fork when preloading."""
+    if server.cfg.preload_app:
+        from warmup import preload
+        preload()
+
+
+def worker_exit(server, worker):
+    """Flush the exiting worker's pending /metrics observations (see metrics.py)
+    and its queued verdict store rows (see verdict_store.py)."""
+    from metrics import registry
+    registry.flush()
+    from app import verdict_store
+    verdict_store.flush()
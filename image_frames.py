@@ -0,0 +1,181 @@
+"""
+Animated uploads and multi-image checks, analyzed in one model call.
+
+An animated GIF or WebP used to be judged on its first frame only, and a set
+of screenshots took one request (and one Gemini call) each. Now the frames
+that matter are sent together with one prompt, and the response carries one
+verdict for the whole set plus a note for every image.
+
+Keyframes are picked with cheap frame differencing. Each decoded frame is
+reduced to a 32x32 grayscale signature and kept only if at least
+KEYFRAME_MIN_CHANGE of its cells differ noticeably from the last kept frame,
+so a cut or a new caption counts but a small moving detail does not. Only
+frame thumbnails are kept: when more than twice
+ANIMATION_MAX_FRAMES are collected, every other one is dropped, and the
+final keyframes are spread evenly over the ones left. Frames are decoded one
+at a time, up to ANIMATION_MAX_SCAN_FRAMES of them and ANIMATION_MAX_PIXELS
+decoded pixels in total, so a long animation cannot cost more than a few
+large stills.
+"""
+import os
+import re
+from collections import namedtuple
+
+from PIL import Image, ImageChops
+
+from image_preprocess import ImageRejected, check_memory_budget, encode_blob, open_image, prepare_image
+from metrics import span
+
+MULTI_IMAGE_MAX_FILES = int(os.getenv('MULTI_IMAGE_MAX_FILES', 8))
+MULTI_IMAGE_MAX_FRAMES = int(os.getenv('MULTI_IMAGE_MAX_FRAMES', 12))
+ANIMATION_MAX_FRAMES = int(os.getenv('ANIMATION_MAX_FRAMES', 6))
+ANIMATION_MAX_SCAN_FRAMES = int(os.getenv('ANIMATION_MAX_SCAN_FRAMES', 300))
+ANIMATION_MAX_PIXELS = int(os.getenv('ANIMATION_MAX_PIXELS', 50_000_000))
+# Share of signature cells that must change for a frame to be a new keyframe
+KEYFRAME_MIN_CHANGE = float(os.getenv('KEYFRAME_MIN_CHANGE', 0.05))
+# Longest side of each frame sent with others; several small images cost
+# the model about as much as one large one
+FRAME_MAX_SIDE = int(os.getenv('FRAME_MAX_SIDE', 512))
+
+SIGNATURE_SIZE = 32
+# Gray levels a signature cell must move by to count as changed
+CELL_CHANGE = 24
+
+# Per-image line of a multi-image analysis: "**Image 2**: 80% likely to be genuine. ..."
+_IMAGE_NOTE = re.compile(r'^[\s*#>-]*image\s+(\d+)\b[*:\s]*(.*)$', re.IGNORECASE | re.MULTILINE)
+_GENUINE = re.compile(r'(\d+)%\s+likely\s+to\s+be\s+genuine', re.IGNORECASE)
+
+Frame = namedtuple('Frame', 'upload index timestamp_ms image blob')
+
+
+def _signature(image):
+    return image.resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.Resampling.BOX, reducing_gap=1.0).convert('L')
+
+
+def _changed(a, b):
+    """Share of the cells of two signatures that differ by more than CELL_CHANGE."""
+    histogram = ImageChops.difference(a, b).histogram()
+    return sum(histogram[CELL_CHANGE + 1:]) / (SIGNATURE_SIZE * SIGNATURE_SIZE)
+
+
+def _spread(items, count):
+    """`count` items spread evenly over `items`, first and last included."""
+    if len(items) <= count:
+        return items
+    if count == 1:
+        return items[:1]
+    return [items[round(i * (len(items) - 1) / (count - 1))] for i in range(count)]
+
+
+def sample_keyframes(image, max_frames=ANIMATION_MAX_FRAMES, max_side=FRAME_MAX_SIDE,
+                     min_change=KEYFRAME_MIN_CHANGE):
+    """Pick up to `max_frames` visually distinct frames of an opened animation.
+
+    Returns:
+        list: (index, timestamp_ms, RGB image no larger than `max_side`) of
+        each keyframe, in playback order.
+
+    Raises:
+        ImageRejected: If a frame is over the memory budget or corrupt.
+    """
+    check_memory_budget(image)
+    width, height = image.size
+    max_scan = min(ANIMATION_MAX_SCAN_FRAMES, max(1, ANIMATION_MAX_PIXELS // (width * height)))
+    kept = []
+    timestamp = 0
+    for index in range(max_scan):
+        try:
+            image.seek(index)
+        except EOFError:
+            break
+        with span('image.decode'):
+            try:
+                image.load()
+            except Exception:
+                raise ImageRejected("Corrupt or truncated image data")
+        with span('image.keyframe'):
+            # Palette frames (a GIF's first) cannot be resized as they are
+            signature = _signature(image if image.mode in ('RGB', 'RGBA', 'L') else image.convert('RGB'))
+            if not kept or _changed(signature, kept[-1][3]) >= min_change:
+                # A copy: the next seek reuses the animation's frame buffer
+                frame = image.convert('RGB')
+                frame.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+                kept.append((index, timestamp, frame, signature))
+                if len(kept) >= 2 * max_frames:
+                    # Bound the thumbnails held: keep every other one (and the latest to compare with)
+                    kept = kept[:-1:2] + kept[-1:]
+        timestamp += image.info.get('duration') or 0
+    return [(index, timestamp, frame) for index, timestamp, frame, _ in _spread(kept, max_frames)]
+
+
+def prepare_frames(stream, upload=1, max_frames=ANIMATION_MAX_FRAMES, max_side=None):
+    """Decode an upload into the frames to send: keyframes of an animation,
+    or the image itself.
+
+    Args:
+        stream: The uploaded file, positioned at its start.
+        upload (int): Position of the upload in the request, from 1.
+        max_frames (int): Most keyframes taken from an animation.
+        max_side (int): Longest side of a still image (IMAGE_MAX_SIDE by
+            default); keyframes are no larger than FRAME_MAX_SIDE.
+
+    Returns:
+        list: Frame(upload, index, timestamp_ms, image, blob) tuples.
+
+    Raises:
+        ImageRejected: If the file is not an image that may be decoded.
+    """
+    image = open_image(stream)
+    if not getattr(image, 'is_animated', False):
+        stream.seek(0)
+        prepared = prepare_image(stream, max_side)
+        return [Frame(upload, 0, None, prepared.image, prepared.blob)]
+    return [Frame(upload, index, timestamp, frame, encode_blob(frame))
+            for index, timestamp, frame in sample_keyframes(image, max_frames)]
+
+
+def describe_frames(frames):
+    """Numbered list of the images of a multi-image prompt.
+
+    Only positions and timestamps are described; file names are user input
+    and stay out of the prompt.
+    """
+    lines = []
+    for number, frame in enumerate(frames, 1):
+        line = f"Image {number}: upload {frame.upload}"
+        if frame.timestamp_ms is not None:
+            line += f", frame {frame.index + 1} of an animation at {frame.timestamp_ms / 1000:.1f}s"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def frame_notes(analysis, frames):
+    """Per-image notes of a multi-image analysis.
+
+    Args:
+        analysis (str): The model response.
+        frames (list): The Frames sent, in prompt order.
+
+    Returns:
+        list: One dict per frame with its upload, frame index and timestamp,
+        and the model's note and genuine percentage where it gave them.
+    """
+    notes = {}
+    for match in _IMAGE_NOTE.finditer(analysis):
+        number = int(match.group(1))
+        if 1 <= number <= len(frames) and number not in notes:
+            notes[number] = match.group(2).strip().strip('*').strip()
+
+    items = []
+    for number, frame in enumerate(frames, 1):
+        item = {'image': number, 'upload': frame.upload, 'frame': frame.index}
+        if frame.timestamp_ms is not None:
+            item['timestampMs'] = frame.timestamp_ms
+        note = notes.get(number)
+        if note:
+            item['note'] = note
+            genuine = _GENUINE.search(note)
+            if genuine:
+                item['genuinePercent'] = int(genuine.group(1))
+        items.append(item)
+    return items
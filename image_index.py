@@ -0,0 +1,246 @@
+"""
+Perceptual-hash index of previously analyzed images.
+
+Re-uploads of the same meme (recompressed, resized, lightly edited) produce a
+64-bit difference hash (dHash) within a few bits of the original. Hashes are
+kept in a multi-index Hamming table: the hash is split into four 16-bit chunks,
+and by the pigeonhole principle any hash within distance r of the query agrees
+with it on at least one chunk to within r // 4 bits. Only those buckets are
+checked, so lookups stay fast with millions of stored hashes.
+
+Hashes and verdicts are persisted in SQLite (see storage.py); each worker keeps
+the hashes in memory and pulls in rows added by other workers on every lookup.
+Like the verdict cache, entries expire after IMAGE_INDEX_TTL and only the
+newest IMAGE_INDEX_MAX_ENTRIES are kept. Both default to the verdict cache's
+settings. Evicted rows are dropped from every worker's in-memory index on its
+next sync.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from itertools import combinations
+
+from storage import connect, incr_counter, read_counters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_hashes (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS image_hashes_created_at ON image_hashes (created_at);
+"""
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(value):
+        return bin(value).count('1')
+
+
+def dhash(image, hash_size=8):
+    """Return the 64-bit difference hash of a PIL image as an int."""
+    from PIL import Image
+
+    gray = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    return _popcount(a ^ b)
+
+
+def _flip_masks(radius):
+    """All CHUNK_BITS-wide masks with at most `radius` bits set."""
+    masks = []
+    for r in range(radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return masks
+
+
+class HammingIndex:
+    """In-memory multi-index hash table for 64-bit perceptual hashes.
+
+    Item ids must be added in increasing order; evict_before() then drops the
+    oldest entries by moving a start position, and the tables are rebuilt once
+    most of the positions are dead.
+    """
+
+    def __init__(self):
+        self.hashes = array('Q')
+        self.ids = array('q')
+        self.tables = [{} for _ in range(CHUNKS)]
+        self.start = 0
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.hashes) - self.start
+
+    def add(self, value, item_id):
+        position = len(self.hashes)
+        self.hashes.append(value)
+        self.ids.append(item_id)
+        for chunk, table in enumerate(self.tables):
+            key = (value >> (chunk * CHUNK_BITS)) & CHUNK_MASK
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = [position]
+            else:
+                bucket.append(position)
+
+    def search(self, value, max_distance):
+        """Return (item_id, distance) of the closest hash within max_distance, or None."""
+        masks = self._masks.get(max_distance)
+        if masks is None:
+            masks = self._masks[max_distance] = _flip_masks(max_distance // CHUNKS)
+
+        best = None
+        seen = set()
+        hashes = self.hashes
+        for chunk, table in enumerate(self.tables):
+            key = (value >> (chunk * CHUNK_BITS)) & CHUNK_MASK
+            for mask in masks:
+                bucket = table.get(key ^ mask)
+                if not bucket:
+                    continue
+                for position in bucket:
+                    if position < self.start or position in seen:
+                        continue
+                    seen.add(position)
+                    distance = _popcount(hashes[position] ^ value)
+                    if distance <= max_distance and (best is None or distance < best[1]):
+                        best = (position, distance)
+                        if distance == 0:
+                            return self.ids[position], 0
+        if best is None:
+            return None
+        return self.ids[best[0]], best[1]
+
+    def evict_before(self, item_id):
+        """Drop every entry whose id is below `item_id`."""
+        ids = self.ids
+        while self.start < len(ids) and ids[self.start] < item_id:
+            self.start += 1
+        if self.start > len(ids) // 2:
+            self._compact()
+
+    def _compact(self):
+        hashes, ids = self.hashes[self.start:], self.ids[self.start:]
+        self.hashes, self.ids = array('Q'), array('q')
+        self.tables = [{} for _ in range(CHUNKS)]
+        self.start = 0
+        for value, item_id in zip(hashes, ids):
+            self.add(value, item_id)
+
+
+class ImageVerdictIndex:
+    """Persistent near-duplicate lookup from image hash to stored verdict."""
+
+    def __init__(self, db_name='image_index.db', max_distance=None, max_entries=None, ttl=None):
+        self.db_name = db_name
+        self.max_distance = max_distance if max_distance is not None else \
+            int(os.getenv('IMAGE_INDEX_MAX_DISTANCE', 6))
+        self.max_entries = max_entries if max_entries is not None else \
+            int(os.getenv('IMAGE_INDEX_MAX_ENTRIES', os.getenv('VERDICT_CACHE_MAX_ENTRIES', 10000)))
+        self.ttl = ttl if ttl is not None else \
+            int(os.getenv('IMAGE_INDEX_TTL', os.getenv('VERDICT_CACHE_TTL', 6 * 60 * 60)))
+        self.index = HammingIndex()
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def _sync(self, conn):
+        """Load hashes added since the last sync (including by other workers)
+        and drop the ones evicted since."""
+        rows = conn.execute(
+            'SELECT id, hash FROM image_hashes WHERE id > ? ORDER BY id', (self._last_id,)
+        ).fetchall()
+        for row_id, value in rows:
+            self.index.add(int(value, 16), row_id)
+            self._last_id = row_id
+        oldest = conn.execute('SELECT MIN(id) FROM image_hashes').fetchone()[0]
+        self.index.evict_before(self._last_id + 1 if oldest is None else oldest)
+
+    def lookup(self, image_hash):
+        """Return (verdict, distance) for the nearest stored image, or None."""
+        try:
+            conn = self._conn()
+            with self._lock:
+                self._sync(conn)
+                match = self.index.search(image_hash, self.max_distance)
+            if match is None:
+                incr_counter(conn, 'image_index.misses')
+                return None
+            # Expired, or evicted by another worker since the sync
+            row = conn.execute(
+                'SELECT verdict FROM image_hashes WHERE id = ? AND created_at > ?',
+                (match[0], time.time() - self.ttl)
+            ).fetchone()
+            if row is None:
+                incr_counter(conn, 'image_index.misses')
+                return None
+            incr_counter(conn, 'image_index.hits')
+            return json.loads(row[0]), match[1]
+        except sqlite3.Error as e:
+            logger.warning(f"Image index lookup failed: {e}")
+            return None
+
+    def add(self, image_hash, verdict):
+        """Record the verdict for a newly analyzed image and evict expired
+        and overflow entries."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                'INSERT INTO image_hashes (hash, verdict, created_at) VALUES (?, ?, ?)',
+                (format(image_hash, '016x'), json.dumps(verdict), now)
+            )
+            conn.execute('DELETE FROM image_hashes WHERE created_at <= ?', (now - self.ttl,))
+            conn.execute(
+                'DELETE FROM image_hashes WHERE id <= ('
+                'SELECT id FROM image_hashes ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (self.max_entries,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Image index store failed: {e}")
+
+    def stats(self):
+        try:
+            conn = self._conn()
+            counters = read_counters(conn, 'image_index.')
+            entries = conn.execute('SELECT COUNT(*) FROM image_hashes').fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Image index stats failed: {e}")
+            return {}
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'entries': entries,
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl,
+            'maxDistance': self.max_distance
+        }
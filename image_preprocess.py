@@ -0,0 +1,126 @@
+"""
+Single-decode, memory-bounded preprocessing of uploaded images.
+
+The upload is decoded once, straight to the resolution the model needs:
+
+1. Only the header is read to check the format and the pixel budget, so
+   decompression bombs are rejected before any pixel data is decoded.
+2. JPEGs use draft mode, letting libjpeg decode at 1/2, 1/4 or 1/8 scale
+   instead of materializing the full-resolution bitmap.
+3. The estimated decoded size is checked against a memory budget, then the
+   image is decoded once (which also validates it) and downscaled.
+4. The small RGB image is re-encoded as a compact JPEG for the model upload.
+
+Each step is timed as an 'image.*' stage in metrics.py.
+"""
+import os
+from collections import namedtuple
+from io import BytesIO
+
+from PIL import Image
+
+from metrics import span
+
+ALLOWED_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP'}
+
+MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 1536))
+MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+MEMORY_BUDGET = int(os.getenv('IMAGE_MEMORY_BUDGET', 160 * 1024 * 1024))
+JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 85))
+
+# Let our own pixel budget, not PIL's warning threshold, decide what is too big
+Image.MAX_IMAGE_PIXELS = None
+
+PreparedImage = namedtuple('PreparedImage', ['image', 'blob', 'original_size', 'format'])
+
+
+class ImageRejected(ValueError):
+    """The upload is not a supported image or exceeds the pixel/memory budget."""
+
+
+def _bytes_per_pixel(mode):
+    return {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'LA': 2, 'RGB': 3, 'YCbCr': 3}.get(mode, 4)
+
+
+def open_image(stream):
+    """Read only the header of an upload and check its format and pixel budget.
+
+    Returns:
+        The opened, not yet decoded, PIL image.
+
+    Raises:
+        ImageRejected: If the upload is not a supported image within the pixel budget.
+    """
+    with span('image.header'):
+        try:
+            image = Image.open(stream)
+        except Exception:
+            raise ImageRejected("Not a valid image file")
+
+    if image.format not in ALLOWED_FORMATS:
+        raise ImageRejected(f"Unsupported image format: {image.format}")
+
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ImageRejected(f"Image too large: {width}x{height} exceeds {MAX_PIXELS} pixels")
+    return image
+
+
+def check_memory_budget(image):
+    """Raise ImageRejected if decoding one frame of `image` would exceed MEMORY_BUDGET."""
+    decoded_bytes = image.size[0] * image.size[1] * _bytes_per_pixel(image.mode)
+    if decoded_bytes > MEMORY_BUDGET:
+        raise ImageRejected(
+            f"Image needs {decoded_bytes // (1024 * 1024)}MB to decode, "
+            f"over the {MEMORY_BUDGET // (1024 * 1024)}MB budget"
+        )
+
+
+def encode_blob(image):
+    """Encode a small RGB image as the compact JPEG blob sent to Gemini."""
+    buffer = BytesIO()
+    with span('image.encode'):
+        image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return {'mime_type': 'image/jpeg', 'data': buffer.getvalue()}
+
+
+def prepare_image(stream, max_side=None):
+    """Validate, decode and downscale an uploaded image in one pass.
+
+    Args:
+        stream: A binary file object positioned at the start of the upload.
+        max_side (int): Longest side of the prepared image in pixels.
+
+    Returns:
+        PreparedImage: The downscaled RGB PIL image, a {'mime_type', 'data'}
+        blob ready to send to Gemini, the original size and the source format.
+
+    Raises:
+        ImageRejected: If the upload is not a valid, supported image within budget.
+    """
+    max_side = max_side or MAX_SIDE
+    image = open_image(stream)
+    source_format = image.format
+    original_size = image.size
+
+    # JPEG: let the decoder scale down by 1/2, 1/4 or 1/8 while decoding
+    if image.format == 'JPEG':
+        image.draft('RGB', (max_side, max_side))
+
+    check_memory_budget(image)
+
+    with span('image.decode'):
+        try:
+            # The single decode doubles as validation: truncated or corrupt data raises here
+            image.load()
+        except Exception:
+            raise ImageRejected("Corrupt or truncated image data")
+
+    if max(image.size) > max_side:
+        with span('image.thumbnail'):
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if image.mode != 'RGB':
+        with span('image.convert'):
+            image = image.convert('RGB')
+
+    return PreparedImage(image, encode_blob(image), original_size, source_format)
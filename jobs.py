@@ -0,0 +1,259 @@
+"""
+Asynchronous analysis jobs.
+
+POST /jobs stores the submission in a SQLite job store (see storage.py) and
+returns its id at once; GET /jobs/<id> reports its status and, once done, the
+same verdict /check-text or /check-image would have returned. Jobs run on a
+small per-worker thread pool, so a slow image analysis no longer holds a
+request thread for its whole duration.
+
+Because the store is shared, jobs survive the worker that accepted them: a
+running job holds a lease, and a periodic sweep in every worker (also run on
+each poll) re-claims queued or running jobs whose lease has lapsed, e.g.
+after Gunicorn recycled their worker through max_requests. Finished jobs are
+kept for JOBS_RETENTION seconds and then deleted.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from concurrency import ServerBusy
+from storage import connect, incr_counter, read_counters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    payload BLOB,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    cache_status TEXT,
+    owner TEXT,
+    lease_expires REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs(status, lease_expires);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs(finished_at);
+"""
+
+PENDING = ('queued', 'running')
+
+
+class JobFailed(Exception):
+    """Raised by a job handler for an analysis that cannot succeed on retry."""
+
+
+class JobQueue:
+    """SQLite-backed job store with a per-worker pool of job runners.
+
+    Args:
+        handlers (dict): kind -> handler(payload, params) returning
+            (result, cache_status); raise JobFailed for a permanent failure
+            and ServerBusy to run the job again later.
+    """
+
+    def __init__(self, handlers, db_name='jobs.db', max_workers=None, retention=None,
+                 lease_ttl=None, max_attempts=None, sweep_interval=5.0):
+        self.handlers = handlers
+        self.db_name = db_name
+        self.max_workers = max_workers if max_workers is not None else \
+            int(os.getenv('JOBS_MAX_WORKERS', 2))
+        self.retention = retention if retention is not None else \
+            float(os.getenv('JOBS_RETENTION', 3600))
+        self.lease_ttl = lease_ttl if lease_ttl is not None else \
+            float(os.getenv('JOBS_LEASE_TTL', 90))
+        self.max_attempts = max_attempts if max_attempts is not None else \
+            int(os.getenv('JOBS_MAX_ATTEMPTS', 3))
+        self.sweep_interval = sweep_interval
+        self._pid = None
+        self._owner = None
+        self._executor = None
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def _ensure_started(self):
+        """Start this process's runner pool and sweeper (again after a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='jobs')
+            threading.Thread(target=self._sweep_forever, name='jobs-sweeper', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, kind, payload, params=None):
+        """Store a job and queue it on this worker.
+
+        Args:
+            kind (str): Handler name, e.g. 'text' or 'image'.
+            payload (bytes): The submitted text (UTF-8) or image file.
+            params (dict): JSON-serializable options passed to the handler.
+
+        Returns:
+            str: The job id.
+        """
+        self._ensure_started()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT INTO jobs (id, kind, params, payload, status, owner, lease_expires, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, kind, json.dumps(params or {}), payload, 'queued', self._owner, now + self.lease_ttl, now)
+        )
+        incr_counter(conn, 'jobs.submitted')
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Return the job's status dict, or None if unknown or expired."""
+        self._ensure_started()
+        self._maybe_sweep()
+        row = self._conn().execute(
+            'SELECT id, kind, status, result, error, cache_status, attempts, created_at, started_at, finished_at '
+            'FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, result, error, cache_status, attempts, created_at, started_at, finished_at = row
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'status': status,
+            'attempts': attempts,
+            'createdAt': created_at,
+            'startedAt': started_at,
+            'finishedAt': finished_at
+        }
+        if result is not None:
+            job['result'] = json.loads(result)
+            job['cacheStatus'] = cache_status
+        if error is not None:
+            job['error'] = error
+        if finished_at is not None:
+            job['expiresAt'] = finished_at + self.retention
+        return job
+
+    def _claim(self, conn, job_id):
+        """Mark a job running under this worker's lease and return (kind, params,
+        payload, attempts), or None if another worker has it."""
+        now = time.time()
+        claimed = conn.execute(
+            'UPDATE jobs SET status = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, '
+            'started_at = COALESCE(started_at, ?) '
+            'WHERE id = ? AND status IN (?, ?) AND (owner = ? OR lease_expires <= ?)',
+            ('running', self._owner, now + self.lease_ttl, now, job_id, *PENDING, self._owner, now)
+        ).rowcount
+        if not claimed:
+            return None
+        return conn.execute('SELECT kind, params, payload, attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+    def _finish(self, conn, job_id, status, result=None, cache_status=None, error=None):
+        conn.execute(
+            'UPDATE jobs SET status = ?, result = ?, cache_status = ?, error = ?, payload = NULL, '
+            'finished_at = ? WHERE id = ? AND owner = ?',
+            (status, json.dumps(result) if result is not None else None, cache_status, error,
+             time.time(), job_id, self._owner)
+        )
+        incr_counter(conn, f'jobs.{status}')
+
+    def _run(self, job_id):
+        try:
+            conn = self._conn()
+            job = self._claim(conn, job_id)
+            if job is None:
+                return
+            kind, params, payload, attempts = job
+            handler = self.handlers.get(kind)
+            if handler is None:
+                self._finish(conn, job_id, 'failed', error=f'Unknown job kind: {kind}')
+                return
+            if attempts > self.max_attempts:
+                # Its earlier runs were lost (e.g. the worker kept dying mid-job)
+                self._finish(conn, job_id, 'failed', error='The job could not be completed. Please submit it again.')
+                return
+            try:
+                result, cache_status = handler(payload, json.loads(params))
+            except ServerBusy as e:
+                if attempts >= self.max_attempts:
+                    self._finish(conn, job_id, 'failed', error='Server busy. Please submit the job again later.')
+                    return
+                # Leave it to a later sweep (here or in another worker) to retry
+                logger.info(f"Job {job_id} deferred: {e}")
+                conn.execute(
+                    'UPDATE jobs SET status = ?, lease_expires = ? WHERE id = ? AND owner = ?',
+                    ('queued', time.time() + self.sweep_interval * attempts, job_id, self._owner)
+                )
+                return
+            except JobFailed as e:
+                self._finish(conn, job_id, 'failed', error=str(e))
+                return
+            self._finish(conn, job_id, 'done', result, cache_status)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            try:
+                self._finish(self._conn(), job_id, 'failed',
+                             error='An error occurred while running the job. Please try again.')
+            except sqlite3.Error:
+                pass
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def sweep(self):
+        """Re-run jobs whose lease lapsed and delete jobs past retention."""
+        self._last_sweep = time.monotonic()
+        try:
+            conn = self._conn()
+            now = time.time()
+            stale = [job_id for job_id, in conn.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) AND lease_expires <= ? '
+                'ORDER BY created_at LIMIT ?', (*PENDING, now, self.max_workers * 4)
+            )]
+            for job_id in stale:
+                self._executor.submit(self._run, job_id)
+            conn.execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                         (now - self.retention,))
+        except sqlite3.Error as e:
+            logger.warning(f"Job sweep failed: {e}")
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            self._maybe_sweep()
+
+    def stats(self):
+        """Jobs by status (shared by all workers) and lifetime counts."""
+        try:
+            conn = self._conn()
+            by_status = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+            counters = read_counters(conn, 'jobs.')
+        except sqlite3.Error as e:
+            logger.warning(f"Job stats failed: {e}")
+            return {}
+        return {
+            'queued': by_status.get('queued', 0),
+            'running': by_status.get('running', 0),
+            'done': by_status.get('done', 0),
+            'failed': by_status.get('failed', 0),
+            'submitted': counters.get('submitted', 0),
+            'retentionSeconds': self.retention
+        }
@@ -0,0 +1,177 @@
+"""
+Long-document mode for /check-text.
+
+A normal check analyzes only the first TEXT_MAX_CHARS characters of a
+submission. With {"mode": "document"} the whole text (up to
+TEXT_MAX_INPUT_CHARS) is split into sentence-bounded chunks of at most
+LONG_DOC_CHUNK_CHARS, each chunk is checked like a text of its own (so it is
+cached, coalesced and pre-screened like one), and the chunk verdicts are
+merged into one document verdict that keeps the detail of every chunk. The
+chunks are analyzed concurrently, so a document takes about as long as its
+slowest chunk rather than the sum of all of them.
+
+A document is rated accurate only if every chunk is; otherwise its
+confidence is that of the most confidently flagged chunk.
+"""
+import os
+import re
+from collections import namedtuple
+
+MODES = ('single', 'document')
+DEFAULT_MODE = 'single'
+
+LONG_DOC_CHUNK_CHARS = int(os.getenv('LONG_DOC_CHUNK_CHARS', 1500))
+LONG_DOC_MAX_CHUNKS = int(os.getenv('LONG_DOC_MAX_CHUNKS', 16))
+LONG_DOC_MAX_WORKERS = int(os.getenv('LONG_DOC_MAX_WORKERS', 8))
+
+# Chunks shorter than this (a stray heading or closing word) are not analyzed
+MIN_CHUNK_CHARS = 10
+# Flagged chunks quoted in the document explanation
+EXPLAINED_CHUNKS = 3
+EXCERPT_CHARS = 160
+
+# End of a sentence (with any closing quotes or brackets) or of a paragraph
+_SENTENCE_END = re.compile(r'[.!?…]+["\'”’)\]]*\s+|\n\s*\n')
+
+Chunk = namedtuple('Chunk', 'start end text')
+
+
+def parse_mode(value):
+    """Validate a requested mode; None or '' means the default.
+
+    Raises:
+        ValueError: For an unknown mode.
+    """
+    if not value:
+        return DEFAULT_MODE
+    mode = str(value).strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode (expected one of: {', '.join(MODES)})")
+    return mode
+
+
+def _sentence_ends(text):
+    ends = [m.end() for m in _SENTENCE_END.finditer(text)]
+    if not ends or ends[-1] < len(text):
+        ends.append(len(text))
+    return ends
+
+
+def split_chunks(text, max_chars=LONG_DOC_CHUNK_CHARS, max_chunks=LONG_DOC_MAX_CHUNKS):
+    """Split `text` into chunks of whole sentences.
+
+    Sentences are packed greedily up to `max_chars` per chunk; a single
+    sentence longer than that is cut at the last space that fits.
+
+    Returns:
+        tuple: (chunks, truncated) - a list of Chunk(start, end, text) with
+        offsets into `text`, and whether chunks past `max_chunks` were dropped.
+    """
+    spans = []
+    start = end = 0
+    for sentence_end in _sentence_ends(text):
+        if sentence_end - start > max_chars and end > start:
+            spans.append((start, end))
+            start = end
+        while sentence_end - start > max_chars:
+            cut = text.rfind(' ', start + 1, start + max_chars + 1)
+            if cut <= start:
+                cut = start + max_chars
+            spans.append((start, cut))
+            start = cut
+        end = sentence_end
+    if end > start:
+        spans.append((start, end))
+
+    chunks = []
+    for start, end in spans:
+        chunk = text[start:end].strip()
+        if len(chunk) >= MIN_CHUNK_CHARS:
+            chunks.append(Chunk(start, end, chunk))
+    return chunks[:max_chunks], len(chunks) > max_chunks
+
+
+def _summary(explanation):
+    """First paragraph of a chunk's explanation."""
+    return explanation.strip().split('\n\n', 1)[0].strip()
+
+
+def merge_verdicts(chunks, outcomes, truncated=False):
+    """Merge per-chunk verdicts into one document verdict.
+
+    Args:
+        chunks (list): The Chunk of each analysis.
+        outcomes (list): (result, cache_status) of each chunk, as returned by
+            analyze_text_cached.
+        truncated (bool): Whether the document had more chunks than were analyzed.
+
+    Returns:
+        dict: The verdict JSON of /check-text, with a 'document' entry holding
+        the verdict of each chunk, or None if no chunk could be analyzed.
+    """
+    claims = []
+    for index, (chunk, (result, status)) in enumerate(zip(chunks, outcomes)):
+        claim = {
+            'index': index,
+            'start': chunk.start,
+            'end': chunk.end,
+            'excerpt': chunk.text[:EXCERPT_CHARS],
+            'cacheStatus': status
+        }
+        if status == 'ERROR':
+            claim['error'] = 'This section could not be analyzed.'
+        else:
+            claim.update({
+                'isTrue': result['isTrue'],
+                'confidence': result['confidence'],
+                'explanation': result.get('explanation', '')
+            })
+        claims.append(claim)
+
+    analyzed = [claim for claim in claims if 'error' not in claim]
+    if not analyzed:
+        return None
+    flagged = sorted((claim for claim in analyzed if not claim['isTrue']),
+                     key=lambda claim: claim['confidence'], reverse=True)
+    if flagged:
+        is_true = False
+        confidence = flagged[0]['confidence']
+    else:
+        is_true = True
+        weights = [claim['end'] - claim['start'] for claim in analyzed]
+        confidence = round(sum(claim['confidence'] * weight for claim, weight in zip(analyzed, weights))
+                           / sum(weights))
+
+    failed = len(claims) - len(analyzed)
+    lines = [
+        f"This document was checked in {len(claims)} section{'s' if len(claims) != 1 else ''}: "
+        f"{len(flagged)} not rated as accurate, "
+        f"{len(analyzed) - len(flagged)} rated as accurate"
+        + (f", {failed} could not be analyzed" if failed else '')
+        + (", and only the beginning of the document was checked" if truncated else '')
+        + '.'
+    ]
+    for claim in flagged[:EXPLAINED_CHUNKS]:
+        lines.append(f"Section {claim['index'] + 1}: {_summary(claim['explanation'])}")
+
+    sources = []
+    for result, status in outcomes:
+        if status == 'ERROR':
+            continue
+        for source in result.get('sources', []):
+            if source not in sources:
+                sources.append(source)
+
+    return {
+        'isTrue': is_true,
+        'confidence': confidence,
+        'explanation': '\n\n'.join(lines),
+        'sources': sources,
+        'document': {
+            'chunks': len(claims),
+            'flagged': len(flagged),
+            'failed': failed,
+            'truncated': truncated,
+            'claims': claims
+        }
+    }
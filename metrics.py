@@ -0,0 +1,249 @@
+"""
+Hot-path instrumentation exported in the Prometheus text format.
+
+Request handlers, the image pipeline and the Gemini client record stage
+timings, upstream latency, cache results and payload sizes here. Each worker
+aggregates its observations in memory and a background thread adds them to
+SQLite (see storage.py) every METRICS_FLUSH_INTERVAL seconds, so /metrics,
+whichever worker serves it, reports the sum over all workers: histogram
+buckets and counters are additive. A worker flushes its own pending
+observations before rendering, and Gunicorn's worker_exit hook flushes a
+recycled worker's last ones.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from storage import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, le)
+);
+"""
+
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(9))  # 256B .. 16MB
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Route the current request belongs to; 'background' for pool threads and jobs
+_endpoint = ContextVar('metrics_endpoint', default='background')
+
+
+def set_endpoint(name):
+    """Label the observations made by the current request with `name`."""
+    _endpoint.set(name or 'unknown')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    pairs = list(pairs)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    """Metric definitions plus this worker's unflushed observations."""
+
+    def __init__(self, db_name='metrics.db', flush_interval=FLUSH_INTERVAL):
+        self.db_name = db_name
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def histogram(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        metric = self.metrics[name] = Histogram(self, name, help_text, labelnames, buckets)
+        return metric
+
+    def counter(self, name, help_text, labelnames):
+        metric = self.metrics[name] = Counter(self, name, help_text, labelnames)
+        return metric
+
+    def _add(self, key, amount):
+        if self._pid != os.getpid():
+            self._start_flusher()
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Observations inherited from a parent process belong to the parent
+            self._pending = {}
+            self._pid = os.getpid()
+        threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Add this worker's pending observations to the shared store."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            conn = connect(self.db_name, SCHEMA)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO metric_samples (name, labels, le, value) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(name, labels, le) DO UPDATE SET value = value + excluded.value',
+                    [(*key, amount) for key, amount in pending.items()]
+                )
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Metrics flush failed, keeping observations: {e}")
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + amount
+
+    def render(self):
+        """All metrics, summed over every worker, in Prometheus text format."""
+        self.flush()
+        samples = {}
+        for name, labels, le, value in connect(self.db_name, SCHEMA).execute(
+            'SELECT name, labels, le, value FROM metric_samples'
+        ):
+            samples.setdefault(name, {}).setdefault(labels, {})[le] = value
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.help_text}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labels, values in sorted(samples.get(name, {}).items()):
+                lines.extend(metric.render(labels, values))
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, labelnames):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, labels):
+        return _format_labels(zip(self.labelnames, (labels[name] for name in self.labelnames)))
+
+    def inc(self, amount=1, **labels):
+        self.registry._add((self.name, self._labels(labels), ''), amount)
+
+    def render(self, labels, values):
+        return [f'{self.name}{labels} {_format_value(values.get("", 0))}']
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        label_text = self._labels(labels)
+        bound = next((b for b in self.buckets if value <= b), None)
+        add = self.registry._add
+        add((self.name, label_text, _format_value(bound) if bound is not None else '+Inf'), 1)
+        add((self.name, label_text, 'sum'), value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self, labels, values):
+        # Buckets are stored per interval; Prometheus wants them cumulative
+        prefix = labels[:-1] + ',' if labels else '{'
+        lines = []
+        total = 0
+        for le in [_format_value(b) for b in self.buckets] + ['+Inf']:
+            total += values.get(le, 0)
+            lines.append(f'{self.name}_bucket{prefix}le="{le}"}} {_format_value(total)}')
+        lines.append(f'{self.name}_sum{labels} {_format_value(values.get("sum", 0))}')
+        lines.append(f'{self.name}_count{labels} {_format_value(total)}')
+        return lines
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    'truthlens_stage_seconds', 'Time spent in each stage of request handling.', ('endpoint', 'stage')
+)
+request_seconds = registry.histogram(
+    'truthlens_request_seconds', 'Request duration by endpoint and status code.', ('endpoint', 'status')
+)
+upstream_seconds = registry.histogram(
+    'truthlens_upstream_seconds', 'Gemini call latency per attempt.', ('model', 'outcome')
+)
+request_bytes = registry.histogram(
+    'truthlens_request_bytes', 'Request body size.', ('endpoint',), SIZE_BUCKETS
+)
+payload_bytes = registry.histogram(
+    'truthlens_payload_bytes', 'Size of the content sent to and received from the model.',
+    ('kind',), SIZE_BUCKETS
+)
+cache_results = registry.counter(
+    'truthlens_cache_results_total', 'Responses by cache result (X-Cache).', ('endpoint', 'result')
+)
+upstream_tokens = registry.counter(
+    'truthlens_upstream_tokens_total', 'Tokens reported used by Gemini responses.', ('model',)
+)
+routing_decisions = registry.counter(
+    'truthlens_routing_decisions_total', 'Model routing decisions per route and model.',
+    ('route', 'model', 'decision')
+)
+routing_seconds = registry.histogram(
+    'truthlens_routing_seconds', 'Model time per routed analysis, answered directly or escalated.',
+    ('route', 'path')
+)
+
+
+@contextmanager
+def span(stage):
+    """Time the block as `stage` of the current endpoint."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, endpoint=_endpoint.get(), stage=stage)
+
+
+def observe_stage(stage, seconds):
+    """Record an already measured duration as `stage` of the current endpoint."""
+    stage_seconds.observe(seconds, endpoint=_endpoint.get(), stage=stage)
@@ -0,0 +1,190 @@
+"""
+Adaptive model routing: a fast, cheap model first, a stronger one only when needed.
+
+Each analysis belongs to a route named '<kind>:<tier>' (e.g. 'text:deep',
+'image:quick'). A route lists the models to try in order and a confidence
+threshold. The first model's verdict is kept unless its confidence, as the
+verdict parser computes it, is below the threshold or its output could not
+be parsed (no summary line, or a structured response that does not fit the
+schema); then the next model is asked. An upstream error is returned as is,
+since the call has already used up its deadline.
+
+One deadline (GEMINI_DEADLINE unless the caller gives one) covers the whole
+route: each model call only gets the time the earlier ones left, and a model
+is skipped, keeping the previous answer, when less than
+ROUTING_MIN_ESCALATION_TIME seconds remain.
+
+Routes are configured with MODEL_ROUTES, a ';'-separated list of
+'<route>=<model>[><model>...][@<threshold>]' entries. 'lite' and 'strong' stand
+for MODEL_LITE and MODEL_STRONG; any other name is used as a Gemini model
+name. A route that is not listed (or every route, with ROUTING_ENABLED=false)
+uses MODEL_STRONG alone.
+
+Decisions and end-to-end model time per route are exported to /metrics and
+summarized in /stats.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from gemini_client import DEFAULT_MODEL, LatencyWindow, call_deadline, client as gemini
+from metrics import routing_decisions, routing_seconds
+
+ROUTING_ENABLED = os.getenv('ROUTING_ENABLED', 'true').lower() != 'false'
+MODEL_LITE = os.getenv('MODEL_LITE', 'gemini-2.0-flash-lite')
+MODEL_STRONG = os.getenv('MODEL_STRONG', DEFAULT_MODEL)
+# parse_analysis_to_json gives a decisive summary line a confidence of 65 or
+# more, and one it can only lean on (the cautious branch) less than 60
+ROUTING_THRESHOLD = int(os.getenv('ROUTING_THRESHOLD', 60))
+# An escalation with less time left than this would only time out
+ROUTING_MIN_ESCALATION_TIME = float(os.getenv('ROUTING_MIN_ESCALATION_TIME', 2))
+# Quick analyses escalate only output that could not be parsed
+MODEL_ROUTES = os.getenv(
+    'MODEL_ROUTES',
+    'text:deep=lite>strong; image:deep=lite>strong; text:quick=lite>strong@0; image:quick=lite>strong@0'
+)
+
+# Reasons to ask the next model of a route
+ESCALATE = ('low_confidence', 'unparsed')
+
+Route = namedtuple('Route', 'name models threshold')
+
+
+def parse_routes(spec, lite=MODEL_LITE, strong=MODEL_STRONG, threshold=ROUTING_THRESHOLD):
+    """Parse a MODEL_ROUTES value.
+
+    Returns:
+        dict: Route by route name.
+
+    Raises:
+        ValueError: For an entry that is not '<route>=<models>[@<threshold>]'.
+    """
+    aliases = {'lite': lite, 'strong': strong}
+    routes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(';'))):
+        name, sep, models = entry.partition('=')
+        models, at, limit = models.partition('@')
+        names = [aliases.get(model.strip(), model.strip()) for model in models.split('>')]
+        if not sep or not name.strip() or not all(names):
+            raise ValueError(f"Invalid model route {entry!r}")
+        try:
+            route_threshold = int(limit) if at else threshold
+        except ValueError:
+            raise ValueError(f"Invalid threshold in model route {entry!r}")
+        routes[name.strip()] = Route(name.strip(), tuple(names), route_threshold)
+    return routes
+
+
+def route_name(kind, tier='deep'):
+    """Route of a `kind` ('text' or 'image') analysis in `tier`."""
+    return f'{kind}:{tier}'
+
+
+class ModelRouter:
+    """Runs analyses along their route and records each routing decision."""
+
+    def __init__(self, routes=None, enabled=ROUTING_ENABLED, default_model=MODEL_STRONG,
+                 min_escalation_time=ROUTING_MIN_ESCALATION_TIME):
+        self.routes = parse_routes(MODEL_ROUTES) if routes is None else routes
+        self.enabled = enabled
+        self.default_model = default_model
+        self.min_escalation_time = min_escalation_time
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def route(self, name):
+        """The Route called `name` (the default model alone if not configured)."""
+        route = self.routes.get(name) if self.enabled else None
+        return route or Route(name, (self.default_model,), 0)
+
+    def final_model(self, name):
+        """The strongest model of a route, for calls that cannot be escalated
+        (streams whose first chunks are already sent)."""
+        return self.route(name).models[-1]
+
+    def run(self, name, call, assess, deadline=None):
+        """Analyze along route `name`.
+
+        Args:
+            name (str): Route name, see route_name().
+            call: call(model_name) returns the outcome of one model's analysis;
+                a ValueError means its output could not be parsed.
+            assess: assess(outcome, threshold) returns None to keep the
+                outcome, 'low_confidence' or 'unparsed' to escalate it, or
+                'error' for a failed call (kept, not escalated).
+            deadline (float): Seconds for the whole route, escalations
+                included (GEMINI_DEADLINE by default).
+
+        Returns:
+            The outcome of the model whose answer was kept.
+        """
+        route = self.route(name)
+        start = time.monotonic()
+        end = start + (gemini.deadline if deadline is None else deadline)
+        outcome = unparsed = None
+        for index, model in enumerate(route.models):
+            last = index == len(route.models) - 1
+            if index and end - time.monotonic() < self.min_escalation_time:
+                # No time to ask another model: keep the answer already given
+                self._record(route, model, 'skipped', index - 1, start)
+                if unparsed is not None:
+                    raise unparsed
+                return outcome
+            try:
+                with call_deadline(end):
+                    outcome = call(model)
+                unparsed = None
+            except ValueError as e:
+                if last:
+                    self._record(route, model, 'unparsed', index, start)
+                    raise
+                self._record(route, model, 'unparsed', index)
+                outcome, unparsed = None, e
+                continue
+            except Exception:
+                self._record(route, model, 'error', index, start)
+                raise
+            decision = assess(outcome, route.threshold)
+            if decision in ESCALATE and not last:
+                self._record(route, model, decision, index)
+                continue
+            self._record(route, model, decision or ('accepted' if index == 0 else 'final'), index, start)
+            return outcome
+
+    def _record(self, route, model, decision, index, start=None):
+        """Count one decision; `start` is given when the route's answer is settled."""
+        routing_decisions.inc(route=route.name, model=model, decision=decision)
+        with self._lock:
+            stats = self._stats.get(route.name)
+            if stats is None:
+                stats = self._stats[route.name] = {
+                    'decisions': {}, 'latency': {'direct': LatencyWindow(), 'escalated': LatencyWindow()}
+                }
+            key = f'{model}:{decision}'
+            stats['decisions'][key] = stats['decisions'].get(key, 0) + 1
+        if start is not None:
+            path = 'direct' if index == 0 else 'escalated'
+            elapsed = time.monotonic() - start
+            routing_seconds.observe(elapsed, route=route.name, path=path)
+            stats['latency'][path].add(elapsed)
+
+    def stats(self):
+        """Routes, decision counts and model time per route for this worker."""
+        with self._lock:
+            recorded = {name: (dict(stats['decisions']), stats['latency'])
+                        for name, stats in self._stats.items()}
+        routes = {}
+        for name in sorted(set(self.routes) | set(recorded)):
+            route = self.route(name)
+            decisions, latency = recorded.get(name, ({}, None))
+            routes[name] = {
+                'models': list(route.models),
+                'threshold': route.threshold,
+                'decisions': decisions,
+                'latency': {path: window.summary() for path, window in latency.items()} if latency else {}
+            }
+        return {'enabled': self.enabled, 'routes': routes}
+
+
+router = ModelRouter()
@@ -0,0 +1,258 @@
+"""
+Local, CPU-only pre-screen in front of the Gemini text analysis.
+
+Two stages answer obvious submissions without a model call:
+
+1. A pattern table of known scam templates and chain-letter phrasing. A match
+   is answered straight away as misinformation.
+2. A TF-IDF logistic-regression model over hashed word unigrams and bigrams.
+   It is trained online from Gemini's own confident verdicts, and answers only
+   once it has seen PRESCREEN_MIN_EXAMPLES of them and its probability is
+   beyond PRESCREEN_THRESHOLD either way.
+
+Everything else goes to Gemini as before. The model's weights and document
+frequencies live in SQLite (see storage.py), so every worker trains and
+reads the same model; the per-feature updates are additive and applied in one
+transaction. How many submissions each stage answered, and the resulting
+offload ratio, are counted in the shared counters table.
+"""
+import logging
+import math
+import os
+import re
+import sqlite3
+import zlib
+
+from storage import connect, incr_counter, read_counters
+from verdict_cache import normalize_text
+from verdict_parser import source_hints, verdict_from_percentages
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prescreen_features (
+    feature INTEGER PRIMARY KEY,
+    weight REAL NOT NULL DEFAULT 0,
+    df INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+FEATURE_BITS = 20
+_FEATURE_MASK = (1 << FEATURE_BITS) - 1
+# Feature id of the intercept; its df counts the training examples
+BIAS = -1
+
+_WORD = re.compile(r'\w+')
+
+# (name, pattern over normalized text, what it is)
+PATTERNS = [
+    ('chain_letter',
+     re.compile(r'\b(?:forward|share|send|repost|copy and paste) (?:this|it) (?:message )?to (?:at least )?'
+                r'(?:\d+|ten|five|seven|twenty) (?:people|friends|contacts|groups)'),
+     'chain-letter template that asks to be forwarded to a set number of people'),
+    ('share_before_deleted',
+     re.compile(r'\bshare (?:this |it )?(?:now |fast )?before (?:it|they|this) (?:gets |is |are )?'
+                r'(?:deleted|removed|taken down|banned|censored)'),
+     'viral template that urges sharing "before it gets deleted"'),
+    ('privacy_notice_hoax',
+     re.compile(r'\bi do not give (?:facebook|meta|instagram|whatsapp)\b.{0,80}\bpermission to use my '
+                r'(?:pictures|photos|information|posts)'),
+     'social-media privacy notice hoax; posting it has no legal effect'),
+    ('prize_scam',
+     re.compile(r'\b(?:congratulations|congrats)\W+you(?:\'ve| have) (?:been selected|won)\b.{0,120}'
+                r'\b(?:claim|click|verify|processing fee|gift card)'),
+     'prize or lottery scam template'),
+    ('crypto_giveaway',
+     re.compile(r'\b(?:send|transfer) (?:me |us )?(?:any amount of |\d+(?:\.\d+)? )?(?:btc|eth|bitcoin|ethereum|usdt)\b'
+                r'.{0,120}\b(?:double|2x|twice|back)\b'),
+     'cryptocurrency "send and get double back" giveaway scam'),
+    ('advance_fee',
+     re.compile(r'\b(?:inheritance|unclaimed funds|next of kin|beneficiary)\b.{0,200}'
+                r'\b(?:bank details|processing fee|transfer fee|western union)\b'),
+     'advance-fee fraud template'),
+    ('suppressed_cure',
+     re.compile(r'\b(?:doctors|big pharma|the government) (?:don\'t|do not|won\'t|will not|hate|doesn\'t) '
+                r'(?:want you to know|want this out)'),
+     '"what doctors don\'t want you to know" miracle-cure template'),
+]
+
+
+def features(text):
+    """Return {hashed feature: count} for the word unigrams and bigrams of a text."""
+    words = _WORD.findall(normalize_text(text))
+    counts = {}
+    for gram in words + [f'{a} {b}' for a, b in zip(words, words[1:])]:
+        feature = zlib.crc32(gram.encode('utf-8')) & _FEATURE_MASK
+        counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+
+def match_pattern(text):
+    """Return (name, description) of the first known template in `text`, or None."""
+    normalized = normalize_text(text)
+    for name, pattern, description in PATTERNS:
+        if pattern.search(normalized):
+            return name, description
+    return None
+
+
+def _summary(genuine_pct, false_pct, misleading_pct):
+    return (f"This text is **{genuine_pct}% likely to be accurate**, "
+            f"**{false_pct}% likely to contain misinformation**, "
+            f"and **{misleading_pct}% likely to be misleading**.")
+
+
+def _result(percentages, assessment, advice, method):
+    explanation = '\n\n'.join([
+        _summary(*percentages),
+        f"1. **Credibility Assessment**: {assessment}",
+        f"2. **Actionable Advice**: {advice}"
+    ])
+    is_true, confidence = verdict_from_percentages(*percentages)
+    return {
+        "isTrue": is_true,
+        "confidence": confidence,
+        "explanation": explanation,
+        "sources": source_hints(explanation.lower()),
+        "prescreened": method
+    }
+
+
+class Prescreen:
+    """Pattern table plus an online TF-IDF linear model, shared by all workers."""
+
+    def __init__(self, db_name='prescreen.db', threshold=None, min_examples=None,
+                 train_min_confidence=None, learning_rate=None):
+        self.db_name = db_name
+        self.enabled = os.getenv('PRESCREEN_ENABLED', 'true').lower() != 'false'
+        self.threshold = threshold if threshold is not None else \
+            float(os.getenv('PRESCREEN_THRESHOLD', 0.97))
+        self.min_examples = min_examples if min_examples is not None else \
+            int(os.getenv('PRESCREEN_MIN_EXAMPLES', 500))
+        self.train_min_confidence = train_min_confidence if train_min_confidence is not None else \
+            int(os.getenv('PRESCREEN_TRAIN_MIN_CONFIDENCE', 80))
+        self.learning_rate = learning_rate if learning_rate is not None else \
+            float(os.getenv('PRESCREEN_LEARNING_RATE', 0.5))
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def _rows(self, conn, feature_ids):
+        rows = {}
+        ids = list(feature_ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows.update((feature, (weight, df)) for feature, weight, df in conn.execute(
+                f'SELECT feature, weight, df FROM prescreen_features '
+                f'WHERE feature IN ({",".join("?" * len(chunk))})', chunk
+            ))
+        return rows
+
+    def _score(self, conn, counts):
+        """Return (probability the text is accurate, examples seen, tf-idf vector)."""
+        rows = self._rows(conn, [BIAS, *counts])
+        bias, examples = rows.get(BIAS, (0.0, 0))
+        vector = {}
+        for feature, count in counts.items():
+            df = rows.get(feature, (0.0, 0))[1]
+            vector[feature] = (1 + math.log(count)) * (math.log((1 + examples) / (1 + df)) + 1)
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        vector = {feature: value / norm for feature, value in vector.items()}
+        z = bias + sum(rows.get(feature, (0.0, 0))[0] * value for feature, value in vector.items())
+        z = max(-30.0, min(30.0, z))
+        return 1 / (1 + math.exp(-z)), examples, vector
+
+    def _count(self, conn, name):
+        incr_counter(conn, f'prescreen.{name}')
+
+    def check(self, text):
+        """Return a verdict for an obvious case, or None to send `text` to Gemini."""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._conn()
+            match = match_pattern(text)
+            if match is not None:
+                self._count(conn, 'pattern')
+                name, description = match
+                return _result(
+                    (5, 85, 10),
+                    f"This text matches a known {description}.",
+                    "Do not forward it or act on it. Search for its wording on a "
+                    "fact-checking site such as Snopes or FactCheck.org.",
+                    f'pattern:{name}'
+                )
+
+            counts = features(text)
+            if counts:
+                probability, examples, _ = self._score(conn, counts)
+                if examples >= self.min_examples and \
+                        max(probability, 1 - probability) >= self.threshold:
+                    self._count(conn, 'model')
+                    genuine_pct = round(probability * 100)
+                    label = 'accurate' if probability >= 0.5 else 'misinformation'
+                    return _result(
+                        (genuine_pct, 100 - genuine_pct, 0),
+                        f"Screened locally: this text closely resembles texts previously "
+                        f"analyzed as {label}.",
+                        "Check the claim against its original source or a fact-checking site "
+                        "before sharing it.",
+                        'model'
+                    )
+
+            self._count(conn, 'passed')
+        except sqlite3.Error as e:
+            logger.warning(f"Pre-screen failed, sending to Gemini: {e}")
+        return None
+
+    def learn(self, text, verdict):
+        """Train the model on a verdict Gemini returned for `text`."""
+        if not self.enabled or verdict.get('confidence', 0) < self.train_min_confidence:
+            return
+        counts = features(text)
+        if not counts:
+            return
+        label = 1.0 if verdict.get('isTrue') else 0.0
+        try:
+            conn = self._conn()
+            probability, _, vector = self._score(conn, counts)
+            step = -self.learning_rate * (probability - label)
+            updates = [(feature, step * value) for feature, value in vector.items()]
+            updates.append((BIAS, step))
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO prescreen_features (feature, weight, df) VALUES (?, ?, 1) '
+                    'ON CONFLICT(feature) DO UPDATE SET weight = weight + excluded.weight, df = df + 1',
+                    updates
+                )
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Pre-screen training failed: {e}")
+
+    def stats(self):
+        """Answers per stage, the offload ratio and the model's training size."""
+        try:
+            conn = self._conn()
+            counters = read_counters(conn, 'prescreen.')
+            row = conn.execute('SELECT df FROM prescreen_features WHERE feature = ?', (BIAS,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Pre-screen stats failed: {e}")
+            return {}
+        pattern = counters.get('pattern', 0)
+        model = counters.get('model', 0)
+        passed = counters.get('passed', 0)
+        total = pattern + model + passed
+        return {
+            'enabled': self.enabled,
+            'patternAnswers': pattern,
+            'modelAnswers': model,
+            'passedToGemini': passed,
+            'offloadRatio': round((pattern + model) / total, 4) if total else 0.0,
+            'trainingExamples': row[0] if row else 0,
+            'minExamples': self.min_examples,
+            'threshold': self.threshold
+        }
@@ -1,25 +1,26 @@
-import google.generativeai as genai
 import textwrap
-from PIL import Image
-import requests
+import time
 from io import BytesIO
-import os
 
-# Configure the Gemini API with your key from the environment variable
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+from analysis_tiers import quick_generation_config
+from concurrency import ServerBusy
+from image_preprocess import prepare_image
+from metrics import observe_stage, payload_bytes, span
+from structured_output import generation_config, response_schema
+from url_fetcher import fetcher
 
-def analyze_text_for_misinformation(text: str):
-    """Analyzes a given text for misinformation and provides a detailed breakdown.
-    
-    Args:
-        text (str): The text content to analyze.
-        
-    Returns:
-        str: A detailed analysis of the text's credibility and potential misinformation tactics.
-    """
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    
-    prompt = textwrap.dedent(f"""
+# Model calls go through the shared client, which configures the Gemini API
+# with GOOGLE_API_KEY from the environment on first use
+from gemini_client import DEFAULT_MODEL, client as gemini
+
+def is_analysis_error(analysis: str):
+    """Returns True if `analysis` is one of the error messages produced below
+    rather than a real model response (and so must never be cached)."""
+    return analysis.startswith("An error occurred during")
+
+# Prompt templates are dedented once at import; with a preloaded app the
+# workers share them with the master
+TEXT_PROMPT = textwrap.dedent("""
     You are an AI that helps users identify manipulated or misleading texts. Your task is to analyze the provided text and provide a response that is between 100 and 150 words.
 
     Begin your response with a single-line summary that includes a percentage-based probability for the text being genuine, manipulated, or used in a misleading context. For example: "This text is **90% likely to be accurate**, **5% likely to contain misinformation**, and **5% likely to be misleading**."
@@ -35,46 +36,161 @@ def analyze_text_for_misinformation(text: str):
 
     Analysis:
     """)
+
+def build_text_prompt(text: str):
+    """Builds the text analysis prompt for Gemini.
+    
+    Args:
+        text (str): The text content to analyze.
+        
+    Returns:
+        str: The full prompt, asking for a percentage summary line first.
+    """
+    return TEXT_PROMPT.format(text=text)
+
+STRUCTURED_TEXT_PROMPT = textwrap.dedent("""
+    You are an AI that helps users identify manipulated or misleading texts. Analyze the provided text and fill in every field of the response:
+
+    - genuinePercent, falsePercent, misleadingPercent: the probabilities, adding up to 100, that the text is accurate, contains misinformation, or is used in a misleading context.
+    - credibilityAssessment: a general statement on the credibility of the content.
+    - identifiedTactics: specific misinformation tactics found in the text (e.g., emotionally charged language, lack of sources, cherry-picking data, false context, etc.).
+    - educationalExplanation: for each identified tactic, *why* it's a red flag for misinformation.
+    - actionableAdvice: clear, simple steps the user can take to verify the information on their own.
+
+    Keep the whole analysis between 100 and 150 words.
+
+    Text to analyze: {text}
+    """)
+
+def build_structured_text_prompt(text: str):
+    """Builds the text analysis prompt for schema-constrained output.
+    
+    Args:
+        text (str): The text content to analyze.
+        
+    Returns:
+        str: The full prompt, describing each field of the 'text' response schema.
+    """
+    return STRUCTURED_TEXT_PROMPT.format(text=text)
+
+QUICK_TEXT_PROMPT = textwrap.dedent("""
+    You are an AI that helps users identify manipulated or misleading texts. Reply with a single line and nothing else, in exactly this form, with percentages that add up to 100:
+
+    This text is **X% likely to be accurate**, **Y% likely to contain misinformation**, and **Z% likely to be misleading**.
+
+    Text to analyze: {text}
+    """)
+
+def build_quick_text_prompt(text: str):
+    """Builds the quick-tier prompt, which asks only for the summary line.
     
+    Args:
+        text (str): The text content to analyze.
+        
+    Returns:
+        str: The full prompt.
+    """
+    return QUICK_TEXT_PROMPT.format(text=text)
+
+def analyze_text_for_misinformation(text: str, structured: bool = False, tier: str = 'deep',
+                                    model_name: str = DEFAULT_MODEL):
+    """Analyzes a given text for misinformation and provides a detailed breakdown.
+    
+    Args:
+        text (str): The text content to analyze.
+        structured (bool): Ask for schema-constrained JSON instead of prose.
+        tier (str): 'deep' for the full analysis, 'quick' for the summary line
+            only, under a small output cap (the caller sets its deadline).
+        model_name (str): Gemini model to ask (chosen by model_routing).
+        
+    Returns:
+        str: A detailed analysis of the text's credibility and potential misinformation
+        tactics (JSON matching response_schema('text') if structured).
+    
+    Raises:
+        ServerBusy: If the shared upstream quota stays exhausted; the caller
+            should ask the client to retry rather than report an analysis.
+    """
     try:
-        response = model.generate_content(prompt)
+        if tier == 'quick':
+            prompt = build_quick_text_prompt(text)
+            config = quick_generation_config()
+        elif structured:
+            prompt = build_structured_text_prompt(text)
+            config = generation_config(response_schema('text'))
+        else:
+            prompt = build_text_prompt(text)
+            config = None
+        payload_bytes.observe(len(prompt.encode('utf-8')), kind='text')
+        response = gemini.generate(prompt, model_name, generation_config=config)
+        payload_bytes.observe(len(response.text.encode('utf-8')), kind='response')
         return response.text
+    except ServerBusy:
+        raise
     except Exception as e:
         return f"An error occurred during text analysis: {e}"
 
-def analyze_image_for_misinformation(image_path: str):
+def stream_text_analysis(text: str, model_name: str = DEFAULT_MODEL):
+    """Streams the analysis of a given text from Gemini as it is generated.
+    
+    Unlike analyze_text_for_misinformation, errors are raised to the caller,
+    since part of the analysis may already have been sent.
+    
+    Args:
+        text (str): The text content to analyze.
+        model_name (str): Gemini model to ask.
+        
+    Yields:
+        str: Successive pieces of the analysis, starting with the summary line.
+    """
+    start = time.perf_counter()
+    first = True
+    for chunk in gemini.stream(build_text_prompt(text), model_name):
+        if first:
+            observe_stage('first_chunk', time.perf_counter() - start)
+            first = False
+        try:
+            piece = chunk.text
+        except ValueError:  # chunk without text parts, e.g. only a finish reason
+            continue
+        if piece:
+            yield piece
+
+URL_IMAGE_PROMPT = textwrap.dedent("""
+    You are an AI that helps users identify manipulated or misleading images. Your task is to analyze the provided image and provide a response that is between 200 and 250 words.
+
+    Begin your response with a single-line summary that includes a percentage-based probability for the image being genuine, manipulated, or used in a misleading context. For example: "This image is **90% likely to be genuine**, **5% likely to be manipulated**, and **5% likely to be used in a misleading context**."
+
+    After the summary, provide a detailed analysis that includes the following sections:
+
+    1. **AI-Generated Image**: Tell if the image is AI generated or how much are the chances of the image being AI generated.
+    2. **Credibility Assessment**: Is this image likely to be genuine, manipulated, or used in a misleading context?
+    3. **Identified Issues**: Point out any visual inconsistencies or signs of manipulation (e.g., blurring, unusual shadows, deepfake artifacts).
+    4. **Contextual Analysis**: If the image appears genuine but is a stock photo or a historical image, state this.
+    5. **Verification Steps**: Suggest ways for the user to verify the image's authenticity (e.g., a reverse image search).
+
+    Analysis:
+    """)
+
+def analyze_image_for_misinformation(image_path: str, model_name: str = DEFAULT_MODEL):
     """Analyzes an image from a URL for signs of manipulation or false context.
     
     Args:
         image_path (str): A URL to the image to analyze.
+        model_name (str): Gemini model to ask.
         
     Returns:
         str: A detailed analysis of the image's credibility.
     """
     try:
-        # Download the image from the URL
-        response = requests.get(image_path)
-        img = Image.open(BytesIO(response.content))
-        
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        prompt = textwrap.dedent("""
-        You are an AI that helps users identify manipulated or misleading images. Your task is to analyze the provided image and provide a response that is between 200 and 250 words.
-
-        Begin your response with a single-line summary that includes a percentage-based probability for the image being genuine, manipulated, or used in a misleading context. For example: "This image is **90% likely to be genuine**, **5% likely to be manipulated**, and **5% likely to be used in a misleading context**."
-
-        After the summary, provide a detailed analysis that includes the following sections:
-
-        1. **AI-Generated Image**: Tell if the image is AI generated or how much are the chances of the image being AI generated.
-        2. **Credibility Assessment**: Is this image likely to be genuine, manipulated, or used in a misleading context?
-        3. **Identified Issues**: Point out any visual inconsistencies or signs of manipulation (e.g., blurring, unusual shadows, deepfake artifacts).
-        4. **Contextual Analysis**: If the image appears genuine but is a stock photo or a historical image, state this.
-        5. **Verification Steps**: Suggest ways for the user to verify the image's authenticity (e.g., a reverse image search).
-
-        Analysis:
-        """)
+        # Download the image from the URL (pooled, size-capped, cached on disk)
+        with span('fetch'):
+            data = fetcher.fetch(image_path)
+        img = prepare_image(BytesIO(data)).blob
+        payload_bytes.observe(len(img['data']), kind='image')
         
-        response = model.generate_content([prompt, img])
+        with span('gemini'):
+            response = gemini.generate([URL_IMAGE_PROMPT, img], model_name)
         return response.text
     except Exception as e:
         return f"An error occurred during image analysis: {e}"
\ No newline at end of file
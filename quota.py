@@ -0,0 +1,288 @@
+"""
+Upstream quota governor shared by all Gunicorn workers.
+
+Gemini enforces project-wide requests-per-minute and tokens-per-minute quotas.
+Each worker used to find out about them only by getting 429s, all at the
+same time. Every outbound model call now first takes one request and its
+estimated tokens from two token buckets kept in SQLite (see storage.py), so
+all workers draw on the same budget:
+
+* GEMINI_RPM / GEMINI_TPM set the bucket sizes (refilled continuously; 0
+  turns a bucket off).
+* Priority classes keep part of each bucket back from lower classes: image
+  calls may not take the last QUOTA_IMAGE_RESERVE of it, batch calls not the
+  last QUOTA_BATCH_RESERVE (both apply to a batch image call), so interactive
+  text keeps flowing when the budget runs low.
+* A call that cannot be admitted waits (up to QUOTA_QUEUE_TIMEOUT, and never
+  past the call's deadline) for the buckets to refill, then fails with
+  QuotaExhausted, a ServerBusy that the routes turn into a 503.
+* The token estimate is settled against the response's usage metadata, and an
+  upstream 429 empties the request bucket so every worker backs off.
+
+Admissions, rejections and queue waits per class are counted in the shared
+counters table; wait percentiles are per worker.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from concurrency import ServerBusy
+from storage import connect, incr_counter, read_counters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_buckets (
+    name TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Tokens an image part is charged at (Gemini bills an image as 258 tokens per tile)
+IMAGE_TOKENS = 258
+
+_batch = ContextVar('quota_batch', default=False)
+
+
+class QuotaExhausted(ServerBusy):
+    """Raised when the shared upstream quota does not free up in time."""
+
+
+@contextmanager
+def batch_priority():
+    """Run the model calls made inside the block at batch priority."""
+    token = _batch.set(True)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+
+
+def run_as_batch(fn, *args, **kwargs):
+    """Call fn(*args, **kwargs) at batch priority (for executor.submit)."""
+    with batch_priority():
+        return fn(*args, **kwargs)
+
+
+def call_kind(contents):
+    """'image' if the prompt has any non-text part, else 'text'."""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    return 'text' if all(isinstance(part, str) for part in parts) else 'image'
+
+
+def estimate_tokens(contents, generation_config=None, output_tokens=None):
+    """Rough input plus output token count of one call, for admission."""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    tokens = sum(len(part) // 4 + 1 if isinstance(part, str) else IMAGE_TOKENS for part in parts)
+    config = generation_config or {}
+    return tokens + int(config.get('max_output_tokens') or output_tokens or 0)
+
+
+class QuotaGovernor:
+    """Token buckets for upstream requests and tokens, shared across workers."""
+
+    def __init__(self, db_name='quota.db', rpm=None, tpm=None, queue_timeout=None):
+        self.db_name = db_name
+        self.limits = {
+            'requests': rpm if rpm is not None else int(os.getenv('GEMINI_RPM', 0)),
+            'tokens': tpm if tpm is not None else int(os.getenv('GEMINI_TPM', 0))
+        }
+        self.queue_timeout = queue_timeout if queue_timeout is not None else \
+            float(os.getenv('QUOTA_QUEUE_TIMEOUT', 5))
+        self.reserves = {
+            'image': float(os.getenv('QUOTA_IMAGE_RESERVE', 0.1)),
+            'batch': float(os.getenv('QUOTA_BATCH_RESERVE', 0.25))
+        }
+        self.output_tokens = int(os.getenv('QUOTA_OUTPUT_TOKEN_ESTIMATE', 800))
+        self.poll_interval = 0.05
+        self._waits = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return any(self.limits.values())
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def priority_class(self, kind):
+        """Class of a call of `kind` made in the current context."""
+        return f"{'batch' if _batch.get() else 'interactive'}_{kind}"
+
+    def _reserve(self, priority):
+        mode, kind = priority.split('_', 1)
+        return (self.reserves['image'] if kind == 'image' else 0.0) + \
+            (self.reserves['batch'] if mode == 'batch' else 0.0)
+
+    def _levels(self, conn, now):
+        """Refilled bucket levels, read inside the caller's transaction."""
+        rows = dict(
+            (name, (level, updated_at))
+            for name, level, updated_at in conn.execute('SELECT name, level, updated_at FROM quota_buckets')
+        )
+        levels = {}
+        for name, limit in self.limits.items():
+            if not limit:
+                continue
+            level, updated_at = rows.get(name, (limit, now))
+            levels[name] = min(limit, level + max(0.0, now - updated_at) * limit / 60)
+        return levels
+
+    def _save(self, conn, levels, now):
+        conn.executemany(
+            'INSERT INTO quota_buckets (name, level, updated_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated_at = excluded.updated_at',
+            [(name, level, now) for name, level in levels.items()]
+        )
+
+    def _take(self, costs, reserve):
+        """Take `costs` from the buckets if they stay above `reserve`.
+
+        Returns:
+            float: 0 if taken, else the seconds until the buckets can cover it.
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            levels = self._levels(conn, now)
+            wait = 0.0
+            for name, level in levels.items():
+                limit = self.limits[name]
+                # A call larger than a bucket can ever hold waits for a full bucket
+                need = min(costs[name], limit * (1 - reserve)) + limit * reserve
+                if level < need:
+                    wait = max(wait, (need - level) * 60 / limit)
+            if not wait:
+                for name in levels:
+                    levels[name] -= min(costs[name], self.limits[name])
+            self._save(conn, levels, now)
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, tokens, kind='text', timeout=None):
+        """Admit one upstream call, waiting up to `timeout` for quota.
+
+        Args:
+            tokens (int): Estimated tokens of the call.
+            kind (str): 'text' or 'image'.
+            timeout (float): Queue timeout instead of QUOTA_QUEUE_TIMEOUT.
+
+        Returns:
+            float: Seconds spent waiting.
+
+        Raises:
+            QuotaExhausted: If the quota does not free up in time.
+        """
+        if not self.enabled:
+            return 0.0
+        priority = self.priority_class(kind)
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        costs = {'requests': 1, 'tokens': tokens}
+        start = time.monotonic()
+        while True:
+            try:
+                wait = self._take(costs, self._reserve(priority))
+            except sqlite3.Error as e:
+                # The governor must not take the API down with it
+                logger.warning(f"Quota governor unavailable, admitting call: {e}")
+                return 0.0
+            waited = time.monotonic() - start
+            if not wait:
+                self._record(priority, waited, True)
+                return waited
+            if waited + wait > timeout:
+                self._record(priority, waited, False)
+                raise QuotaExhausted(f"Upstream quota exhausted for {priority} calls")
+            time.sleep(max(wait, self.poll_interval))
+
+    def try_acquire(self, tokens, kind='text'):
+        """Admit one upstream call only if quota is free right now."""
+        try:
+            self.acquire(tokens, kind, timeout=0)
+            return True
+        except QuotaExhausted:
+            return False
+
+    def settle(self, estimated, actual):
+        """Return (or charge) the difference between estimated and used tokens."""
+        if not self.limits['tokens'] or actual is None or actual == estimated:
+            return
+        self._adjust('tokens', estimated - actual)
+
+    def throttled(self):
+        """Upstream returned 429: empty the request bucket for every worker."""
+        if self.limits['requests']:
+            self._adjust('requests', None)
+
+    def _adjust(self, name, amount):
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                levels = self._levels(conn, now)
+                level = levels[name] + amount if amount is not None else min(levels[name], 0.0)
+                self._save(conn, {name: min(self.limits[name], level)}, now)
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Quota adjustment failed: {e}")
+
+    def _record(self, priority, waited, admitted):
+        with self._lock:
+            window = self._waits.get(priority)
+            if window is None:
+                # Imported here: gemini_client imports this module
+                from gemini_client import LatencyWindow
+
+                window = self._waits[priority] = LatencyWindow()
+        window.add(waited)
+        try:
+            conn = self._conn()
+            incr_counter(conn, f"quota.{'admitted' if admitted else 'rejected'}.{priority}")
+            incr_counter(conn, f'quota.wait_ms.{priority}', int(waited * 1000))
+        except sqlite3.Error as e:
+            logger.warning(f"Quota counters failed: {e}")
+
+    def stats(self):
+        """Limits, current levels, and admissions and queue waits per class."""
+        if not self.enabled:
+            return {'enabled': False}
+        try:
+            conn = self._conn()
+            levels = self._levels(conn, time.time())
+            counters = read_counters(conn, 'quota.')
+        except sqlite3.Error as e:
+            logger.warning(f"Quota stats failed: {e}")
+            return {}
+        with self._lock:
+            windows = dict(self._waits)
+        classes = {}
+        for name, value in counters.items():
+            metric, priority = name.split('.', 1)
+            classes.setdefault(priority, {'admitted': 0, 'rejected': 0, 'wait_ms': 0})[metric] = value
+        for priority, counts in classes.items():
+            calls = counts['admitted'] + counts['rejected']
+            counts['meanWaitMs'] = round(counts.pop('wait_ms') / calls, 1) if calls else 0.0
+            if priority in windows:
+                counts['workerWait'] = windows[priority].summary()
+        return {
+            'enabled': True,
+            'limits': {'rpm': self.limits['requests'], 'tpm': self.limits['tokens']},
+            'available': {name: round(level, 1) for name, level in levels.items()},
+            'classes': classes
+        }
+
+
+governor = QuotaGovernor()
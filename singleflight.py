@@ -0,0 +1,159 @@
+"""
+Single-flight coalescing of identical in-flight analyses.
+
+When a story breaks, many users submit the same content within seconds. Only
+the first request for a content key (the leader) calls Gemini; concurrent
+requests for the same key wait and share its result:
+
+* within a worker, followers block on the leader's threading.Event;
+* across workers, the leader holds a short lease row in SQLite (see
+  storage.py) and followers in other workers poll the shared verdict cache
+  until the leader's result appears, or run the call themselves if the lease
+  is released or expires without one.
+
+Calls saved either way are counted in the shared counters table.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from storage import connect, incr_counter, read_counters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.shared = False
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key, within and across workers.
+
+    Args:
+        name (str): Label used for the saved-call counters.
+        peek (callable): peek(key) returns the result another worker stored
+            for `key` in the shared cache, or None.
+    """
+
+    def __init__(self, name, peek, db_name='singleflight.db', lease_ttl=None, poll_interval=0.1):
+        self.name = name
+        self.peek = peek
+        self.db_name = db_name
+        self.lease_ttl = lease_ttl if lease_ttl is not None else \
+            float(os.getenv('SINGLEFLIGHT_LEASE_TTL', 60))
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def _count(self, counter):
+        try:
+            incr_counter(self._conn(), f'singleflight.{self.name}.{counter}')
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight counter update failed: {e}")
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with the same key.
+
+        Returns:
+            tuple: (value, shared) where shared is True if the value came from
+            another request's call rather than this one.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            self._count('saved_in_worker')
+            return call.value, True
+
+        try:
+            call.value, call.shared = self._run_across_workers(key, fn)
+            return call.value, call.shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _run_across_workers(self, key, fn):
+        deadline = time.time() + self.lease_ttl
+        while True:
+            if self._acquire(key):
+                try:
+                    # Another worker may have finished between our last poll and the lease
+                    value = self.peek(key)
+                    if value is not None:
+                        self._count('saved_across_workers')
+                        return value, True
+                    self._count('leaders')
+                    return fn(), False
+                finally:
+                    self._release(key)
+
+            # Another worker holds the lease: wait for its result to be cached
+            value = self.peek(key)
+            if value is not None:
+                self._count('saved_across_workers')
+                return value, True
+            if time.time() > deadline:
+                return fn(), False
+            time.sleep(self.poll_interval)
+
+    def _acquire(self, key):
+        now = time.time()
+        try:
+            cursor = self._conn().execute(
+                'INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, '
+                'expires_at = excluded.expires_at WHERE leases.expires_at < ?',
+                (key, str(os.getpid()), now + self.lease_ttl, now)
+            )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight lease failed, running uncoalesced: {e}")
+            return True
+
+    def _release(self, key):
+        try:
+            self._conn().execute(
+                'DELETE FROM leases WHERE key = ? AND owner = ?', (key, str(os.getpid()))
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight lease release failed: {e}")
+
+    def stats(self):
+        """Return upstream calls made and saved, shared by all workers."""
+        try:
+            counters = read_counters(self._conn(), f'singleflight.{self.name}.')
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight stats failed: {e}")
+            return {}
+        return {
+            'leaders': counters.get('leaders', 0),
+            'savedInWorker': counters.get('saved_in_worker', 0),
+            'savedAcrossWorkers': counters.get('saved_across_workers', 0)
+        }
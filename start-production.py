@@ -55,7 +55,7 @@ def main():
     
     print("✅ All checks passed!")
     print("🌐 Starting Gunicorn server on http://localhost:8001")
-    print("📊 Workers: 2, Timeout: 30s")
+    print("📊 Workers: 2 x 8 threads (gthread), Timeout: 30s")
     print("🔒 Security features enabled")
     print("Press Ctrl+C to stop the server")
     print("=" * 50)
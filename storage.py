@@ -0,0 +1,77 @@
+"""
+Shared local storage for TruthLens.
+
+Everything that has to be visible to all Gunicorn workers (caches, indexes,
+counters) lives in small SQLite databases under TRUTHLENS_DATA_DIR. SQLite in
+WAL mode lets every worker read concurrently while writes are serialized by
+the database itself, so no extra server process is needed.
+"""
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.getenv(
+    'TRUTHLENS_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+)
+
+COUNTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_local = threading.local()
+
+
+def db_path(name):
+    """Return the absolute path of the named database inside DATA_DIR."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
+
+
+def connect(name, schema=""):
+    """Return a connection to the named database for the current thread.
+
+    Connections are cached per thread and per process, so a worker forked
+    from a preloaded master never reuses the parent's handle.
+
+    Args:
+        name (str): Database file name, e.g. 'verdict_cache.db'.
+        schema (str): SQL script run once when the connection is opened.
+
+    Returns:
+        sqlite3.Connection: An autocommit connection in WAL mode.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    conn = connections.get(name)
+    if conn is None:
+        conn = sqlite3.connect(db_path(name), timeout=5.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(COUNTERS_SCHEMA + schema)
+        connections[name] = conn
+    return conn
+
+
+def incr_counter(conn, name, amount=1):
+    """Atomically add `amount` to a named counter."""
+    conn.execute(
+        'INSERT INTO counters (name, value) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+        (name, amount)
+    )
+
+
+def read_counters(conn, prefix=""):
+    """Return all counters whose name starts with `prefix` as a dict."""
+    rows = conn.execute(
+        'SELECT name, value FROM counters WHERE substr(name, 1, ?) = ?',
+        (len(prefix), prefix)
+    )
+    return {name[len(prefix):]: value for name, value in rows}
@@ -0,0 +1,181 @@
+"""
+Schema-constrained ("structured") analysis output, run as an A/B arm against
+the prose prompts.
+
+In structured mode Gemini is given a response schema, a JSON mime type and a
+capped output length, so it returns the summary percentages and the analysis
+sections as JSON fields. The response is decoded with json.loads and mapped to
+a verdict with the same rule the prose parser applies to the summary line; a
+response that does not fit the schema is an error, never a keyword guess. The
+explanation is rendered in the prose layout so the frontend shows both arms
+the same way.
+
+STRUCTURED_OUTPUT_SHARE (0-100) sets the share of analyses run in structured
+mode. The split is by content key, so a given text or image always gets the
+same arm. Per-arm latency, response size and parse time are in /stats.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+
+from gemini_client import LatencyWindow
+from verdict_parser import source_hints, verdict_from_percentages
+
+STRUCTURED_OUTPUT_SHARE = float(os.getenv('STRUCTURED_OUTPUT_SHARE', 0))
+STRUCTURED_MAX_OUTPUT_TOKENS = int(os.getenv('STRUCTURED_MAX_OUTPUT_TOKENS', 768))
+
+PERCENT_FIELDS = ('genuinePercent', 'falsePercent', 'misleadingPercent')
+
+# (field, heading) of the analysis sections, in the order of the prose prompts
+SECTIONS = {
+    'text': (
+        ('credibilityAssessment', 'Credibility Assessment'),
+        ('identifiedTactics', 'Identified Tactics'),
+        ('educationalExplanation', 'Educational Explanation'),
+        ('actionableAdvice', 'Actionable Advice'),
+    ),
+    'image': (
+        ('fakeImage', 'Fake Image'),
+        ('credibilityAssessment', 'Credibility Assessment'),
+        ('identifiedIssues', 'Identified Issues'),
+        ('contextualAnalysis', 'Contextual Analysis'),
+        ('verificationSteps', 'Verification Steps'),
+    ),
+}
+
+LIST_FIELDS = {'identifiedTactics', 'actionableAdvice', 'identifiedIssues', 'verificationSteps'}
+
+SUMMARY_LINES = {
+    'text': "This text is **{}% likely to be accurate**, **{}% likely to contain misinformation**, "
+            "and **{}% likely to be misleading**.",
+    'image': "This image is **{}% likely to be genuine**, **{}% likely to be manipulated**, "
+             "and **{}% likely to be used in a misleading context**.",
+}
+
+
+def response_schema(kind):
+    """Response schema for a 'text' or 'image' analysis."""
+    properties = {field: {'type': 'integer'} for field in PERCENT_FIELDS}
+    for field, _ in SECTIONS[kind]:
+        if field in LIST_FIELDS:
+            properties[field] = {'type': 'array', 'items': {'type': 'string'}}
+        else:
+            properties[field] = {'type': 'string'}
+    return {'type': 'object', 'properties': properties, 'required': list(properties)}
+
+
+def generation_config(schema):
+    """generate_content config that constrains the output to `schema`."""
+    return {
+        'response_mime_type': 'application/json',
+        'response_schema': schema,
+        'max_output_tokens': STRUCTURED_MAX_OUTPUT_TOKENS
+    }
+
+
+def use_structured(key=None):
+    """True if the analysis for content `key` runs in structured mode.
+
+    Args:
+        key (str): Content key (e.g. the verdict cache key); None picks at random.
+    """
+    if STRUCTURED_OUTPUT_SHARE <= 0:
+        return False
+    if STRUCTURED_OUTPUT_SHARE >= 100:
+        return True
+    if key is None:
+        return random.random() * 100 < STRUCTURED_OUTPUT_SHARE
+    bucket = int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:8], 16) % 10000
+    return bucket < STRUCTURED_OUTPUT_SHARE * 100
+
+
+def load_object(response_text):
+    """Decode a structured response into a dict.
+
+    Raises:
+        ValueError: If the response is not a JSON object.
+    """
+    data = json.loads(response_text)
+    if not isinstance(data, dict):
+        raise ValueError("Structured response is not a JSON object")
+    return data
+
+
+def render_explanation(kind, data, percentages):
+    """Lay the structured fields out like a prose analysis."""
+    lines = [SUMMARY_LINES[kind].format(*percentages)]
+    for i, (field, heading) in enumerate(SECTIONS[kind], 1):
+        value = data.get(field)
+        if isinstance(value, list):
+            items = [str(item).strip() for item in value if str(item).strip()]
+            lines.append(f"{i}. **{heading}**:" + ''.join(f"\n   - {item}" for item in items))
+        else:
+            lines.append(f"{i}. **{heading}**: {str(value or '').strip()}")
+    return '\n\n'.join(lines)
+
+
+def parse_structured_to_json(response_text, kind):
+    """Convert a structured response to the expected JSON format for the frontend.
+
+    Args:
+        response_text (str): The model's JSON response.
+        kind (str): 'text' or 'image'.
+
+    Raises:
+        ValueError: If the response does not match the schema.
+    """
+    data = load_object(response_text)
+    try:
+        percentages = tuple(int(data[field]) for field in PERCENT_FIELDS)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Structured response is missing its percentages")
+
+    is_true, confidence = verdict_from_percentages(*percentages)
+    explanation = render_explanation(kind, data, percentages)
+    return {
+        "isTrue": is_true,
+        "confidence": confidence,
+        "explanation": explanation,
+        "sources": source_hints(explanation.lower())
+    }
+
+
+class ModeMetrics:
+    """Per-arm call counts, model latency, response size and parse time."""
+
+    def __init__(self):
+        self._arms = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode, seconds, response_chars=0, parse_seconds=0.0, ok=True):
+        with self._lock:
+            arm = self._arms.get(mode)
+            if arm is None:
+                arm = self._arms[mode] = {
+                    'calls': 0, 'errors': 0, 'chars': 0, 'parse': 0.0, 'latency': LatencyWindow()
+                }
+            arm['calls'] += 1
+            arm['errors'] += 0 if ok else 1
+            arm['chars'] += response_chars
+            arm['parse'] += parse_seconds
+        arm['latency'].add(seconds)
+
+    def stats(self):
+        """Per-arm summary for this worker."""
+        with self._lock:
+            arms = {mode: dict(arm) for mode, arm in self._arms.items()}
+        return {
+            mode: {
+                'calls': arm['calls'],
+                'errors': arm['errors'],
+                'meanResponseChars': round(arm['chars'] / arm['calls']),
+                'meanParseUs': round(arm['parse'] / arm['calls'] * 1e6, 1),
+                'latency': arm['latency'].summary()
+            }
+            for mode, arm in arms.items()
+        }
+
+
+mode_metrics = ModeMetrics()
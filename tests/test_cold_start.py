@@ -0,0 +1,64 @@
+"""
+Cold-start budget: `import app` in a fresh interpreter stays fast and light.
+
+Uses the probes of benchmarks/bench_cold_start.py; run that for the full
+report (warm-up cost, first-request timings).
+
+Run with: python -m pytest tests  (or python -m unittest discover tests)
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from bench_cold_start import BUDGET, SDK, WARM_PROBE
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+status = app.app.test_client().get('/health').status_code
+print(json.dumps({{'import': imported, 'status': status, 'sdk': {SDK!r} in sys.modules}}))
+"""
+
+RUNS = 3
+
+
+def probe(code):
+    """Run `code` in a fresh interpreter with an empty data directory; return its JSON line."""
+    data_dir = tempfile.mkdtemp(prefix='truthlens-cold-')
+    env = dict(os.environ, TRUTHLENS_DATA_DIR=data_dir, RATELIMIT_ENABLED='false', FAKE_GEMINI_LATENCY='0')
+    try:
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    if result.returncode:
+        raise AssertionError(f"Probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class ColdStartTest(unittest.TestCase):
+
+    def test_import_app_within_budget(self):
+        runs = [probe(IMPORT_PROBE) for _ in range(RUNS)]
+        median = statistics.median(run['import'] for run in runs)
+        self.assertLessEqual(median, BUDGET, f"import app took {median:.2f}s, over the {BUDGET:.2f}s budget")
+        self.assertFalse(any(run['sdk'] for run in runs), f"import app or /health imported {SDK}")
+        self.assertEqual({run['status'] for run in runs}, {200})
+
+    def test_first_requests_after_warmup_import_nothing(self):
+        warm = probe(WARM_PROBE)
+        self.assertEqual(warm['status'], [200, 200])
+        self.assertEqual(warm['imported'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
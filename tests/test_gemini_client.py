@@ -0,0 +1,116 @@
+"""
+Tests for gemini_client.py against a stub model, no network needed.
+
+Run with: python -m pytest tests  (or python -m unittest discover tests)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TRUTHLENS_DATA_DIR', tempfile.mkdtemp(prefix='truthlens-tests-'))
+
+import quota
+from gemini_client import CircuitOpenError, DeadlineExceeded, GeminiClient, call_deadline
+
+MODEL = 'stub-model'
+OTHER_MODEL = 'other-stub-model'
+
+
+class Response:
+    text = 'ok'
+    usage_metadata = None
+
+
+class StubModel:
+    """Raises the queued errors in order, then answers."""
+
+    def __init__(self):
+        self.errors = []
+        self.calls = 0
+        self.timeouts = []
+
+    def generate_content(self, contents, request_options=None, **kwargs):
+        self.calls += 1
+        self.timeouts.append(request_options['timeout'])
+        if self.errors:
+            raise self.errors.pop(0)
+        return Response()
+
+
+class BreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = GeminiClient()
+        self.client.max_retries = 0
+        self.client.breaker_threshold = 1
+        self.client.breaker_cooldown = 0.1
+        self.model = self.client._models[MODEL] = StubModel()
+        self.other = self.client._models[OTHER_MODEL] = StubModel()
+        self.governor = quota.governor
+        self.addCleanup(setattr, quota, 'governor', self.governor)
+        self.quota_dir = tempfile.mkdtemp(prefix='truthlens-quota-')
+        self.addCleanup(shutil.rmtree, self.quota_dir, True)
+
+    def test_quota_rejection_releases_half_open_trial(self):
+        quota.governor = quota.QuotaGovernor(os.path.join(self.quota_dir, 'quota.db'), rpm=1, tpm=0, queue_timeout=0.2)
+        self.model.errors.append(TimeoutError('upstream timed out'))
+        with self.assertRaises(TimeoutError):
+            self.client.generate('claim', MODEL)
+        self.assertEqual(self.client.breaker(MODEL).state, 'open')
+
+        # The half-open trial is admitted by the breaker but refused by the quota
+        time.sleep(0.15)
+        with self.assertRaises(quota.QuotaExhausted):
+            self.client.generate('claim', MODEL)
+        self.assertEqual(self.model.calls, 1)
+
+        quota.governor = quota.QuotaGovernor(rpm=0, tpm=0)
+        self.assertEqual(self.client.generate('claim', MODEL).text, 'ok')
+        self.assertEqual(self.client.breaker(MODEL).state, 'closed')
+
+    def test_open_breaker_still_rejects(self):
+        quota.governor = quota.QuotaGovernor(rpm=0, tpm=0)
+        self.model.errors.append(TimeoutError('upstream timed out'))
+        with self.assertRaises(TimeoutError):
+            self.client.generate('claim', MODEL)
+        with self.assertRaises(CircuitOpenError):
+            self.client.generate('claim', MODEL)
+        self.assertEqual(self.model.calls, 1)
+
+    def test_breakers_are_per_model(self):
+        quota.governor = quota.QuotaGovernor(rpm=0, tpm=0)
+        self.model.errors.append(TimeoutError('upstream timed out'))
+        with self.assertRaises(TimeoutError):
+            self.client.generate('claim', MODEL)
+        self.assertEqual(self.client.generate('claim', OTHER_MODEL).text, 'ok')
+        self.assertEqual(self.client.stats()['breakers'], {OTHER_MODEL: 'closed', MODEL: 'open'})
+
+
+class CallDeadlineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = GeminiClient()
+        self.model = self.client._models[MODEL] = StubModel()
+        self.governor = quota.governor
+        self.addCleanup(setattr, quota, 'governor', self.governor)
+        quota.governor = quota.QuotaGovernor(rpm=0, tpm=0)
+
+    def test_enclosing_deadline_caps_the_call(self):
+        with call_deadline(time.monotonic() + 3):
+            self.client.generate('claim', MODEL, deadline=10)
+        self.assertLessEqual(self.model.timeouts[0], 3)
+
+    def test_passed_deadline_fails_without_calling_upstream(self):
+        with call_deadline(time.monotonic() - 1):
+            with self.assertRaises(DeadlineExceeded):
+                self.client.generate('claim', MODEL)
+        self.assertEqual(self.model.calls, 0)
+        self.assertEqual(self.client.breaker(MODEL).state, 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
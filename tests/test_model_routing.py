@@ -0,0 +1,60 @@
+"""
+Tests for model_routing.py with stand-in model calls.
+
+Run with: python -m pytest tests  (or python -m unittest discover tests)
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TRUTHLENS_DATA_DIR', tempfile.mkdtemp(prefix='truthlens-tests-'))
+
+import gemini_client
+from model_routing import ModelRouter, Route
+
+ROUTE = Route('text:deep', ('lite', 'strong'), 60)
+
+
+def assess(outcome, threshold):
+    return 'low_confidence' if outcome['confidence'] < threshold else None
+
+
+class RouterDeadlineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.router = ModelRouter({ROUTE.name: ROUTE}, min_escalation_time=0.5)
+        self.calls = []
+
+    def call(self, seconds, confidence=40):
+        def call(model_name):
+            self.calls.append((model_name, gemini_client._deadline.get() - time.monotonic()))
+            time.sleep(seconds)
+            return {'model': model_name, 'confidence': confidence}
+        return call
+
+    def test_escalation_gets_only_the_time_left(self):
+        outcome = self.router.run(ROUTE.name, self.call(0.3), assess, deadline=2)
+        self.assertEqual(outcome['model'], 'strong')
+        (_, lite_left), (_, strong_left) = self.calls
+        self.assertLessEqual(lite_left, 2)
+        self.assertLessEqual(strong_left, 1.7)
+
+    def test_escalation_is_skipped_when_time_is_short(self):
+        outcome = self.router.run(ROUTE.name, self.call(0.6), assess, deadline=1)
+        self.assertEqual(outcome['model'], 'lite')
+        self.assertEqual([model for model, _ in self.calls], ['lite'])
+        self.assertIn('strong:skipped', self.router.stats()['routes'][ROUTE.name]['decisions'])
+
+    def test_skipped_escalation_of_unparsed_output_raises(self):
+        def call(model_name):
+            time.sleep(0.6)
+            raise ValueError('not the schema')
+        with self.assertRaisesRegex(ValueError, 'not the schema'):
+            self.router.run(ROUTE.name, call, assess, deadline=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Tests for url_fetcher.py against a local http.server stand-in.
+
+Run with: python -m pytest tests  (or python -m unittest discover tests)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from url_fetcher import FetchError, UrlFetcher
+
+BODY = b'\x89PNG' + b'x' * 1000
+ETAG = '"v1"'
+LAST_MODIFIED = 'Wed, 01 Jan 2025 00:00:00 GMT'
+MAX_BYTES = 4096
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves fixed routes and records every request it sees."""
+
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        Handler.requests.append((self.path, dict(self.headers)))
+        path = self.path.split('?')[0]
+        if path == '/etag':
+            if self.headers.get('If-None-Match') == ETAG:
+                return self._empty(304)
+            self._body(BODY, {'ETag': ETAG})
+        elif path == '/last-modified':
+            if self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+                return self._empty(304)
+            self._body(BODY, {'Last-Modified': LAST_MODIFIED})
+        elif path == '/plain':
+            self._body(BODY, {})
+        elif path == '/declared-oversize':
+            self.send_response(200)
+            self.send_header('Content-Length', str(MAX_BYTES * 10))
+            self.end_headers()
+            self.wfile.write(b'x' * 100)
+        elif path == '/streamed-oversize':
+            # No Content-Length: the body ends when the connection closes
+            self.send_response(200)
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for _ in range(20):
+                    self.wfile.write(b'x' * 1024)
+            except OSError:
+                pass
+        elif path.startswith('/sized/'):
+            self._body(b's' * int(path.rsplit('/', 1)[1]), {'ETag': f'"{path}"'})
+        else:
+            self._empty(404)
+
+    def _body(self, body, headers):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _empty(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class UrlFetcherTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.requests = []
+        self.cache_dir = tempfile.mkdtemp(prefix='truthlens-url-cache-')
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.fetcher = UrlFetcher(cache_dir=self.cache_dir, max_bytes=MAX_BYTES)
+
+    def conditions(self):
+        """The validator each request to the server carried, None if unconditional."""
+        return [headers.get('If-None-Match') or headers.get('If-Modified-Since') for _, headers in Handler.requests]
+
+    def test_fetches_body(self):
+        self.assertEqual(self.fetcher.fetch(self.base + '/plain'), BODY)
+
+    def test_uncacheable_response_is_not_stored(self):
+        self.fetcher.fetch(self.base + '/plain')
+        self.fetcher.fetch(self.base + '/plain')
+        self.assertEqual(self.conditions(), [None, None])
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_etag_revalidation_serves_cached_body(self):
+        url = self.base + '/etag'
+        self.assertEqual(self.fetcher.fetch(url), BODY)
+        self.assertEqual(self.fetcher.fetch(url), BODY)
+        self.assertEqual(self.conditions(), [None, ETAG])
+
+    def test_last_modified_revalidation_serves_cached_body(self):
+        url = self.base + '/last-modified'
+        self.assertEqual(self.fetcher.fetch(url), BODY)
+        self.assertEqual(self.fetcher.fetch(url), BODY)
+        self.assertEqual(self.conditions(), [None, LAST_MODIFIED])
+
+    def test_revalidates_again_when_cached_body_is_gone(self):
+        url = self.base + '/etag'
+        self.fetcher.fetch(url)
+        body_path, _ = self.fetcher._paths(url)
+        # The lookup sees the entry, then another worker evicts it before the 304 is read
+        cached = self.fetcher._cached(url)
+        os.remove(body_path)
+        self.fetcher._cached = lambda _: cached
+        self.assertEqual(self.fetcher.fetch(url), BODY)
+        self.assertEqual(self.conditions(), [None, ETAG, None])
+
+    def test_rejects_declared_oversize_body(self):
+        with self.assertRaisesRegex(FetchError, 'over the 4096 byte limit'):
+            self.fetcher.fetch(self.base + '/declared-oversize')
+
+    def test_aborts_oversize_body_while_streaming(self):
+        with self.assertRaisesRegex(FetchError, 'exceeds the 4096 byte limit'):
+            self.fetcher.fetch(self.base + '/streamed-oversize')
+
+    def test_http_error_status(self):
+        with self.assertRaisesRegex(FetchError, 'HTTP 404'):
+            self.fetcher.fetch(self.base + '/missing')
+
+    def test_rejects_non_http_scheme(self):
+        for url in ('ftp://127.0.0.1/image.png', 'file:///etc/passwd', 'gopher://example.com/'):
+            with self.assertRaisesRegex(FetchError, 'Only http and https'):
+                self.fetcher.fetch(url)
+        self.assertEqual(Handler.requests, [])
+
+    def test_evicts_least_recently_used_over_budget(self):
+        fetcher = UrlFetcher(cache_dir=self.cache_dir, max_bytes=MAX_BYTES, cache_max_bytes=3500)
+        urls = [f'{self.base}/sized/1000?n={n}' for n in range(3)]
+        for url in urls:
+            fetcher.fetch(url)
+            time.sleep(0.01)
+        # A hit makes the first entry the most recently used
+        fetcher.fetch(urls[0])
+        time.sleep(0.01)
+        fetcher.fetch(f'{self.base}/sized/1000?n=3')
+
+        cached = [url for url in urls if fetcher._cached(url)[0]]
+        self.assertEqual(cached, [urls[0], urls[2]])
+        total = sum(os.path.getsize(os.path.join(self.cache_dir, name)) for name in os.listdir(self.cache_dir))
+        self.assertLessEqual(total, 3500)
+
+    def test_body_over_cache_budget_is_not_stored(self):
+        fetcher = UrlFetcher(cache_dir=self.cache_dir, max_bytes=MAX_BYTES, cache_max_bytes=500)
+        self.assertEqual(len(fetcher.fetch(self.base + '/sized/1000')), 1000)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
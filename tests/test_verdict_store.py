@@ -0,0 +1,60 @@
+"""
+Tests for the verdict store's retention limits.
+
+Run with: python -m pytest tests  (or python -m unittest discover tests)
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TRUTHLENS_DATA_DIR', tempfile.mkdtemp(prefix='truthlens-tests-'))
+
+from verdict_store import VerdictStore
+
+VERDICT = '{"isTrue": false, "confidence": 80}'
+
+
+def rows(count, created_at, word='claim'):
+    return [('text', f'text:{n}', f'{word} number {n}', None, 0, 80, 'Likely false.', VERDICT, 'deep', created_at)
+            for n in range(count)]
+
+
+class RetentionTest(unittest.TestCase):
+
+    def store(self, **limits):
+        return VerdictStore(f'verdict_store_{uuid.uuid4().hex}.db', enabled=True, batch_size=4, **limits)
+
+    def count(self, store):
+        return store._conn().execute('SELECT COUNT(*) FROM analyses').fetchone()[0]
+
+    def test_keeps_newest_max_rows(self):
+        store = self.store(max_age=0, max_rows=5)
+        store.write(rows(7, time.time(), 'older'))
+        store.write(rows(5, time.time(), 'newer'))
+        self.assertEqual(store.prune(), 7)
+        self.assertEqual(self.count(store), 5)
+        self.assertEqual(store.search('older')[0], [])
+        self.assertEqual(len(store.search('newer')[0]), 5)
+
+    def test_deletes_rows_past_max_age(self):
+        store = self.store(max_age=3600, max_rows=0)
+        store.write(rows(9, time.time() - 7200, 'stale'))
+        store.write(rows(2, time.time(), 'fresh'))
+        self.assertEqual(store.prune(), 9)
+        self.assertEqual(self.count(store), 2)
+        self.assertEqual(store.search('stale')[0], [])
+        self.assertEqual(store.stats()['pruned'], 9)
+
+    def test_no_limits_keeps_everything(self):
+        store = self.store(max_age=0, max_rows=0)
+        store.write(rows(6, 0))
+        self.assertEqual(store.prune(), 0)
+        self.assertEqual(self.count(store), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
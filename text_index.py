@@ -0,0 +1,266 @@
+"""
+MinHash-LSH index for reusing verdicts on reworded claims.
+
+The exact verdict cache (verdict_cache.py) misses texts that were copy-pasted
+with small edits, different punctuation or an extra sentence. Here each text is
+reduced to character 5-gram shingles, summarized by a one-permutation MinHash
+signature, and bucketed with locality-sensitive hashing (BANDS bands of ROWS rows). Candidates
+sharing a band are confirmed by their estimated Jaccard similarity.
+
+Shingle overlap cannot tell a claim from its opposite: adding "not" or
+changing one number leaves most shingles alike. A near-match therefore also
+needs the same numbers and negation words, in the same order, as the stored
+text (its guard), on top of a high similarity threshold.
+
+Signatures and verdicts are persisted in SQLite (see storage.py) so the index
+is rebuilt from disk when a worker starts and picks up rows added by others.
+Like the verdict cache, entries expire after TEXT_INDEX_TTL and only the
+newest TEXT_INDEX_MAX_ENTRIES are kept (by default the verdict cache's
+settings, so a near-match never outlives the exact-match entry). Evicted rows
+leave every worker's buckets on its next sync.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import deque
+
+from storage import connect, incr_counter, read_counters
+from verdict_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS text_signatures (
+    id INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL,
+    guard TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS text_signatures_created_at ON text_signatures (created_at);
+"""
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# One-permutation MinHash: a shingle's mixed 64-bit hash picks its bin with
+# the top BIN_BITS bits, and each bin keeps the minimum of the rest
+BIN_BITS = (NUM_PERM - 1).bit_length()
+_VALUE_BITS = 64 - BIN_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_MASK_64 = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+# Tokens that flip or change a claim while barely moving its shingles
+_GUARD_TOKENS = re.compile(
+    r"\b(?:not|no|never|nor|neither|none|nothing|nobody|nowhere|cannot)\b|n['\u2019]t\b|\d+(?:[.,]\d+)*"
+)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def shingles(text):
+    """Return the set of hashed character shingles of a text."""
+    text = _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', normalize_text(text))).strip()
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {
+        zlib.crc32(text[i:i + SHINGLE_SIZE].encode('utf-8'))
+        for i in range(len(text) - SHINGLE_SIZE + 1)
+    }
+
+
+def guard(text):
+    """Return the numbers and negation words of a text, in order."""
+    return ' '.join(
+        token.replace('\u2019', "'") for token in _GUARD_TOKENS.findall(normalize_text(text))
+    )
+
+
+def minhash(text):
+    """Return the MinHash signature of a text as an array of NUM_PERM ints.
+
+    One hash per shingle instead of one per shingle and permutation, so the
+    cost is linear in the text length. Empty bins borrow the value of the
+    next non-empty bin, tagged with the distance in the bits above the value
+    (rotation densification), so short texts still compare bin by bin.
+    """
+    empty = _VALUE_MASK + 1
+    bins = [empty] * NUM_PERM
+    for value in shingles(text):
+        mixed = (value * _MIX) & _MASK_64
+        index = mixed >> _VALUE_BITS
+        value = mixed & _VALUE_MASK
+        if value < bins[index]:
+            bins[index] = value
+    if empty in bins:
+        # Walk twice round the ring from the right, so every empty bin has
+        # seen the nearest filled bin after it
+        original = bins[:]
+        nearest = None
+        for step in range(2 * NUM_PERM - 1, -1, -1):
+            if original[step % NUM_PERM] != empty:
+                nearest = step
+            elif step < NUM_PERM:
+                bins[step] = original[nearest % NUM_PERM] | ((nearest - step) << _VALUE_BITS)
+    return array('Q', bins)
+
+
+def similarity(sig_a, sig_b):
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _band_keys(signature):
+    # Hashed to one int per band: collisions only add candidates, which the
+    # similarity check then rejects
+    return [
+        hash((band, *signature[band * ROWS:(band + 1) * ROWS]))
+        for band in range(BANDS)
+    ]
+
+
+class NearMatchIndex:
+    """Persistent MinHash-LSH lookup from text to the verdict of a similar text."""
+
+    def __init__(self, db_name='text_index.db', threshold=None, max_entries=None, ttl=None):
+        self.db_name = db_name
+        self.threshold = threshold if threshold is not None else \
+            float(os.getenv('TEXT_NEAR_MATCH_THRESHOLD', 0.9))
+        self.max_entries = max_entries if max_entries is not None else \
+            int(os.getenv('TEXT_INDEX_MAX_ENTRIES', os.getenv('VERDICT_CACHE_MAX_ENTRIES', 10000)))
+        self.ttl = ttl if ttl is not None else \
+            int(os.getenv('TEXT_INDEX_TTL', os.getenv('VERDICT_CACHE_TTL', 6 * 60 * 60)))
+        self.signatures = {}
+        self.guards = {}
+        self.buckets = {}
+        # Row ids in insertion (and so eviction) order
+        self._order = deque()
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def _add(self, row_id, signature, text_guard):
+        self.signatures[row_id] = signature
+        self.guards[row_id] = text_guard
+        self._order.append(row_id)
+        for key in _band_keys(signature):
+            self.buckets.setdefault(key, []).append(row_id)
+
+    def _remove(self, row_id):
+        del self.guards[row_id]
+        for key in _band_keys(self.signatures.pop(row_id)):
+            bucket = self.buckets[key]
+            bucket.remove(row_id)
+            if not bucket:
+                del self.buckets[key]
+
+    def _sync(self, conn):
+        rows = conn.execute(
+            'SELECT id, signature, guard FROM text_signatures WHERE id > ? ORDER BY id',
+            (self._last_id,)
+        ).fetchall()
+        for row_id, blob, text_guard in rows:
+            signature = array('Q')
+            signature.frombytes(blob)
+            self._add(row_id, signature, text_guard)
+            self._last_id = row_id
+        # Rows are only ever evicted oldest first
+        oldest = conn.execute('SELECT MIN(id) FROM text_signatures').fetchone()[0]
+        if oldest is None:
+            oldest = self._last_id + 1
+        while self._order and self._order[0] < oldest:
+            self._remove(self._order.popleft())
+
+    def load(self):
+        """Load every stored signature; called once when a worker starts."""
+        try:
+            with self._lock:
+                self._sync(self._conn())
+        except sqlite3.Error as e:
+            logger.warning(f"Text index load failed: {e}")
+
+    def lookup(self, text, signature=None):
+        """Return (verdict, similarity) for the most similar stored text at or
+        above the threshold with the same guard tokens, or None."""
+        if signature is None:
+            signature = minhash(text)
+        text_guard = guard(text)
+        try:
+            conn = self._conn()
+            with self._lock:
+                self._sync(conn)
+                candidates = set()
+                for key in _band_keys(signature):
+                    candidates.update(self.buckets.get(key, ()))
+                best = None
+                for row_id in candidates:
+                    if self.guards[row_id] != text_guard:
+                        continue
+                    score = similarity(signature, self.signatures[row_id])
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (row_id, score)
+            if best is None:
+                incr_counter(conn, 'text_index.misses')
+                return None
+            # Expired, or evicted by another worker since the sync
+            row = conn.execute(
+                'SELECT verdict FROM text_signatures WHERE id = ? AND created_at > ?',
+                (best[0], time.time() - self.ttl)
+            ).fetchone()
+            if row is None:
+                incr_counter(conn, 'text_index.misses')
+                return None
+            incr_counter(conn, 'text_index.hits')
+            return json.loads(row[0]), best[1]
+        except sqlite3.Error as e:
+            logger.warning(f"Text index lookup failed: {e}")
+            return None
+
+    def add(self, text, verdict, signature=None):
+        """Record the verdict for a newly analyzed text and evict expired and
+        overflow entries."""
+        if signature is None:
+            signature = minhash(text)
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                'INSERT INTO text_signatures (signature, guard, verdict, created_at) VALUES (?, ?, ?, ?)',
+                (signature.tobytes(), guard(text), json.dumps(verdict), now)
+            )
+            conn.execute('DELETE FROM text_signatures WHERE created_at <= ?', (now - self.ttl,))
+            conn.execute(
+                'DELETE FROM text_signatures WHERE id <= ('
+                'SELECT id FROM text_signatures ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (self.max_entries,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Text index store failed: {e}")
+
+    def stats(self):
+        try:
+            conn = self._conn()
+            counters = read_counters(conn, 'text_index.')
+            entries = conn.execute('SELECT COUNT(*) FROM text_signatures').fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Text index stats failed: {e}")
+            return {}
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'entries': entries,
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl,
+            'threshold': self.threshold
+        }
@@ -0,0 +1,131 @@
+"""
+Bounded input handling for the text endpoints.
+
+The text routes used to let Flask parse JSON bodies of up to
+MAX_CONTENT_LENGTH (16MB), run bleach over the whole submitted string, and
+only then keep its first 2000 characters. Now:
+
+* read_json() refuses a body over its byte limit from the Content-Length
+  header alone, and otherwise reads at most limit + 1 bytes (so a chunked
+  upload without a length cannot run past it) before parsing.
+* check_text_field() rejects a text longer than TEXT_MAX_INPUT_CHARS before
+  any work is done on it.
+* sanitize_text() cleans only the prefix that is kept. Plain text with none
+  of the characters bleach rewrites is returned as is; otherwise bleach runs
+  over a window of twice TEXT_MAX_CHARS. It runs over the whole text if
+  stripped markup leaves the window short, or if the window ends inside a
+  tag or opens a comment, CDATA section or raw-text element that could close
+  past its end.
+"""
+import json
+import os
+import re
+
+import bleach
+
+# Characters analyzed per text; the rest of a longer submission is dropped
+TEXT_MAX_CHARS = int(os.getenv('TEXT_MAX_CHARS', 2000))
+# Longest text field accepted at all
+TEXT_MAX_INPUT_CHARS = int(os.getenv('TEXT_MAX_INPUT_CHARS', 20000))
+# Largest JSON body read by a single-text endpoint (batches get one per item)
+TEXT_MAX_BODY_BYTES = int(os.getenv('TEXT_MAX_BODY_BYTES', 128 * 1024))
+
+# Everything bleach.clean(tags=[], strip=True) changes in plain text: markup
+# and entity characters, and the control characters other than tab and newline
+_NEEDS_CLEANING = re.compile(r'[\x00-\x08\x0b-\x1f&<>]')
+
+# Extra cleaned characters required beyond the limit, so that a tag or entity
+# cut off at the end of the window cannot change the part that is kept
+_WINDOW_SLACK = 32
+
+# Constructs whose content runs to a closing delimiter that may lie past the
+# window (comments, CDATA, raw-text and RCDATA elements, plaintext); cut
+# inside one, the window parses differently from the whole text
+_UNBOUNDED = re.compile(
+    r'<(?:!--|!\[CDATA\[|(?:textarea|title|plaintext|script|style|xmp|iframe|noembed|noframes|noscript)\b)',
+    re.IGNORECASE
+)
+_TAG_OPEN = re.compile(r'<[A-Za-z/!?]')
+# A whole tag; any quote is taken to open a value, so a tag with stray quotes
+# only ever looks longer than it is (and sends the text to a full clean)
+_TAG = re.compile(r'<[A-Za-z/!?](?:"[^"]*"|\'[^\']*\'|[^\'">])*>')
+
+
+class InputTooLarge(ValueError):
+    """Raised for a request body or text field over its size limit."""
+
+
+def read_json(request, limit=TEXT_MAX_BODY_BYTES):
+    """Parse the JSON body of `request`, reading at most `limit` bytes.
+
+    Args:
+        request: The Flask request.
+        limit (int): Largest body accepted, in bytes.
+
+    Returns:
+        The parsed JSON value.
+
+    Raises:
+        InputTooLarge: If the body is larger than `limit`.
+        ValueError: If the body is not valid JSON.
+    """
+    if request.content_length is not None and request.content_length > limit:
+        raise InputTooLarge(f'Request body too large (maximum {limit} bytes)')
+    body = request.stream.read(limit + 1)
+    if len(body) > limit:
+        raise InputTooLarge(f'Request body too large (maximum {limit} bytes)')
+    try:
+        return json.loads(body)
+    except RecursionError:
+        raise ValueError('JSON nested too deeply')
+
+
+def check_text_field(text, max_chars=TEXT_MAX_INPUT_CHARS):
+    """Raise InputTooLarge if `text` is longer than `max_chars` characters."""
+    if len(text) > max_chars:
+        raise InputTooLarge(f'Text too long (maximum {max_chars} characters)')
+
+
+def strip_markup(text):
+    """Remove HTML tags and comments and escape what is left, as bleach does."""
+    return bleach.clean(text, tags=[], strip=True)
+
+
+def _ends_in_tag(text, end):
+    """Whether a tag opened before `end` is still open there."""
+    position = 0
+    while True:
+        opening = _TAG_OPEN.search(text, position, end)
+        if opening is None:
+            return False
+        tag = _TAG.match(text, opening.start(), end)
+        if tag is None:
+            return True
+        position = tag.end()
+
+
+def sanitize_text(text, max_chars=TEXT_MAX_CHARS):
+    """Sanitize input text to prevent XSS and keep its first `max_chars` characters.
+
+    Args:
+        text (str): The submitted text.
+        max_chars (int): Characters to keep after cleaning.
+
+    Returns:
+        str: The cleaned prefix, as strip_markup(text)[:max_chars] would be.
+    """
+    if not text:
+        return ""
+    head = text[:max_chars]
+    if not _NEEDS_CLEANING.search(head):
+        return head
+    window = max_chars * 2
+    if len(text) > window and (_UNBOUNDED.search(text, 0, window) or _ends_in_tag(text, window)):
+        # The window may end inside one of these: clean it all
+        # (check_text_field has bounded its length)
+        return strip_markup(text)[:max_chars]
+    cleaned = strip_markup(text[:window])
+    if len(text) > window and len(cleaned) < max_chars + _WINDOW_SLACK:
+        # Mostly markup: clean it all
+        cleaned = strip_markup(text)
+    return cleaned[:max_chars]
@@ -0,0 +1,212 @@
+"""
+Pooled, streaming, size-capped URL fetcher with an on-disk HTTP cache.
+
+Used by analyze_image_for_misinformation (project_1.py) for /analyze-image:
+
+* one requests.Session per process with a keep-alive connection pool per host;
+* separate connect and read timeouts;
+* the body is streamed and the download aborted as soon as it passes the
+  byte cap, so an oversized or endless response never sits in memory;
+* responses carrying an ETag or Last-Modified header are kept on disk under
+  TRUTHLENS_DATA_DIR/url_cache and revalidated with a conditional request, so
+  an unchanged URL costs a 304 instead of a second download. The cache is
+  held under FETCH_CACHE_MAX_BYTES: after each store the least recently used
+  entries (by body mtime, refreshed on every cache hit) are deleted.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from storage import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class FetchError(Exception):
+    """The URL could not be fetched within the configured limits."""
+
+
+class UrlFetcher:
+    """Fetch URL bodies through a pooled session with a revalidating disk cache."""
+
+    def __init__(self, cache_dir=None, max_bytes=None, connect_timeout=None,
+                 read_timeout=None, pool_size=None, cache_max_bytes=None):
+        self.cache_dir = cache_dir or os.path.join(DATA_DIR, 'url_cache')
+        self.max_bytes = max_bytes or int(os.getenv('FETCH_MAX_BYTES', 16 * 1024 * 1024))
+        self.timeout = (
+            connect_timeout or float(os.getenv('FETCH_CONNECT_TIMEOUT', 3.05)),
+            read_timeout or float(os.getenv('FETCH_READ_TIMEOUT', 10))
+        )
+        self.pool_size = pool_size or int(os.getenv('FETCH_POOL_SIZE', 10))
+        self.cache_max_bytes = cache_max_bytes if cache_max_bytes is not None else \
+            int(os.getenv('FETCH_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """This process's pooled session, shared by its threads (recreated after a fork)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = 'TruthLens/1.0'
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def _paths(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, digest)
+        return base + '.body', base + '.json'
+
+    def _cached(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get('url') == url and os.path.exists(body_path):
+                return meta, body_path
+        except (OSError, ValueError):
+            pass
+        return None, None
+
+    def fetch(self, url, revalidate=True):
+        """Return the body of `url` as bytes.
+
+        Args:
+            url (str): An http or https URL.
+            revalidate (bool): Send a conditional request for a cached body;
+                False downloads it again.
+
+        Raises:
+            FetchError: On a bad scheme, HTTP error, timeout or oversized body.
+        """
+        if not url.lower().startswith(('http://', 'https://')):
+            raise FetchError("Only http and https URLs are supported")
+
+        meta, body_path = self._cached(url) if revalidate else (None, None)
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        except requests.RequestException as e:
+            raise FetchError(f"Could not fetch {url}: {e}")
+
+        with response:
+            if response.status_code == 304 and meta:
+                body = self._read_cached(body_path)
+                if body is not None:
+                    return body
+            else:
+                return self._download(url, response)
+        # Evicted by another worker since the lookup; download it again
+        return self.fetch(url, revalidate=False)
+
+    def _read_cached(self, body_path):
+        try:
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            # Marks the entry as recently used for eviction
+            os.utime(body_path)
+            return body
+        except OSError:
+            return None
+
+    def _download(self, url, response):
+        """Stream a response body under the byte cap, caching it if it can be revalidated."""
+        if response.status_code != 200:
+            raise FetchError(f"Fetching {url} returned HTTP {response.status_code}")
+
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise FetchError(f"{url} is {declared} bytes, over the {self.max_bytes} byte limit")
+
+        chunks = []
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise FetchError(f"{url} exceeds the {self.max_bytes} byte limit")
+                chunks.append(chunk)
+        except requests.RequestException as e:
+            raise FetchError(f"Download of {url} failed: {e}")
+        body = b''.join(chunks)
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._store(url, body, {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.time()
+            })
+        return body
+
+    def _store(self, url, body, meta):
+        if len(body) > self.cache_max_bytes:
+            return
+        body_path, meta_path = self._paths(url)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to temp files and rename so other workers never read partial entries
+            for path, data, mode in ((body_path, body, 'wb'), (meta_path, json.dumps(meta), 'w')):
+                fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+                with os.fdopen(fd, mode) as f:
+                    f.write(data)
+                os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"URL cache store failed for {url}: {e}")
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits its byte budget."""
+        entries = {}
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for item in scan:
+                    base = os.path.splitext(item.name)[0]
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    total += stat.st_size
+                    entry = entries.setdefault(base, [0, 0.0])
+                    entry[0] += stat.st_size
+                    entry[1] = max(entry[1], stat.st_mtime)
+        except OSError as e:
+            logger.warning(f"URL cache eviction failed: {e}")
+            return
+        if total <= self.cache_max_bytes:
+            return
+        # Least recently used first; hits refresh the body's mtime
+        for base, (size, used) in sorted(entries.items(), key=lambda item: item[1][1]):
+            for ext in ('.body', '.json', ''):
+                try:
+                    os.remove(os.path.join(self.cache_dir, base + ext))
+                except OSError:
+                    pass
+            total -= size
+            if total <= self.cache_max_bytes:
+                break
+
+
+fetcher = UrlFetcher()
@@ -0,0 +1,141 @@
+"""
+Content-addressed verdict cache shared by all Gunicorn workers.
+
+Verdicts are keyed on a SHA-256 of the normalized, sanitized input so the same
+viral claim is only ever sent to Gemini once per TTL window. Entries live in a
+SQLite database (see storage.py) and are evicted least-recently-used once the
+cache grows past its size bound.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+from storage import connect, incr_counter, read_counters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT PRIMARY KEY,
+    verdict TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verdicts_accessed_at ON verdicts (accessed_at);
+"""
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normalize text so trivial variations map to the same cache key."""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def text_cache_key(text):
+    """Return the cache key for an already sanitized text submission."""
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return f'text:{digest}'
+
+
+class VerdictCache:
+    """Size-bounded LRU cache of verdict dicts with a time-to-live.
+
+    Cache failures are logged and treated as misses; they never fail a request.
+    """
+
+    def __init__(self, db_name='verdict_cache.db', max_entries=None, ttl=None):
+        self.db_name = db_name
+        self.max_entries = max_entries if max_entries is not None else \
+            int(os.getenv('VERDICT_CACHE_MAX_ENTRIES', 10000))
+        self.ttl = ttl if ttl is not None else \
+            int(os.getenv('VERDICT_CACHE_TTL', 6 * 60 * 60))
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def get(self, key):
+        """Return the cached verdict for `key`, or None on a miss."""
+        return self.get_any((key,))
+
+    def get_any(self, keys):
+        """Return the cached verdict for the first of `keys` that is cached.
+
+        Counts a single hit or miss however many keys are tried.
+        """
+        now = time.time()
+        try:
+            conn = self._conn()
+            rows = dict(conn.execute(
+                f'SELECT key, verdict FROM verdicts WHERE key IN ({",".join("?" * len(keys))}) '
+                'AND created_at > ?',
+                (*keys, now - self.ttl)
+            ).fetchall())
+            key = next((key for key in keys if key in rows), None)
+            if key is None:
+                incr_counter(conn, 'verdict_cache.misses')
+                return None
+            conn.execute('UPDATE verdicts SET accessed_at = ? WHERE key = ?', (now, key))
+            incr_counter(conn, 'verdict_cache.hits')
+            return json.loads(rows[key])
+        except sqlite3.Error as e:
+            logger.warning(f"Verdict cache lookup failed: {e}")
+            return None
+
+    def peek(self, key):
+        """Return the cached verdict for `key` without counting a hit or miss."""
+        try:
+            row = self._conn().execute(
+                'SELECT verdict FROM verdicts WHERE key = ? AND created_at > ?',
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Verdict cache lookup failed: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, verdict):
+        """Store `verdict` under `key` and evict expired and overflow entries."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                'INSERT OR REPLACE INTO verdicts (key, verdict, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?)',
+                (key, json.dumps(verdict), now, now)
+            )
+            conn.execute('DELETE FROM verdicts WHERE created_at <= ?', (now - self.ttl,))
+            conn.execute(
+                'DELETE FROM verdicts WHERE key IN ('
+                'SELECT key FROM verdicts ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Verdict cache store failed: {e}")
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries."""
+        try:
+            conn = self._conn()
+            counters = read_counters(conn, 'verdict_cache.')
+            entries = conn.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Verdict cache stats failed: {e}")
+            return {}
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hitRate': round(hits / total, 4) if total else 0.0,
+            'entries': entries,
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl
+        }
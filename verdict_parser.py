@@ -0,0 +1,284 @@
+"""
+Precompiled parser that turns a Gemini analysis into the verdict JSON the
+frontend expects.
+
+The summary line ("X% likely to be accurate ..., Y% likely ... misinformation,
+Z% likely ... misleading") used to be found with one regex containing four
+lazy `.*?` gaps. On a long line with repeated "N% likely" phrases that regex
+backtracks polynomially (a 1,600-character line took over six seconds). Here
+each token of the pattern is located once and the leftmost match is resolved
+from right to left, which yields the same numbers the regex would in
+O(n log n). The keyword fallback runs over one precompiled keyword table in
+which a keyword is only searched for when a shorter keyword it contains was
+found, and the source hints reuse that result.
+
+verdict_from_percentages and source_hints are shared with the structured
+(schema-constrained) output mode in structured_output.py.
+"""
+import re
+from bisect import bisect_left
+
+# Tokens of: (\d+)%\s+likely\s+to\s+be\s+(accurate|genuine).*?(\d+)%\s+likely.*?
+#            (misinformation|manipulated).*?(\d+)%\s+likely.*?(misleading)
+# Tokens are found from their literal part; the digits are read backwards from
+# the '%'. `.` does not match a newline, so every gap stays on one line, but
+# the `\s+` inside a token may cross one.
+_SUMMARY_HEAD = re.compile(r'(\d+)%\s+likely\s+to\s+be\s+(?:accurate|genuine)')
+_LIKELY_AT = re.compile(r'(\d+)%\s+likely')
+_LIKELY = re.compile(r'%\s+likely')
+_HEAD_TAIL = re.compile(r'\s+to\s+be\s+(?:accurate|genuine)')
+_FALSE_WORD = re.compile(r'misinformation|manipulated')
+_MISLEADING = re.compile(r'misleading')
+_NEWLINE = re.compile(r'\n')
+
+STRONG_NEGATIVE = (
+    'fake', 'false', 'misleading', 'scam', 'manipulated', 'fabricated',
+    'hoax', 'conspiracy', 'debunked', 'untrue', 'deceptive', 'fraudulent',
+    'suspicious', 'red flags', 'warning signs', 'concerning', 'doubt',
+    'misinformation', 'disinformation', 'propaganda'
+)
+
+POSITIVE_INDICATORS = (
+    'credible', 'accurate', 'verified', 'legitimate', 'authentic',
+    'reliable', 'factual', 'genuine', 'trustworthy', 'evidence-based',
+    'well-sourced', 'documented', 'confirmed', 'looks real', 'appears genuine',
+    'likely genuine', 'probably accurate'
+)
+
+SOURCE_WORDS = ('verify', 'check', 'source', 'research', 'fact-check')
+
+# 'reverse image search' contains 'image', so 'image' alone decides that hint
+IMAGE_WORD = 'image'
+
+
+def _keyword_table(keywords):
+    """Order keywords shortest first, each paired with a shorter keyword it
+    contains; a keyword is only searched for if that one was found."""
+    ordered = sorted(set(keywords), key=len)
+    return tuple(
+        (keyword, next((other for other in ordered[:i] if other in keyword), None))
+        for i, keyword in enumerate(ordered)
+    )
+
+
+_KEYWORDS = _keyword_table(STRONG_NEGATIVE + POSITIVE_INDICATORS + SOURCE_WORDS + (IMAGE_WORD,))
+
+
+def find_keywords(text):
+    """Return the set of known keywords that occur in lowercased `text`."""
+    found = set()
+    for keyword, requires in _KEYWORDS:
+        if (requires is None or requires in found) and keyword in text:
+            found.add(keyword)
+    return found
+
+
+def _first_at_or_after(starts, pos):
+    i = bisect_left(starts, pos)
+    return i if i < len(starts) else None
+
+
+def _line_end(text, pos):
+    end = text.find('\n', pos)
+    return end if end != -1 else len(text)
+
+
+def _likely_tokens(text, pos):
+    """Yield (start, end, digits, head_end) for each "<digits>%<space>likely"
+    from pos; head_end is where "to be accurate/genuine" ends if it follows."""
+    for m in _LIKELY.finditer(text, pos):
+        start = m.start()
+        while start > pos and text[start - 1].isdecimal():  # what \d matches
+            start -= 1
+        if start < m.start():
+            tail = _HEAD_TAIL.match(text, m.end())
+            yield start, m.end(), text[start:m.start()], tail.end() if tail else None
+
+
+def _resolve(text, tokens, start, end):
+    """Return the percentages of the leftmost summary match starting in
+    text[start:end], a region no match starting there can leave."""
+    newlines = [m.start() for m in _NEWLINE.finditer(text, start, end)]
+
+    def line_end(pos):
+        i = _first_at_or_after(newlines, pos)
+        return newlines[i] if i is not None else end
+
+    def viable(candidates, next_starts):
+        # Keep the tokens after which the rest of the pattern can still match
+        kept = []
+        for token in candidates:
+            i = _first_at_or_after(next_starts, token[1])
+            if i is not None and next_starts[i] < line_end(token[1]):
+                kept.append(token)
+        return kept
+
+    misleading = [m.start() for m in _MISLEADING.finditer(text, start, end)]
+    false_words = [(m.start(), m.end(), None) for m in _FALSE_WORD.finditer(text, start, end)]
+    third = viable(tokens, misleading)
+    second = viable(false_words, [t[0] for t in third])
+    first = viable(tokens, [t[0] for t in second])
+    chain = [(kept, [t[0] for t in kept]) for kept in (first, second, third)]
+
+    # Leftmost head that completes, then the earliest completing token at each step
+    for head in tokens:
+        pos = head[3]
+        if pos is None:
+            continue
+        picked = []
+        for candidates, starts in chain:
+            i = _first_at_or_after(starts, pos)
+            if i is None or starts[i] >= line_end(pos):
+                break
+            picked.append(candidates[i][2])
+            pos = candidates[i][1]
+        else:
+            return int(head[2]), int(picked[0]), int(picked[2])
+    return None
+
+
+def _earliest_chain(text, head):
+    """Follow the earliest token at each step after `head`; when that completes
+    it is also the match the pattern's backtracking would settle on."""
+    pos = head.end()
+    values = [head.group(1)]
+    for pattern in (_LIKELY_AT, _FALSE_WORD, _LIKELY_AT, _MISLEADING):
+        m = pattern.search(text, pos)
+        if m is None or text.find('\n', pos, m.start()) != -1:
+            return None
+        if pattern is _LIKELY_AT:
+            values.append(m.group(1))
+        pos = m.end()
+    return int(values[0]), int(values[1]), int(values[2])
+
+
+def extract_percentages(text):
+    """Find the summary line percentages in lowercased `text`.
+
+    Matches exactly what the pattern in the comment above would, without its
+    backtracking.
+
+    Returns:
+        tuple: (genuine_pct, false_pct, misleading_pct), or None if the text
+        has no summary line.
+    """
+    head = _SUMMARY_HEAD.search(text) if 'misleading' in text else None
+    if head is None:
+        return None
+    result = _earliest_chain(text, head)
+    if result:
+        return result
+
+    # The earliest tokens led nowhere: settle the leftmost match region by region
+    tokens = []
+    end = -1
+    for token in _likely_tokens(text, 0):
+        if token[0] >= end:
+            # Past the current region: settle it before starting the next one
+            if tokens:
+                result = _resolve(text, tokens, tokens[0][0], end)
+                if result:
+                    return result
+            tokens = []
+            end = _line_end(text, token[0])
+        tokens.append(token)
+        reach = token[3] or token[1]
+        if reach > end:
+            # The token's whitespace ran onto the next line; so can the match
+            end = _line_end(text, reach)
+    if tokens:
+        return _resolve(text, tokens, tokens[0][0], end)
+    return None
+
+
+def verdict_from_percentages(genuine_pct, false_pct, misleading_pct):
+    """Map the summary percentages to (isTrue, confidence)."""
+    # Use the genuine percentage as confidence, determine truthfulness
+    if genuine_pct >= 60:
+        return True, min(95, genuine_pct + 10)  # Add some confidence boost
+    if false_pct >= 50:
+        return False, min(95, false_pct + 15)  # Higher confidence for clear falsehoods
+    # Lean towards caution when uncertain
+    return False, max(30, 100 - misleading_pct - false_pct)
+
+
+def source_hints(keywords):
+    """Suggested verification sources for a lowercased analysis.
+
+    Args:
+        keywords: The lowercased analysis text, or its find_keywords() set;
+            both answer the same `in` questions.
+    """
+    sources = []
+    if any(word in keywords for word in SOURCE_WORDS):
+        sources = [
+            {
+                "title": "Snopes Fact-Checking",
+                "url": "https://www.snopes.com",
+                "domain": "snopes.com"
+            },
+            {
+                "title": "FactCheck.org",
+                "url": "https://www.factcheck.org",
+                "domain": "factcheck.org"
+            }
+        ]
+
+    if IMAGE_WORD in keywords:
+        sources.append({
+            "title": "Google Reverse Image Search",
+            "url": "https://images.google.com",
+            "domain": "images.google.com"
+        })
+    return sources
+
+
+def parse_analysis_to_json(analysis_text):
+    """Convert the analysis text to the expected JSON format for the frontend."""
+    try:
+        analysis_lower = analysis_text.lower()
+
+        # Try to extract percentages from the summary line (new format)
+        percentages = extract_percentages(analysis_lower)
+
+        if percentages:
+            is_true, confidence = verdict_from_percentages(*percentages)
+            sources = source_hints(analysis_lower)
+        else:
+            # Fallback to keyword analysis if percentage extraction fails
+            found = find_keywords(analysis_lower)
+            strong_neg_count = sum(1 for indicator in STRONG_NEGATIVE if indicator in found)
+            positive_count = sum(1 for indicator in POSITIVE_INDICATORS if indicator in found)
+
+            # More dynamic confidence calculation
+            if strong_neg_count >= 3:
+                is_true = False
+                confidence = min(95, 75 + (strong_neg_count * 5))
+            elif positive_count >= 2 and strong_neg_count == 0:
+                is_true = True
+                confidence = min(90, 70 + (positive_count * 6))
+            elif strong_neg_count > positive_count:
+                is_true = False
+                confidence = min(85, 60 + (strong_neg_count * 8))
+            elif positive_count > strong_neg_count:
+                is_true = True
+                confidence = min(80, 55 + (positive_count * 7))
+            else:
+                is_true = False  # Default to caution
+                confidence = 45 + (len(analysis_text) // 100)  # Vary based on analysis length
+            sources = source_hints(found)
+
+        return {
+            "isTrue": is_true,
+            "confidence": confidence,
+            "explanation": analysis_text,
+            "sources": sources
+        }
+
+    except Exception:
+        return {
+            "isTrue": False,
+            "confidence": 50,
+            "explanation": f"Analysis completed: {analysis_text}",
+            "sources": []
+        }
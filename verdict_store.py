@@ -0,0 +1,341 @@
+"""
+Persistent, searchable record of past analyses.
+
+Every verdict Gemini produces (text or image, any tier) is appended to a
+SQLite database (see storage.py) together with the analyzed text or the
+image's SHA-256, and an FTS5 index covers the text and the explanation.
+Moderators can then look up how a claim was rated before without analyzing
+it again: GET /search ranks matches with bm25 and pages through them, and
+?image=<sha256> lists the verdicts of one image file.
+
+record() only puts the row on an in-memory queue. A background thread in
+each worker writes the queue every VERDICT_STORE_FLUSH_INTERVAL seconds, one
+transaction per batch, so the request path never waits on the store. Gunicorn's worker_exit hook
+writes what a recycled worker still has queued; rows that do not fit in the
+queue are dropped and counted.
+
+Submitted texts are not kept forever: every VERDICT_STORE_PRUNE_INTERVAL
+seconds the writer thread deletes rows older than VERDICT_STORE_MAX_AGE and
+the oldest rows beyond VERDICT_STORE_MAX_ROWS (0 turns either limit off), in
+batches so the write lock is only held briefly.
+
+Ranking a common term over millions of rows would score every match, so a
+query first finds its SEARCH_MAX_CANDIDATES most recent matches (FTS5 reads
+them in rowid order) and ranks only those.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from storage import connect, incr_counter, read_counters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    content_key TEXT NOT NULL,
+    content TEXT,
+    image_hash TEXT,
+    is_true INTEGER NOT NULL,
+    confidence INTEGER NOT NULL,
+    explanation TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    tier TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_image_hash ON analyses(image_hash) WHERE image_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS analyses_created_at ON analyses(created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+    content, explanation, content='analyses', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS analyses_fts_insert AFTER INSERT ON analyses BEGIN
+    INSERT INTO analyses_fts (rowid, content, explanation) VALUES (new.id, new.content, new.explanation);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_fts_delete AFTER DELETE ON analyses BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, content, explanation)
+    VALUES ('delete', old.id, old.content, old.explanation);
+END;
+"""
+
+SEARCH_API_KEY = os.getenv('SEARCH_API_KEY', '')
+SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 5000))
+SEARCH_MAX_PER_PAGE = 50
+
+VERDICT_STORE_MAX_AGE = float(os.getenv('VERDICT_STORE_MAX_AGE', 90 * 24 * 3600))
+VERDICT_STORE_MAX_ROWS = int(os.getenv('VERDICT_STORE_MAX_ROWS', 1000000))
+VERDICT_STORE_PRUNE_INTERVAL = float(os.getenv('VERDICT_STORE_PRUNE_INTERVAL', 60))
+
+_SHA256_HEX = re.compile(r'[0-9a-f]{64}')
+
+# Words of a search query, each optionally ending in * for a prefix match
+_QUERY_TERM = re.compile(r'(\w+)(\*?)')
+MAX_QUERY_TERMS = 16
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching all of its words.
+
+    Every word is quoted, so the FTS5 operators and syntax characters a user
+    types are searched for as plain words rather than parsed.
+
+    Raises:
+        ValueError: If the text has no words.
+    """
+    terms = [f'"{word}"{star}' for word, star in _QUERY_TERM.findall(text.lower())][:MAX_QUERY_TERMS]
+    if not terms:
+        raise ValueError('Search query has no words')
+    return ' '.join(terms)
+
+
+def is_sha256(value):
+    """Whether `value` is a lowercase SHA-256 hex digest."""
+    return _SHA256_HEX.fullmatch(value) is not None
+
+
+class VerdictStore:
+    """SQLite store of analyses with full-text search, pruned to its retention limits."""
+
+    def __init__(self, db_name='verdict_store.db', enabled=None, queue_size=None, batch_size=500,
+                 flush_interval=None, max_candidates=None, max_age=None, max_rows=None):
+        self.db_name = db_name
+        self.enabled = enabled if enabled is not None else \
+            os.getenv('VERDICT_STORE_ENABLED', 'true').lower() != 'false'
+        self.queue_size = queue_size if queue_size is not None else \
+            int(os.getenv('VERDICT_STORE_QUEUE_SIZE', 10000))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval if flush_interval is not None else \
+            float(os.getenv('VERDICT_STORE_FLUSH_INTERVAL', 1))
+        self.max_candidates = max_candidates if max_candidates is not None else SEARCH_MAX_CANDIDATES
+        self.max_age = max_age if max_age is not None else VERDICT_STORE_MAX_AGE
+        self.max_rows = max_rows if max_rows is not None else VERDICT_STORE_MAX_ROWS
+        self.prune_interval = VERDICT_STORE_PRUNE_INTERVAL
+        self._queue = None
+        self._dropped = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _conn(self):
+        return connect(self.db_name, SCHEMA)
+
+    def _ensure_started(self):
+        """Start this process's writer thread (again after a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Rows queued in a parent process are the parent's to write
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._dropped = 0
+            threading.Thread(target=self._write_forever, name='verdict-store', daemon=True).start()
+            self._pid = os.getpid()
+
+    def record(self, kind, content_key, result, text=None, image_hash=None, tier='deep'):
+        """Queue one analysis for the store; never blocks.
+
+        Args:
+            kind (str): 'text' or 'image'.
+            content_key (str): The verdict cache key of the content.
+            result (dict): The verdict JSON.
+            text (str): The analyzed (sanitized) text, for text analyses.
+            image_hash (str): SHA-256 hex digest of the file, for images.
+            tier (str): Analysis tier.
+        """
+        if not self.enabled:
+            return
+        self._ensure_started()
+        row = (kind, content_key, text, image_hash, int(bool(result.get('isTrue'))),
+               int(result.get('confidence', 0)), result.get('explanation', ''), json.dumps(result),
+               tier, time.time())
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def _write_forever(self):
+        pruned_at = 0
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+            if time.monotonic() - pruned_at >= self.prune_interval:
+                pruned_at = time.monotonic()
+                self.prune()
+
+    def flush(self):
+        """Write everything this worker has queued, waiting for a write in progress."""
+        if self._pid != os.getpid():
+            return
+        with self._flush_lock:
+            while True:
+                rows = []
+                while len(rows) < self.batch_size:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    return
+                self.write(rows)
+
+    def write(self, rows):
+        """Insert analysis rows in one transaction."""
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO analyses (kind, content_key, content, image_hash, is_true, confidence, '
+                    'explanation, verdict, tier, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+                )
+                incr_counter(conn, 'verdict_store.written', len(rows))
+                if dropped:
+                    incr_counter(conn, 'verdict_store.dropped', dropped)
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Verdict store write failed, dropping {len(rows)} rows: {e}")
+
+    def prune(self, now=None):
+        """Delete rows past the retention limits, in batches of batch_size.
+
+        Returns:
+            int: Rows deleted.
+        """
+        if not (self.max_age or self.max_rows):
+            return 0
+        now = time.time() if now is None else now
+        deleted = 0
+        while True:
+            try:
+                conn = self._conn()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    batch = 0
+                    if self.max_rows:
+                        # Rows are numbered in insertion order; keep the newest max_rows
+                        row = conn.execute(
+                            'SELECT id FROM analyses ORDER BY id DESC LIMIT 1 OFFSET ?', (self.max_rows,)
+                        ).fetchone()
+                        if row:
+                            batch += conn.execute(
+                                'DELETE FROM analyses WHERE id IN '
+                                '(SELECT id FROM analyses WHERE id <= ? ORDER BY id LIMIT ?)',
+                                (row[0], self.batch_size)
+                            ).rowcount
+                    if self.max_age and batch < self.batch_size:
+                        batch += conn.execute(
+                            'DELETE FROM analyses WHERE id IN '
+                            '(SELECT id FROM analyses WHERE created_at < ? LIMIT ?)',
+                            (now - self.max_age, self.batch_size - batch)
+                        ).rowcount
+                    if batch:
+                        incr_counter(conn, 'verdict_store.pruned', batch)
+                    conn.execute('COMMIT')
+                except sqlite3.Error:
+                    conn.execute('ROLLBACK')
+                    raise
+            except sqlite3.Error as e:
+                logger.warning(f"Verdict store prune failed: {e}")
+                return deleted
+            deleted += batch
+            if batch < self.batch_size:
+                return deleted
+
+    def _row(self, row):
+        (row_id, kind, content, image_hash, is_true, confidence, verdict, tier, created_at) = row[:9]
+        item = {
+            'id': row_id,
+            'kind': kind,
+            'tier': tier,
+            'isTrue': bool(is_true),
+            'confidence': confidence,
+            'createdAt': created_at,
+            'verdict': json.loads(verdict)
+        }
+        if content is not None:
+            item['text'] = content
+        if image_hash is not None:
+            item['imageHash'] = image_hash
+        if len(row) > 9:
+            item['snippet'] = row[9]
+        return item
+
+    def search(self, text, kind=None, limit=20, offset=0, max_candidates=None):
+        """Rank earlier analyses matching every word of `text`.
+
+        Args:
+            text (str): Free-text query; a word ending in * matches as a prefix.
+            kind (str): Only 'text' or only 'image' analyses.
+            limit (int): Results per page.
+            offset (int): Results to skip.
+            max_candidates (int): Most recent matches to rank (default
+                SEARCH_MAX_CANDIDATES; 0 ranks every match).
+
+        Returns:
+            tuple: (results, has_more) - result dicts, best first, and whether
+            another page follows.
+
+        Raises:
+            ValueError: If the query has no words.
+        """
+        match = fts_query(text)
+        max_candidates = self.max_candidates if max_candidates is None else max_candidates
+        kind_filter = ' AND a.kind = ?' if kind else ''
+        kind_args = (kind,) if kind else ()
+        conn = self._conn()
+
+        cutoff = 0
+        if max_candidates:
+            row = conn.execute(
+                'SELECT analyses_fts.rowid FROM analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid '
+                f'WHERE analyses_fts MATCH ?{kind_filter} ORDER BY analyses_fts.rowid DESC LIMIT 1 OFFSET ?',
+                (match, *kind_args, max_candidates - 1)
+            ).fetchone()
+            cutoff = row[0] if row else 0
+
+        rows = conn.execute(
+            'SELECT a.id, a.kind, a.content, a.image_hash, a.is_true, a.confidence, a.verdict, a.tier, '
+            "a.created_at, snippet(analyses_fts, -1, '**', '**', '…', 16) "
+            'FROM analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid '
+            f'WHERE analyses_fts MATCH ? AND analyses_fts.rowid >= ?{kind_filter} ORDER BY rank LIMIT ? OFFSET ?',
+            (match, cutoff, *kind_args, limit + 1, offset)
+        ).fetchall()
+        return [self._row(row) for row in rows[:limit]], len(rows) > limit
+
+    def lookup_image(self, image_hash, limit=20):
+        """Verdicts recorded for the image file with this SHA-256, newest first."""
+        rows = self._conn().execute(
+            'SELECT id, kind, content, image_hash, is_true, confidence, verdict, tier, created_at '
+            'FROM analyses WHERE image_hash = ? ORDER BY id DESC LIMIT ?', (image_hash, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def stats(self):
+        """Rows written and dropped (all workers) and this worker's queue."""
+        if not self.enabled:
+            return {'enabled': False}
+        try:
+            counters = read_counters(self._conn(), 'verdict_store.')
+        except sqlite3.Error as e:
+            logger.warning(f"Verdict store stats failed: {e}")
+            return {}
+        return {
+            'enabled': True,
+            'written': counters.get('written', 0),
+            'dropped': counters.get('dropped', 0),
+            'pruned': counters.get('pruned', 0),
+            'queued': self._queue.qsize() if self._pid == os.getpid() else 0
+        }
@@ -0,0 +1,51 @@
+"""
+Pre-fork warm-up for Gunicorn's preload mode.
+
+With preload_app on (GUNICORN_PRELOAD, the default) the master imports
+app:app once, and gunicorn.conf.py's on_starting hook calls preload() before
+any worker is forked. Workers, including the ones max_requests recycles,
+then start with the following already loaded and shared copy-on-write,
+instead of paying for them on their first request:
+
+* google.generativeai, which gemini_client otherwise imports on the first
+  model call (the single largest import, well over a second), configured and
+  with every model of the routes in model_routing.py built;
+* every PIL image plugin, which Pillow otherwise loads on the first upload in
+  a format it has not seen yet (WebP, TIFF and the rest);
+* the parts of bleach's vendored html5lib that its first clean() imports.
+
+Nothing here opens a connection: the SDK creates its API client on the first
+request, which happens in the worker after the fork. Without preloading the
+app stays cheap to import, and /health never touches the SDK.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def preload():
+    """Import and initialize the heavy dependencies of the analysis paths.
+
+    Returns:
+        float: Seconds spent.
+    """
+    start = time.perf_counter()
+    from PIL import Image
+    from text_input import strip_markup
+
+    Image.init()
+    strip_markup('<b>warm-up</b>')
+    try:
+        from gemini_client import client
+        from model_routing import router
+
+        for route in router.routes.values():
+            for model_name in route.models:
+                client.model(model_name)
+        client.model(router.default_model)
+    except ImportError as e:
+        logger.warning(f"Gemini SDK not preloaded: {e}")
+    elapsed = time.perf_counter() - start
+    logger.info(f"Preloaded model SDK, image plugins and sanitizer in {elapsed * 1000:.0f}ms")
+    return elapsed